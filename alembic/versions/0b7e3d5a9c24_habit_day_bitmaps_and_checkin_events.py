@@ -0,0 +1,93 @@
+"""habit day bitmaps and check-in events
+
+Revision ID: 0b7e3d5a9c24
+Revises: f2a6c8e1d953
+Create Date: 2024-09-16 20:31:57.902146
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b7e3d5a9c24'
+down_revision: Union[str, None] = 'f2a6c8e1d953'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('habit', sa.Column('done_days', sa.LargeBinary(), nullable=True))
+    op.add_column('habit', sa.Column('missed_days', sa.LargeBinary(), nullable=True))
+    op.create_table(
+        'habit_checkin_event',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('habit_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('completed', sa.Boolean(), nullable=False),
+        sa.Column('source', sa.String(length=16), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_habit_checkin_event_habit_id'), 'habit_checkin_event', ['habit_id'], unique=False)
+
+    # Переносим отметки habit_complected в битовые карты: бит N (младший разряд байта N / 8)
+    # соответствует N-му дню от даты создания привычки. Одна отметка на день, поэтому сумма
+    # битов байта равна их объединению.
+    op.execute(
+        """
+        WITH marks AS (
+            SELECT hc.habit_id,
+                   hc.created_date - h.created_date AS day,
+                   hc.count_habit_complected > 0 AS done
+            FROM habit_complected hc
+            JOIN habit h ON h.id = hc.habit_id
+            WHERE hc.created_date >= h.created_date
+        ),
+        bytes AS (
+            SELECT habit_id, day / 8 AS idx,
+                   SUM(CASE WHEN done THEN 1 << (day % 8) ELSE 0 END) AS done_byte,
+                   SUM(CASE WHEN done THEN 0 ELSE 1 << (day % 8) END) AS missed_byte
+            FROM marks
+            GROUP BY habit_id, day / 8
+        ),
+        grid AS (
+            SELECT s.habit_id, g.idx,
+                   COALESCE(b.done_byte, 0) AS done_byte,
+                   COALESCE(b.missed_byte, 0) AS missed_byte
+            FROM (SELECT habit_id, MAX(idx) AS max_idx FROM bytes GROUP BY habit_id) s
+            CROSS JOIN LATERAL generate_series(0, s.max_idx) AS g(idx)
+            LEFT JOIN bytes b ON b.habit_id = s.habit_id AND b.idx = g.idx
+        )
+        UPDATE habit h
+        SET done_days = decode(bitmaps.done_hex, 'hex'),
+            missed_days = decode(bitmaps.missed_hex, 'hex')
+        FROM (
+            SELECT habit_id,
+                   string_agg(lpad(to_hex(done_byte::int), 2, '0'), '' ORDER BY idx) AS done_hex,
+                   string_agg(lpad(to_hex(missed_byte::int), 2, '0'), '' ORDER BY idx) AS missed_hex
+            FROM grid
+            GROUP BY habit_id
+        ) bitmaps
+        WHERE h.id = bitmaps.habit_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO habit_checkin_event (habit_id, user_id, day, completed, source, created_at)
+        SELECT habit_id, user_id, created_date, count_habit_complected > 0, 'migration', created_date
+        FROM habit_complected
+        WHERE habit_id IS NOT NULL
+        ORDER BY created_date, id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_habit_checkin_event_habit_id'), table_name='habit_checkin_event')
+    op.drop_table('habit_checkin_event')
+    op.drop_column('habit', 'missed_days')
+    op.drop_column('habit', 'done_days')
@@ -0,0 +1,38 @@
+"""unique habit check-in per day
+
+Revision ID: 3f9c2a7d1e05
+Revises: b61afe528a4f
+Create Date: 2024-09-02 21:14:37.512904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d1e05'
+down_revision: Union[str, None] = 'b61afe528a4f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Удаляем дубли отметок за один день, оставляя самую раннюю запись.
+    op.execute(
+        """
+        DELETE FROM habit_complected a
+        USING habit_complected b
+        WHERE a.habit_id = b.habit_id
+          AND a.created_date = b.created_date
+          AND a.id > b.id
+        """
+    )
+    op.create_unique_constraint(
+        'uq_habit_complected_habit_day', 'habit_complected', ['habit_id', 'created_date']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_habit_complected_habit_day', 'habit_complected', type_='unique')
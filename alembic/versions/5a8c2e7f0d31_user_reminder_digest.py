@@ -0,0 +1,26 @@
+"""user reminder digest
+
+Revision ID: 5a8c2e7f0d31
+Revises: 9d4f1b6e2c70
+Create Date: 2024-09-23 18:05:26.417390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a8c2e7f0d31'
+down_revision: Union[str, None] = '9d4f1b6e2c70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('reminder_digest', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('user', 'reminder_digest')
@@ -0,0 +1,35 @@
+"""unique scheduler job per habit
+
+Revision ID: 7c41e8b9d2a6
+Revises: 3f9c2a7d1e05
+Create Date: 2024-09-05 19:42:11.084317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c41e8b9d2a6'
+down_revision: Union[str, None] = '3f9c2a7d1e05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Каждый перезапуск добавлял новую запись на привычку, оставляем только последнюю.
+    op.execute(
+        """
+        DELETE FROM scheduler_jobs a
+        USING scheduler_jobs b
+        WHERE a.habit_id = b.habit_id
+          AND a.id < b.id
+        """
+    )
+    op.create_unique_constraint('uq_scheduler_jobs_habit_id', 'scheduler_jobs', ['habit_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_scheduler_jobs_habit_id', 'scheduler_jobs', type_='unique')
@@ -0,0 +1,50 @@
+"""habit longest streak
+
+Revision ID: 9d4f1b6e2c70
+Revises: 0b7e3d5a9c24
+Create Date: 2024-09-21 10:17:42.904118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4f1b6e2c70'
+down_revision: Union[str, None] = '0b7e3d5a9c24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('habit', sa.Column('longest_streak', sa.Integer(), server_default='0', nullable=False))
+    # Заполняем по журналу отметок: выполненные дни одной серии идут подряд,
+    # поэтому у них совпадает разность даты и номера строки.
+    op.execute(
+        """
+        WITH done AS (
+            SELECT DISTINCT habit_id, day
+            FROM habit_checkin_event
+            WHERE completed
+        ),
+        runs AS (
+            SELECT habit_id, day - (ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY day))::int AS grp
+            FROM done
+        ),
+        lengths AS (
+            SELECT habit_id, COUNT(*) AS streak
+            FROM runs
+            GROUP BY habit_id, grp
+        )
+        UPDATE habit h
+        SET longest_streak = GREATEST(l.streak, h.current_streak)
+        FROM (SELECT habit_id, MAX(streak) AS streak FROM lengths GROUP BY habit_id) l
+        WHERE h.id = l.habit_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('habit', 'longest_streak')
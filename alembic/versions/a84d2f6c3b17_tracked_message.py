@@ -0,0 +1,34 @@
+"""tracked message
+
+Revision ID: a84d2f6c3b17
+Revises: 7c41e8b9d2a6
+Create Date: 2024-09-08 12:27:53.619402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a84d2f6c3b17'
+down_revision: Union[str, None] = '7c41e8b9d2a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'tracked_message',
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('message_id', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('chat_id', 'message_id'),
+    )
+    op.create_index(op.f('ix_tracked_message_created_at'), 'tracked_message', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_tracked_message_created_at'), table_name='tracked_message')
+    op.drop_table('tracked_message')
@@ -0,0 +1,28 @@
+"""user state storage key
+
+Revision ID: c3e95a1f7b42
+Revises: a84d2f6c3b17
+Create Date: 2024-09-10 18:05:21.447930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e95a1f7b42'
+down_revision: Union[str, None] = 'a84d2f6c3b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user_state', sa.Column('storage_key', sa.String(), nullable=True))
+    op.create_unique_constraint('user_state_storage_key_key', 'user_state', ['storage_key'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('user_state_storage_key_key', 'user_state', type_='unique')
+    op.drop_column('user_state', 'storage_key')
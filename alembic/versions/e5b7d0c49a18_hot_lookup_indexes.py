@@ -0,0 +1,56 @@
+"""hot lookup indexes
+
+Revision ID: e5b7d0c49a18
+Revises: c3e95a1f7b42
+Create Date: 2024-09-12 21:16:40.318502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b7d0c49a18'
+down_revision: Union[str, None] = 'c3e95a1f7b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ACTIVE_HABIT = sa.text('duration > count_remained_day')
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY не блокирует запись в таблицы, но не может выполняться в транзакции.
+    # Если построение прервется, Postgres оставит индекс INVALID: его нужно удалить и повторить миграцию.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_user_bot_user_id', 'user', ['bot_user_id'], unique=True,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_habit_user_id', 'habit', ['user_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_habit_active', 'habit', ['id'],
+                        postgresql_include=['reminder_time'], postgresql_where=ACTIVE_HABIT,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_habit_complected_user_id', 'habit_complected', ['user_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_scheduler_jobs_user_id', 'scheduler_jobs', ['user_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_message_control_user_chat', 'message_control', ['user_id', 'chat_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_message_control_user_chat', table_name='message_control',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_scheduler_jobs_user_id', table_name='scheduler_jobs',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_habit_complected_user_id', table_name='habit_complected',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_habit_active', table_name='habit',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_habit_user_id', table_name='habit',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_user_bot_user_id', table_name='user',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,68 @@
+"""habit completion counters
+
+Revision ID: f2a6c8e1d953
+Revises: e5b7d0c49a18
+Create Date: 2024-09-14 12:48:03.561274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a6c8e1d953'
+down_revision: Union[str, None] = 'e5b7d0c49a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('habit', sa.Column('completed_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('habit', sa.Column('missed_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('habit', sa.Column('current_streak', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('habit', sa.Column('last_checkin_date', sa.Date(), nullable=True))
+    # Заполняем счетчики по существующим отметкам. Серия - количество выполненных дней подряд
+    # в последнем непрерывном отрезке (даты отрезка минус номер строки совпадают).
+    op.execute(
+        """
+        WITH runs AS (
+            SELECT habit_id, created_date, count_habit_complected > 0 AS done,
+                   created_date - (ROW_NUMBER() OVER (
+                       PARTITION BY habit_id, count_habit_complected > 0 ORDER BY created_date
+                   ))::int AS grp
+            FROM habit_complected
+        ),
+        totals AS (
+            SELECT habit_id,
+                   SUM(count_habit_complected) AS completed,
+                   SUM(count_habit_not_complected) AS missed,
+                   MAX(created_date) AS last_date
+            FROM habit_complected
+            GROUP BY habit_id
+        ),
+        streaks AS (
+            SELECT r.habit_id, COUNT(*) AS streak
+            FROM runs r
+            JOIN runs l ON l.habit_id = r.habit_id AND l.grp = r.grp AND l.done AND r.done
+            JOIN totals t ON t.habit_id = l.habit_id AND t.last_date = l.created_date
+            GROUP BY r.habit_id
+        )
+        UPDATE habit h
+        SET completed_count = t.completed,
+            missed_count = t.missed,
+            last_checkin_date = t.last_date,
+            current_streak = COALESCE(s.streak, 0)
+        FROM totals t
+        LEFT JOIN streaks s ON s.habit_id = t.habit_id
+        WHERE h.id = t.habit_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('habit', 'last_checkin_date')
+    op.drop_column('habit', 'current_streak')
+    op.drop_column('habit', 'missed_count')
+    op.drop_column('habit', 'completed_count')
@@ -1,11 +1,20 @@
 """Модуль для настройки подключения к базе данных и создания сессий."""
+import asyncio
+import logging
+import time
 from contextlib import asynccontextmanager
 
-from sqlalchemy import MetaData, NullPool
+from sqlalchemy import MetaData, event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
-from config import DB_USER, DB_NAME, DB_PORT, DB_HOST, DB_PASS
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from config import (
+    DB_USER, DB_NAME, DB_PORT, DB_HOST, DB_PASS,
+    DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_POOL_WARMUP,
+)
 
+logger: logging.Logger = logging.getLogger(__name__)
 
 
 DATABASE_URL = (
@@ -13,10 +22,62 @@ DATABASE_URL = (
         f"{DB_PORT}/{DB_NAME}"
 )
 
+# Синхронный адрес той же базы для инструментов без поддержки asyncio (тесты с --postgres).
+SYNC_DATABASE_URL = (
+        f"postgresql+psycopg2://" f"{DB_USER}:{DB_PASS}@{DB_HOST}:"
+        f"{DB_PORT}/{DB_NAME}"
+)
+
 metadata = MetaData()
 Base = declarative_base(metadata=metadata)
 
-engine = create_async_engine(DATABASE_URL, echo=True, poolclass=NullPool)
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, собирающий статистику выдачи соединений.
+
+    Помимо стандартного поведения AsyncAdaptedQueuePool замеряет время ожидания
+    свободного соединения при каждом checkout, что позволяет подбирать размер
+    пула под реальную нагрузку.
+
+    Атрибуты:
+        checkouts (int): Количество выданных соединений.
+        checkout_timeouts (int): Количество неудачных попыток получить соединение по таймауту.
+        total_wait (float): Суммарное время ожидания соединений в секундах.
+        max_wait (float): Максимальное время ожидания соединения в секундах.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.checkout_timeouts += 1
+            raise
+        wait = time.perf_counter() - started
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        return connection
+
+
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=DB_ECHO,
+    poolclass=InstrumentedAsyncPool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
 
 AsyncSessionLocal = sessionmaker(
     bind=engine,
@@ -25,6 +86,56 @@ AsyncSessionLocal = sessionmaker(
 )
 
 
+# Ключ session.info со списком действий, отложенных до фиксации транзакции.
+AFTER_COMMIT_KEY = "after_commit"
+
+
+def run_after_commit(session, callback, *args):
+    """
+    Откладывает вызов `callback(*args)` до фиксации транзакции сессии.
+
+    Используется для сброса кешей процесса: если сбросить кеш до фиксации,
+    параллельный обработчик успеет прочитать из базы старые данные и снова
+    закешировать их. При откате транзакции отложенные действия отменяются.
+
+    Args:
+        session (AsyncSession | Session): Сессия, в транзакции которой изменены данные.
+        callback (Callable): Синхронная функция.
+        *args: Аргументы функции.
+    """
+    session.info.setdefault(AFTER_COMMIT_KEY, []).append((callback, args))
+
+
+def has_pending_commit(session) -> bool:
+    """
+    Проверяет, есть ли в транзакции сессии изменения, ожидающие фиксации.
+
+    Пока такие изменения есть, кеши процесса еще не сброшены и не отражают
+    их, поэтому чтение в этой же сессии должно идти мимо кеша.
+
+    Args:
+        session (AsyncSession | Session): Сессия базы данных.
+
+    Returns:
+        bool: True, если есть отложенные до фиксации действия.
+    """
+    return bool(session.info.get(AFTER_COMMIT_KEY))
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session):
+    for callback, args in session.info.pop(AFTER_COMMIT_KEY, ()):
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"Ошибка действия после фиксации транзакции: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit_callbacks(session):
+    session.info.pop(AFTER_COMMIT_KEY, None)
+
+
 @asynccontextmanager
 async def get_async_session() -> AsyncSession:
     """
@@ -46,4 +157,52 @@ async def get_async_session() -> AsyncSession:
         что позволяет избежать утечек ресурсов и обеспечить корректное завершение работы с базой данных.
     """
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+async def warm_up_pool(size: int = DB_POOL_WARMUP):
+    """
+    Заранее открывает соединения пула.
+
+    Открывает `size` соединений параллельно и сразу возвращает их в пул,
+    чтобы первые запросы после старта не платили за TCP-подключение и авторизацию.
+
+    Args:
+        size (int): Количество соединений для прогрева (не больше размера пула).
+    """
+    size = min(size, DB_POOL_SIZE)
+    if size <= 0:
+        return
+    started = time.perf_counter()
+    connections = await asyncio.gather(*(engine.connect() for _ in range(size)), return_exceptions=True)
+    for connection in connections:
+        if isinstance(connection, Exception):
+            logger.warning(f"Не удалось прогреть соединение пула: {connection}")
+        else:
+            await connection.close()
+    logger.info(f"Пул соединений прогрет за {time.perf_counter() - started:.3f} c. - {get_pool_stats()}")
+
+
+def get_pool_stats() -> dict:
+    """
+    Возвращает текущую статистику пула соединений.
+
+    Returns:
+        dict: Размер пула, количество занятых и свободных соединений, переполнение,
+              а также среднее и максимальное время ожидания соединения в миллисекундах.
+    """
+    pool = engine.pool
+    stats = {
+        "size": pool.size(),
+        "in_use": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+    if isinstance(pool, InstrumentedAsyncPool):
+        stats.update({
+            "checkouts": pool.checkouts,
+            "checkout_timeouts": pool.checkout_timeouts,
+            "avg_wait_ms": round(pool.total_wait / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+            "max_wait_ms": round(pool.max_wait * 1000, 3),
+        })
+    return stats
@@ -1,20 +1,29 @@
 import asyncio
 import datetime
+import hmac
 from contextlib import asynccontextmanager
 import uvicorn
-from fastapi import FastAPI
+from aiogram.types import Update
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 import sentry_sdk
 import logging
 
 from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
 
-from app.db.database import get_async_session, engine, Base
-from config import APP_PORT
+from app.db.database import engine, Base, warm_up_pool, get_pool_stats
+from config import (
+    API_TOKEN, APP_PORT, APP_RELOAD, APP_ROLES, APP_WORKERS, BOT_MODE, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_IN_FLIGHT,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import User
-from habit_bot.bot_init import scheduler
-from habit_bot.run_bot import start_bot
-from habit_bot.run_reminder import check_and_add_jobs
+from habit_bot.bot_init import bot, dp, scheduler, sent_message_ids
+from habit_bot.crud.habit.habit_info import habit_card_cache
+from habit_bot.outbound_queue import outbound_queue
+from habit_bot.run_bot import start_bot, start_webhook
+from habit_bot.scheduler_leader import scheduler_leader
+from services.analytics import get_habit_analytics
+from services.handlers import habit_list_cache, user_identity_cache
+from services.passwords import password_hasher
 
 logging.basicConfig(level=logging.INFO)
 logger: logging.Logger = logging.getLogger(__name__)
@@ -34,10 +43,11 @@ sentry_sdk.init(
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Контекстный менеджер, запускающий бота и планировщик.
+    Контекстный менеджер, запускающий компоненты приложения согласно ролям процесса.
 
-    Этот менеджер обеспечивает запуск бота и планировщика,
-    а также управление их жизненным циклом в рамках приложения FastAPI.
+    Роль bot-worker обрабатывает обновления бота (опрос или webhook), роль scheduler
+    участвует в выборе активного планировщика, роль api обслуживает HTTP API.
+    Роли задаются переменной окружения APP_ROLE.
 
     Parameters:
         app (FastAPI): Экземпляр приложения FastAPI.
@@ -45,41 +55,139 @@ async def lifespan(app: FastAPI):
     Yields:
         None: Эта функция не возвращает значения.
     """
-    async with get_async_session() as session:
-        # Создаем задачу для запуска бота и планировщика
-        bot_task = asyncio.create_task(start_bot_and_scheduler())
+    logger.info(f"Роли процесса - {sorted(APP_ROLES)}")
+    await warm_up_pool()
+    tasks = []
+    if "scheduler" in APP_ROLES:
+        tasks.append(asyncio.create_task(scheduler_leader.run()))
+    if "bot-worker" in APP_ROLES:
+        tasks.append(asyncio.create_task(start_bot_worker()))
     yield
-    bot_task.cancel()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    await sent_message_ids.close()
+    await dp.storage.close()
+    await outbound_queue.close()
+    password_hasher.close()
+    logger.info(f"Статистика пула соединений при остановке - {get_pool_stats()}")
     await engine.dispose()
 
-async def start_bot_and_scheduler():
+
+async def start_bot_worker():
     """
-    Запускает как бота, так и планировщик.
+    Запускает обработку обновлений бота.
 
-    Эта функция запускает планировщик, добавляет задачи в него,
-    а затем начинает работу бота.
+    В режиме опроса запускает `start_polling`, в режиме webhook регистрирует
+    webhook, а обновления принимает маршрут FastAPI. Режим опроса возможен только
+    в одном процессе bot-worker: при нескольких config завершает запуск с ошибкой.
 
     Returns:
         None
     """
+    run_bot = start_webhook if BOT_MODE == "webhook" else start_bot
     try:
-        scheduler.start()
-        logger.info("Scheduler started successfully.")
-        await check_and_add_jobs()  # Добавляем незавершенные задачи в планировщик
-        await start_bot()  # Запускаем бота и начинаем обработку сообщений
+        await run_bot()  # Запускаем бота и начинаем обработку сообщений
     except Exception as e:
         logger.error(f"Bot polling failed: {e}")
-        await start_bot()  # Если бот упал, пытаемся его запустить заново
+        await run_bot()  # Если бот упал, пытаемся его запустить заново
+
+
+def require_api_token(request: Request):
+    """
+    Проверяет токен доступа к закрытым маршрутам HTTP API.
+
+    Parameters:
+        request (Request): Входящий запрос с заголовком "Authorization: Bearer <API_TOKEN>".
+
+    Raises:
+        HTTPException: 403, если API_TOKEN не задан или токен запроса не совпадает.
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if not API_TOKEN or scheme.lower() != "bearer" or not hmac.compare_digest(token, API_TOKEN):
+        raise HTTPException(status_code=403)
 
 
 def create_app() -> FastAPI:
     """
     Создает и настраивает приложение Fast API.
 
+    Маршруты HTTP API регистрируются только в процессе с ролью api,
+    маршрут webhook - только в процессе с ролью bot-worker в режиме webhook.
+
     Returns:
         FastAPI: Сконфигурированный экземпляр приложения Fast API.
     """
     app = FastAPI(lifespan=lifespan)
+
+    if "api" in APP_ROLES:
+        @app.get("/metrics")
+        async def metrics() -> dict:
+            """
+            Возвращает метрики приложения.
+
+            Returns:
+                dict: Статистика пула соединений с базой данных, очереди исходящих сообщений Telegram,
+                      кешей пользователей, списков и карточек привычек, пула хеширования паролей
+                      и признак активного планировщика.
+            """
+            return {
+                "db_pool": get_pool_stats(),
+                "telegram_queue": outbound_queue.get_stats(),
+                "user_cache": user_identity_cache.get_stats(),
+                "habit_list_cache": habit_list_cache.get_stats(),
+                "habit_card_cache": habit_card_cache.get_stats(),
+                "password_hasher": password_hasher.get_stats(),
+                "scheduler_leader": scheduler_leader.is_leader,
+            }
+
+        @app.get("/analytics", dependencies=[Depends(require_api_token)])
+        async def analytics() -> dict:
+            """
+            Возвращает сводную аналитику по привычкам всех пользователей.
+
+            Расчет читает все привычки, поэтому маршрут доступен только с токеном API_TOKEN,
+            а результат кешируется на ANALYTICS_CACHE_TTL секунд.
+
+            Returns:
+                dict: Доли выполнения, распределение серий, кривые выполнения и отвала по дням
+                      (см. services.analytics).
+            """
+            return await get_habit_analytics()
+
+    if BOT_MODE == "webhook" and "bot-worker" in APP_ROLES:
+        # Ограничивает количество обновлений, обрабатываемых процессом одновременно.
+        in_flight = asyncio.Semaphore(WEBHOOK_MAX_IN_FLIGHT)
+
+        @app.post(WEBHOOK_PATH)
+        async def telegram_webhook(request: Request) -> Response:
+            """
+            Принимает обновление Telegram и передает его диспетчеру бота.
+
+            Если все слоты обработки заняты, возвращает 503, и Telegram
+            повторит доставку обновления позже. Ошибка обработки записывается
+            в журнал, а ответ остается 200: повторная доставка того же обновления
+            приводила бы к той же ошибке.
+
+            Returns:
+                Response: 200 после обработки (в том числе неудачной), 403 при неверном
+                          секретном токене, 503 при перегрузке.
+            """
+            token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not WEBHOOK_SECRET or not hmac.compare_digest(token, WEBHOOK_SECRET):
+                return Response(status_code=403)
+            if in_flight.locked():
+                return Response(status_code=503)
+            async with in_flight:
+                try:
+                    update = Update.model_validate(await request.json(), context={"bot": bot})
+                    await dp.feed_update(bot, update)
+                except Exception as e:
+                    logger.exception(f"Ошибка обработки обновления Telegram: {e}")
+            return Response(status_code=200)
+
     return app
 
 
@@ -135,7 +243,11 @@ app.add_middleware(SentryAsgiMiddleware)
 
 
 def start_app():
-    uvicorn.run("main:app", host="127.0.0.1", port=int(APP_PORT), reload=True)
+    # Перезагрузка при изменении кода - только для разработки, она несовместима с несколькими воркерами.
+    uvicorn.run(
+        "main:app", host="127.0.0.1", port=int(APP_PORT),
+        workers=APP_WORKERS, reload=APP_RELOAD and APP_WORKERS == 1,
+    )
 
 
 if __name__ == "__main__":
@@ -1,14 +1,25 @@
 import re
 from datetime import date
 from passlib.context import CryptContext
-from sqlalchemy import Column, ForeignKey, Integer, String, Date, DateTime, BigInteger
+from sqlalchemy import Column, ForeignKey, Integer, String, Date, DateTime, BigInteger, Boolean, Index, LargeBinary, \
+    UniqueConstraint, func, text
 from sqlalchemy.orm import relationship
 from app.db.database import Base
+from config import ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM
 from datetime import datetime
 
 
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Параметры argon2 задаются только явно (см. config); хеши с другими параметрами
+# пересчитываются при входе пользователя (verify_and_update).
+argon2_settings = {
+    f"argon2__{name}": value
+    for name, value in (
+        ("rounds", ARGON2_TIME_COST), ("memory_cost", ARGON2_MEMORY_COST), ("parallelism", ARGON2_PARALLELISM),
+    )
+    if value is not None
+}
+pwd_context = CryptContext(schemes=["argon2"], deprecated="auto", **argon2_settings)
 
 
 class User(Base):
@@ -20,6 +31,7 @@ class User(Base):
        nickname (str): Никнейм пользователя.
        profile_id (int): Идентификатор профиля, связанного с пользователем.
        api_key (str): API ключ пользователя.
+       reminder_digest (bool): Присылать напоминания привычек одной минуты одним сообщением.
        profile (Profile): Связанный профиль пользователя.
        followed (list[User]):
        Список пользователей, за которыми данный пользователь следует.
@@ -28,6 +40,7 @@ class User(Base):
     """
 
     __tablename__ = "user"
+    __table_args__ = (Index("ix_user_bot_user_id", "bot_user_id", unique=True),)
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     nickname = Column(String(25), nullable=False)
     fullname = Column(String(25))
@@ -39,6 +52,7 @@ class User(Base):
     bot_user_id = Column(BigInteger())
     chat_id = Column(Integer())
     created_date = Column(Date, default=date.today)
+    reminder_digest = Column(Boolean, nullable=False, default=False, server_default=text("false"))
 
     user_state = relationship("UserState", back_populates="user", uselist=False)
     habits = relationship("Habit", back_populates="user", cascade="all, delete-orphan")
@@ -46,7 +60,8 @@ class User(Base):
     reminder_jobs = relationship("SchedulerJobs", back_populates="user", cascade="all, delete-orphan")
 
 
-    def __init__(self, nickname, age, phone, email, password, bot_user_id, created_date):
+    def __init__(self, nickname, age, phone, email, password=None, bot_user_id=None, created_date=None,
+                 password_hash=None):
         """
         Инициализирует профиль с заданными значениями.
 
@@ -55,12 +70,13 @@ class User(Base):
             phone (str): Номер телефона пользователя.
             email (str): Адрес электронной почты пользователя.
             avatar (str): Ссылка на аватар пользователя.
+            password_hash (str): Готовый хеш пароля; если передан, пароль не хешируется.
         """
         self.nickname = nickname
         self.age = age
         self.phone = phone
         self.email = email
-        self.password_hash = self.hash_password(password)
+        self.password_hash = password_hash or self.hash_password(password)
         self.bot_user_id = bot_user_id
         self.created_date = created_date
 
@@ -92,8 +108,9 @@ class UserState(Base):
     Атрибуты:
         id (int): Уникальный идентификатор состояния пользователя.
         user_id (int): Идентификатор пользователя, связанного с этим состоянием.
+        storage_key (str): Ключ состояния FSM aiogram (бот, чат, пользователь, назначение).
         state (str): Текущее состояние пользователя.
-        data (str): Дополнительные данные, связанные с состоянием пользователя.
+        data (str): Дополнительные данные, связанные с состоянием пользователя (JSON).
 
     Взаимосвязи:
         user (User): Пользователь, связанный с этим состоянием.
@@ -102,6 +119,7 @@ class UserState(Base):
     __tablename__ = "user_state"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"), unique=True)
+    storage_key = Column(String, unique=True, nullable=True)
     state = Column(String, nullable=True)
     data = Column(String, nullable=True)
     user = relationship("User", back_populates="user_state")
@@ -120,6 +138,13 @@ class Habit(Base):
         created_date (date): Дата создания привычки.
         reminder_time (str): Время, в которое должны отправляться напоминания о привычке.
         count_remained_day (int): Счетчик оставшихся дней для завершения привычки.
+        completed_count (int): Количество дней, когда привычка была выполнена.
+        missed_count (int): Количество дней, когда привычка не была выполнена.
+        current_streak (int): Количество выполненных подряд дней, заканчивающихся последней отметкой.
+        longest_streak (int): Наибольшее количество выполненных подряд дней.
+        last_checkin_date (date): Дата последней отметки.
+        done_days (bytes): Битовая карта выполненных дней (бит N - N-й день от created_date).
+        missed_days (bytes): Битовая карта невыполненных дней.
 
     Взаимосвязи:
         user (User): Пользователь, связанный с этой привычкой.
@@ -127,6 +152,15 @@ class Habit(Base):
         reminder_jobs (SchedulerJobs): Запланированные задания для напоминаний, связанные с этой привычкой.
     """
     __tablename__ = "habit"
+    __table_args__ = (
+        Index("ix_habit_user_id", "user_id"),
+        # Незавершенные привычки: ночная проверка и загрузка индекса напоминаний.
+        Index(
+            "ix_habit_active", "id",
+            postgresql_include=["reminder_time"],
+            postgresql_where=text("duration > count_remained_day"),
+        ),
+    )
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer(), ForeignKey("user.id"))
     habit_name = Column(String(50), nullable=False)
@@ -135,6 +169,15 @@ class Habit(Base):
     created_date = Column(Date, default=date.today)
     reminder_time = Column(String(20))
     count_remained_day = Column(Integer(), default=0)
+    # Счетчики по отметкам, обновляются тем же выражением, что и отметка.
+    completed_count = Column(Integer(), nullable=False, default=0, server_default="0")
+    missed_count = Column(Integer(), nullable=False, default=0, server_default="0")
+    current_streak = Column(Integer(), nullable=False, default=0, server_default="0")
+    longest_streak = Column(Integer(), nullable=False, default=0, server_default="0")
+    last_checkin_date = Column(Date, nullable=True)
+    # История отметок (см. services.day_bitmap).
+    done_days = Column(LargeBinary, nullable=True)
+    missed_days = Column(LargeBinary, nullable=True)
 
     user = relationship("User", back_populates="habits")
     habit_complected = relationship("HabitComplected", back_populates="habit", uselist=False)
@@ -149,6 +192,10 @@ class Habit(Base):
         self.created_date = created_date
         self.reminder_time = reminder_time
         self.count_remained_day = 0
+        self.completed_count = 0
+        self.missed_count = 0
+        self.current_streak = 0
+        self.longest_streak = 0
 
     def increment_remained_day(self):
         self.count_remained_day +=1
@@ -162,13 +209,17 @@ class SchedulerJobs(Base):
         id (int): Уникальный идентификатор запланированного задания.
         job_id (str): Идентификатор задания в планировщике.
         user_id (int): Идентификатор пользователя, связанного с этим заданием.
-        habit_id (int): Идентификатор привычки, связанной с этим заданием.
+        habit_id (int): Идентификатор привычки, связанной с этим заданием (одно задание на привычку).
 
     Взаимосвязи:
         user (User): Пользователь, связанный с этим запланированным заданием.
         habit (Habit): Привычка, связанная с этим запланированным заданием.
     """
     __tablename__ = "scheduler_jobs"
+    __table_args__ = (
+        UniqueConstraint("habit_id", name="uq_scheduler_jobs_habit_id"),
+        Index("ix_scheduler_jobs_user_id", "user_id"),
+    )
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     job_id = Column(String, nullable=False)
     user_id = Column(Integer(), ForeignKey("user.id"))
@@ -183,6 +234,9 @@ class HabitComplected(Base):
     """
     Отслеживает статус завершения привычек для пользователей.
 
+    Историческая таблица: новые отметки хранятся в битовых картах привычки
+    (Habit.done_days, Habit.missed_days) и журнале HabitCheckinEvent.
+
     Атрибуты:
         id (int): Уникальный идентификатор записи о завершенной привычке.
         user_id (int): Идентификатор пользователя, владеющего привычкой.
@@ -194,8 +248,15 @@ class HabitComplected(Base):
     Взаимосвязи:
         user (User): Пользователь, связанный с этой записью о завершении привычки.
         habit (Habit): Привычка, связанная с этой записью о завершении.
+
+    Ограничения:
+        uq_habit_complected_habit_day: Не более одной отметки на привычку за день.
     """
     __tablename__ = "habit_complected"
+    __table_args__ = (
+        UniqueConstraint("habit_id", "created_date", name="uq_habit_complected_habit_day"),
+        Index("ix_habit_complected_user_id", "user_id"),
+    )
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("user.id"))
     habit_id = Column(Integer, ForeignKey("habit.id"))
@@ -225,6 +286,33 @@ class HabitComplected(Base):
 
 
 
+class HabitCheckinEvent(Base):
+    """
+    Запись журнала отметок привычек. Журнал только пополняется и служит для аудита.
+
+    Ссылки на привычку и пользователя не являются внешними ключами, чтобы история
+    сохранялась после удаления привычки.
+
+    Атрибуты:
+        id (int): Уникальный идентификатор записи.
+        habit_id (int): Идентификатор привычки.
+        user_id (int): Идентификатор пользователя, владеющего привычкой.
+        day (date): День, за который поставлена отметка.
+        completed (bool): True - привычка выполнена, False - не выполнена.
+        source (str): Источник отметки: user (пользователь), rollover (ночная проверка),
+                      migration (перенос из habit_complected).
+        created_at (datetime): Время записи.
+    """
+    __tablename__ = "habit_checkin_event"
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    habit_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=True)
+    day = Column(Date, nullable=False)
+    completed = Column(Boolean, nullable=False)
+    source = Column(String(16), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.now, server_default=func.now())
+
+
 class MessageControl(Base):
     """
     Представляет контрольную запись для сообщений, отправленных в чате.
@@ -240,6 +328,7 @@ class MessageControl(Base):
        Инициализирует запись контроля сообщения с chat_id, message_id и user_id.
     """
     __tablename__ = "message_control"
+    __table_args__ = (Index("ix_message_control_user_chat", "user_id", "chat_id"),)
     id = Column(Integer, primary_key=True, autoincrement=True)
     chat_id = Column(BigInteger, nullable=False)
     message_id = Column(BigInteger, nullable=False)
@@ -249,4 +338,21 @@ class MessageControl(Base):
     def __init__(self, chat_id, message_id, user_id):
         self.chat_id = chat_id
         self.message_id = message_id
-        self.user_id = user_id
\ No newline at end of file
+        self.user_id = user_id
+
+class TrackedMessage(Base):
+    """
+    Сообщение чата, которое бот удалит при следующей очистке чата.
+
+    Таблица используется как постоянное хранилище для MessageStore, чтобы
+    после перезапуска бот мог удалить сообщения, отправленные до него.
+
+    Атрибуты:
+       chat_id (int): Идентификатор чата.
+       message_id (int): Идентификатор сообщения.
+       created_at (datetime): Время, когда сообщение было добавлено.
+    """
+    __tablename__ = "tracked_message"
+    chat_id = Column(BigInteger, primary_key=True)
+    message_id = Column(BigInteger, primary_key=True)
+    created_at = Column(DateTime, default=datetime.now, nullable=False, index=True)
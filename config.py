@@ -13,4 +13,145 @@ DB_NAME = os.environ.get("DB_NAME")
 DB_USER = os.environ.get("DB_USER")
 DB_PASS = os.environ.get("DB_PASS")
 
-APP_PORT = os.environ.get("APP_PORT")
\ No newline at end of file
+APP_PORT = os.environ.get("APP_PORT")
+# Количество процессов uvicorn (по умолчанию WEB_CONCURRENCY, как у uvicorn --workers).
+APP_WORKERS = int(os.environ.get("APP_WORKERS", os.environ.get("WEB_CONCURRENCY", 1)))
+# Перезагрузка при изменении кода (только для разработки, с одним процессом).
+APP_RELOAD = os.environ.get("APP_RELOAD", "false").lower() == "true"
+
+# Настройки пула соединений с базой данных.
+DB_ECHO = os.environ.get("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_WARMUP = int(os.environ.get("DB_POOL_WARMUP", 5))
+
+# Размер порции привычек (по диапазону id) для ночной проверки.
+ROLLOVER_CHUNK_SIZE = int(os.environ.get("ROLLOVER_CHUNK_SIZE", 50000))
+
+# Размер порции привычек при загрузке напоминаний на старте.
+STARTUP_BATCH_SIZE = int(os.environ.get("STARTUP_BATCH_SIZE", 1000))
+
+# Размер порции привычек при отправке напоминаний одной минуты.
+REMINDER_DISPATCH_BATCH_SIZE = int(os.environ.get("REMINDER_DISPATCH_BATCH_SIZE", 1000))
+
+# Ограничения исходящих запросов к Telegram.
+# TELEGRAM_GLOBAL_RATE - общий лимит бота (сообщений в секунду) на все процессы; лимит одного
+# процесса (TELEGRAM_PROCESS_RATE) вычисляется ниже, после количества процессов.
+TELEGRAM_GLOBAL_RATE = float(os.environ.get("TELEGRAM_GLOBAL_RATE", 30))
+TELEGRAM_CHAT_RATE = float(os.environ.get("TELEGRAM_CHAT_RATE", 1))
+TELEGRAM_CHAT_BURST = float(os.environ.get("TELEGRAM_CHAT_BURST", 5))
+TELEGRAM_SEND_WORKERS = int(os.environ.get("TELEGRAM_SEND_WORKERS", 8))
+TELEGRAM_MAX_RETRIES = int(os.environ.get("TELEGRAM_MAX_RETRIES", 3))
+
+# Хранилище сообщений, удаляемых при очистке чата.
+MESSAGE_STORE_CHAT_CAP = int(os.environ.get("MESSAGE_STORE_CHAT_CAP", 200))
+MESSAGE_STORE_TTL = int(os.environ.get("MESSAGE_STORE_TTL", 48 * 3600))
+MESSAGE_STORE_PERSIST = os.environ.get("MESSAGE_STORE_PERSIST", "false").lower() == "true"
+MESSAGE_STORE_FLUSH_INTERVAL = float(os.environ.get("MESSAGE_STORE_FLUSH_INTERVAL", 5))
+
+# Хранилище состояний FSM: "postgres" или "memory".
+FSM_STORAGE = os.environ.get("FSM_STORAGE", "postgres")
+FSM_CACHE_SIZE = int(os.environ.get("FSM_CACHE_SIZE", 10000))
+FSM_FLUSH_DELAY = float(os.environ.get("FSM_FLUSH_DELAY", 0.5))
+
+# Режим получения обновлений бота: "polling" или "webhook".
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")
+WEBHOOK_MAX_IN_FLIGHT = int(os.environ.get("WEBHOOK_MAX_IN_FLIGHT", 100))
+
+# Токен доступа к закрытым маршрутам HTTP API (заголовок "Authorization: Bearer <API_TOKEN>").
+# Без токена закрытые маршруты отвечают 403.
+API_TOKEN = os.environ.get("API_TOKEN")
+
+# Роли процесса через запятую: api, bot-worker, scheduler или all.
+APP_ROLE_CHOICES = {"api", "bot-worker", "scheduler"}
+APP_ROLE = os.environ.get("APP_ROLE", "all")
+APP_ROLES = {role.strip() for role in APP_ROLE.split(",") if role.strip()}
+if not APP_ROLES or APP_ROLES - APP_ROLE_CHOICES - {"all"}:
+    raise ValueError(
+        f"Неверное значение APP_ROLE={APP_ROLE!r}: допустимы {', '.join(sorted(APP_ROLE_CHOICES))} или all"
+    )
+if "all" in APP_ROLES:
+    APP_ROLES = set(APP_ROLE_CHOICES)
+# Общее количество процессов bot-worker во всех контейнерах; при нескольких процессах
+# состояние, общее для обновлений одного чата, хранится только в базе данных.
+BOT_WORKERS = int(os.environ.get("BOT_WORKERS", APP_WORKERS if "bot-worker" in APP_ROLES else 1))
+# Приложение работает в нескольких процессах: несколько воркеров или роли разделены между процессами.
+MULTI_PROCESS = APP_WORKERS > 1 or BOT_WORKERS > 1 or APP_ROLES != APP_ROLE_CHOICES
+# Telegram отдает обновления через getUpdates только одному получателю: параллельные запросы
+# нескольких процессов завершаются ошибкой конфликта, поэтому несколько процессов bot-worker
+# возможны только в режиме webhook.
+if BOT_MODE == "polling" and BOT_WORKERS > 1:
+    raise ValueError(
+        f"BOT_MODE=polling допускает один процесс bot-worker, а задано {BOT_WORKERS} "
+        f"(APP_WORKERS, BOT_WORKERS): используйте BOT_MODE=webhook"
+    )
+
+# Сообщения в Telegram отправляют процессы bot-worker и планировщик (напоминания). Ограничитель
+# скорости у каждого процесса свой, поэтому общий лимит TELEGRAM_GLOBAL_RATE делится поровну между
+# отправляющими процессами. При разделенных ролях планировщик считается отдельным процессом,
+# при APP_ROLE=all он работает в одном из процессов bot-worker. BOT_WORKERS и
+# TELEGRAM_SENDER_PROCESSES должны быть одинаковыми во всех процессах.
+TELEGRAM_SENDER_PROCESSES = int(os.environ.get(
+    "TELEGRAM_SENDER_PROCESSES", BOT_WORKERS + (1 if APP_ROLES != APP_ROLE_CHOICES else 0)
+))
+if TELEGRAM_SENDER_PROCESSES < BOT_WORKERS:
+    raise ValueError(
+        f"TELEGRAM_SENDER_PROCESSES={TELEGRAM_SENDER_PROCESSES} меньше BOT_WORKERS={BOT_WORKERS}: "
+        f"процессы вместе превысили бы TELEGRAM_GLOBAL_RATE"
+    )
+TELEGRAM_PROCESS_RATE = TELEGRAM_GLOBAL_RATE / TELEGRAM_SENDER_PROCESSES
+
+# Выбор единственного активного планировщика через advisory lock Postgres.
+SCHEDULER_LOCK_KEY = int(os.environ.get("SCHEDULER_LOCK_KEY", 724501))
+SCHEDULER_LEADER_INTERVAL = float(os.environ.get("SCHEDULER_LEADER_INTERVAL", 5))
+
+# Кеши пользователей, списков и карточек привычек хранятся в памяти процесса: изменение,
+# сделанное в другом процессе бота, их не сбрасывает. Поэтому при нескольких процессах бота
+# (BOT_WORKERS > 1), как и локальный кеш FSM и MessageStore, они отключены (размер 0).
+PROCESS_CACHES = BOT_WORKERS == 1
+
+# Кеш идентификационных данных пользователей (bot_user_id -> id, nickname, chat_id).
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 50000)) if PROCESS_CACHES else 0
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 300))
+
+# Кеш списков привычек пользователей (user_id -> краткие данные привычек).
+HABIT_LIST_CACHE_SIZE = int(os.environ.get("HABIT_LIST_CACHE_SIZE", 50000)) if PROCESS_CACHES else 0
+HABIT_LIST_CACHE_TTL = float(os.environ.get("HABIT_LIST_CACHE_TTL", 600))
+
+# Хеширование паролей argon2 в отдельном пуле потоков.
+# Параметры argon2 по умолчанию не заданы, и используются параметры passlib, с которыми
+# вычислены существующие хеши. Заданные параметры, отличные от параметров хеша, делают его
+# устаревшим: он пересчитывается при следующем входе пользователя, то есть каждый вход
+# после изменения стоит двух вычислений argon2 (проверка и новый хеш).
+ARGON2_TIME_COST = int(os.environ["ARGON2_TIME_COST"]) if os.environ.get("ARGON2_TIME_COST") else None
+ARGON2_MEMORY_COST = int(os.environ["ARGON2_MEMORY_COST"]) if os.environ.get("ARGON2_MEMORY_COST") else None
+ARGON2_PARALLELISM = int(os.environ["ARGON2_PARALLELISM"]) if os.environ.get("ARGON2_PARALLELISM") else None
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+
+# Подписанные токены сессии пользователя бота (JWT HS256).
+# Без SESSION_SECRET ключ создается при запуске, и сессии не переживают перезапуск. В нескольких
+# процессах у каждого был бы свой ключ, поэтому тогда SESSION_SECRET обязателен.
+SESSION_SECRET = os.environ.get("SESSION_SECRET")
+if not SESSION_SECRET and MULTI_PROCESS:
+    raise ValueError(
+        "SESSION_SECRET обязателен при нескольких процессах (APP_WORKERS, BOT_WORKERS) или разделении ролей (APP_ROLE)"
+    )
+SESSION_TTL = int(os.environ.get("SESSION_TTL", 3600))
+
+# Кеш отрисованных карточек привычек (habit_id -> текст карточки).
+HABIT_CARD_CACHE_SIZE = int(os.environ.get("HABIT_CARD_CACHE_SIZE", 50000)) if PROCESS_CACHES else 0
+HABIT_CARD_CACHE_TTL = float(os.environ.get("HABIT_CARD_CACHE_TTL", 600))
+
+# Сводная аналитика привычек (services.analytics).
+ANALYTICS_BATCH_SIZE = int(os.environ.get("ANALYTICS_BATCH_SIZE", 20000))
+ANALYTICS_HORIZON_DAYS = int(os.environ.get("ANALYTICS_HORIZON_DAYS", 365))
+ANALYTICS_CACHE_TTL = float(os.environ.get("ANALYTICS_CACHE_TTL", 900))
+
+# Количество диапазонов привычек, одновременно проверяемых services.habit_counters.
+HABIT_COUNTERS_CONCURRENCY = int(os.environ.get("HABIT_COUNTERS_CONCURRENCY", 4))
@@ -0,0 +1,108 @@
+"""Сессии пользователей бота на подписанных токенах JWT в хранилище FSM."""
+import logging
+import secrets
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+import jwt
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message
+
+from config import SESSION_SECRET, SESSION_TTL
+from habit_bot.button_menu import get_main_menu
+from services.handlers import add_sent_message_ids
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Токен хранится отдельно от состояния диалога, поэтому state.clear() не завершает сессию.
+SESSION_DESTINY = "auth"
+SESSION_ALGORITHM = "HS256"
+SESSION_EXPIRED_TEXT = "Сессия истекла. Войдите в аккаунт, чтобы продолжить."
+
+if SESSION_SECRET:
+    session_secret = SESSION_SECRET
+else:
+    logger.warning("SESSION_SECRET не задан, сессии пользователей будут сброшены при перезапуске.")
+    session_secret = secrets.token_urlsafe(32)
+
+
+def _session_key(state: FSMContext):
+    return replace(state.key, destiny=SESSION_DESTINY)
+
+
+async def issue_session(state: FSMContext, user_id: int) -> str:
+    """
+    Выдает токен сессии для чата после успешной проверки пароля.
+
+    Токен подписан HMAC-SHA256, привязан к пользователю и чату и действует
+    SESSION_TTL секунд.
+
+    Args:
+        state (FSMContext): Контекст состояния чата.
+        user_id (int): Идентификатор пользователя (User.id).
+
+    Returns:
+        str: Токен сессии.
+    """
+    now = datetime.now(tz=timezone.utc)
+    claims = {
+        "sub": str(user_id),
+        "bot_user_id": state.key.user_id,
+        "chat_id": state.key.chat_id,
+        "iat": now,
+        "exp": now + timedelta(seconds=SESSION_TTL),
+    }
+    token = jwt.encode(claims, session_secret, algorithm=SESSION_ALGORITHM)
+    await state.storage.set_data(_session_key(state), {"token": token})
+    return token
+
+
+async def get_session(state: FSMContext) -> [dict, None]:
+    """
+    Возвращает данные действующей сессии чата.
+
+    Подпись проверяется сравнением за постоянное время, поэтому повторная
+    проверка пароля argon2 не нужна.
+
+    Args:
+        state (FSMContext): Контекст состояния чата.
+
+    Returns:
+        dict | None: Данные токена, если сессия действительна, иначе None.
+    """
+    token = (await state.storage.get_data(_session_key(state))).get("token")
+    if not token:
+        return None
+    try:
+        claims = jwt.decode(
+            token, session_secret, algorithms=[SESSION_ALGORITHM], options={"require": ["exp", "sub"]}
+        )
+    except jwt.InvalidTokenError as e:
+        logger.info(f"Сессия чата {state.key.chat_id} недействительна: {e}")
+        return None
+    if claims.get("bot_user_id") != state.key.user_id or claims.get("chat_id") != state.key.chat_id:
+        return None
+    return claims
+
+
+async def require_session(state: FSMContext, message: Message) -> [dict, None]:
+    """
+    Проверяет сессию чата перед изменением данных пользователя.
+
+    Если сессия недействительна, сбрасывает состояние диалога и отправляет
+    сообщение с предложением войти в аккаунт.
+
+    Args:
+        state (FSMContext): Контекст состояния чата.
+        message (Message): Сообщение чата, в который отправляется ответ.
+
+    Returns:
+        dict | None: Данные токена, если сессия действительна, иначе None.
+    """
+    claims = await get_session(state)
+    if claims is None:
+        await state.clear()
+        sent_message = await message.answer(SESSION_EXPIRED_TEXT, reply_markup=get_main_menu())
+        await add_sent_message_ids(message.chat.id, sent_message.message_id)
+    return claims
+
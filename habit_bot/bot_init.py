@@ -4,7 +4,14 @@ from aiogram.types import BotCommand
 from aiogram.types import Message
 from aiogram.fsm.storage.memory import MemoryStorage
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from config import bot_token
+from app.db.database import AsyncSessionLocal
+from config import (
+    bot_token, MESSAGE_STORE_CHAT_CAP, MESSAGE_STORE_TTL, MESSAGE_STORE_PERSIST, MESSAGE_STORE_FLUSH_INTERVAL,
+    FSM_STORAGE, FSM_CACHE_SIZE, FSM_FLUSH_DELAY, BOT_WORKERS,
+)
+from habit_bot.fsm_storage import PostgresStorage
+from habit_bot.message_store import DbMessageBackend, MessageStore
+from habit_bot.outbound_queue import outbound_queue
 
 
 logging.basicConfig(level=logging.INFO)
@@ -13,11 +20,32 @@ logger: logging.Logger = logging.getLogger(__name__)
 API_TOKEN = bot_token
 
 bot = Bot(token=API_TOKEN)
-storage = MemoryStorage()
+# Все запросы к чатам проходят через общую очередь с ограничением скорости.
+bot.session.middleware(outbound_queue)
+# Состояния FSM хранятся в таблице user_state и переживают перезапуск.
+if FSM_STORAGE == "memory":
+    if BOT_WORKERS > 1:
+        logger.warning("FSM_STORAGE=memory при нескольких процессах bot-worker: состояния не общие для процессов")
+    storage = MemoryStorage()
+else:
+    # При нескольких процессах bot-worker кеш отключается: обновления одного чата
+    # могут обрабатываться разными процессами.
+    storage = PostgresStorage(
+        AsyncSessionLocal, cache_size=FSM_CACHE_SIZE, flush_delay=FSM_FLUSH_DELAY, shared=BOT_WORKERS > 1
+    )
 dp = Dispatcher(storage=storage)
-scheduler = AsyncIOScheduler()
+# Задачи планировщика (ночная проверка и тик напоминаний) хранятся в памяти: они добавляются
+# при каждом запуске (start_scheduler), а напоминания привычек загружаются из базы в индекс.
+scheduler = AsyncIOScheduler(job_defaults={"coalesce": True})
 
-sent_message_ids = {}
+# Сообщения, которые бот удалит при следующей очистке чата.
+sent_message_ids = MessageStore(
+    chat_cap=MESSAGE_STORE_CHAT_CAP,
+    ttl=MESSAGE_STORE_TTL,
+    backend=DbMessageBackend(AsyncSessionLocal) if MESSAGE_STORE_PERSIST or BOT_WORKERS > 1 else None,
+    flush_interval=MESSAGE_STORE_FLUSH_INTERVAL,
+    shared=BOT_WORKERS > 1,
+)
 
 
 async def set_commands(bot: Bot):
@@ -82,4 +110,42 @@ class CommandCleanupMiddleware(BaseMiddleware):
             return await handler(event, data)
 
 
-dp.message.middleware(CommandCleanupMiddleware())
\ No newline at end of file
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Посредник, реализующий единицу работы (unit of work) для каждого обновления.
+
+    Открывает одну сессию базы данных на всё обновление Telegram, передает её
+    обработчикам через `data["session"]` и один раз фиксирует транзакцию
+    после успешной обработки либо откатывает её при ошибке.
+
+    Атрибуты:
+       session_pool: Фабрика асинхронных сессий.
+    """
+    def __init__(self, session_pool):
+        self.session_pool = session_pool
+
+    async def __call__(self, handler, event, data):
+        """
+        Оборачивает обработку обновления в одну сессию и одну транзакцию.
+
+        Параметры:
+            handler: Функция-обработчик, которая будет вызвана для обработки события.
+            event: Событие, которое необходимо обработать.
+            data: Дополнительные данные, передаваемые в обработчик.
+
+        Возвращает:
+            Результат обработки события.
+        """
+        async with self.session_pool() as session:
+            data["session"] = session
+            try:
+                response = await handler(event, data)
+            except Exception:
+                await session.rollback()
+                raise
+            await session.commit()
+            return response
+
+
+dp.update.middleware(DbSessionMiddleware(AsyncSessionLocal))
+dp.message.middleware(CommandCleanupMiddleware())
@@ -5,7 +5,6 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.types import KeyboardButton, ReplyKeyboardMarkup
 
 from app.models import User
-from services.handlers import get_user_by_bot_user_id
 
 logging.basicConfig(level=logging.INFO)
 logger: logging.Logger = logging.getLogger(__name__)
@@ -69,6 +68,7 @@ async def edit_profile_menu(bot_user_id):
     markup_main = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="Редактировать", callback_data=f"edit_profile_{bot_user_id}"),
          InlineKeyboardButton(text="Главное меню", callback_data="main_menu")],
+        [InlineKeyboardButton(text="Режим напоминаний", callback_data=f"reminder_digest_{bot_user_id}")],
     ])
     return markup_main
 
@@ -138,6 +138,25 @@ async def get_habit_info_menu(habit_id):
     return habit_menu
 
 
+def get_reminder_menu(habit_id):
+    reminder_menu = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="Выполнено", callback_data=f"reminder_done_{habit_id}"),
+         InlineKeyboardButton(text="Пропустить", callback_data=f"reminder_skip_{habit_id}")],
+    ])
+    return reminder_menu
+
+
+def get_reminder_digest_menu(habits):
+    buttons = []
+    for habit in habits:
+        buttons.append([
+            InlineKeyboardButton(text=f"✅ {habit.habit_name}", callback_data=f"reminder_done_{habit.id}"),
+            InlineKeyboardButton(text="Пропустить", callback_data=f"reminder_skip_{habit.id}"),
+        ])
+    reminder_menu = InlineKeyboardMarkup(inline_keyboard=buttons)
+    return reminder_menu
+
+
 async def get_confirmation_del_habit(habit_id):
     confirmation_menu = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="Да, удалить", callback_data=f"confirmation_{habit_id}"),
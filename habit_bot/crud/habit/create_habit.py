@@ -3,12 +3,13 @@ import logging
 
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
-from app.db.database import get_async_session
-from app.models import User
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from habit_bot.auth_session import require_session
 from habit_bot.bot_init import bot, sent_message_ids
 from habit_bot.button_menu import get_user_menu, create_user_menu
 from habit_bot.states_group.states import CreateHabit
-from services.handlers import create_habit, get_user_by_bot_user_id, record_message_id, \
+from services.handlers import create_habit, get_user_identity, record_message_id, \
     clear_message_in_chat, add_job_reminder, validate_time_format, validate_count_day_format, add_sent_message_ids, \
     clear_chat
 
@@ -116,7 +117,7 @@ async def process_comments(message: Message, state: FSMContext):
     await add_sent_message_ids(message.chat.id, sent_message.message_id)
 
 
-async def process_reminder_time_and_create_habit(message: Message, state: FSMContext):
+async def process_reminder_time_and_create_habit(message: Message, state: FSMContext, session: AsyncSession):
     """
     Обрабатывает введенное пользователем время напоминания и создает привычку.
 
@@ -127,9 +128,11 @@ async def process_reminder_time_and_create_habit(message: Message, state: FSMCon
     Args:
         message (Message): Сообщение, содержащее время напоминания от пользователя.
         state (FSMContext): Контекст состояния для отслеживания состояния пользователя.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Flow Control:
         - Удаляет сообщение пользователя с временем напоминания.
+        - Без действующей сессии чата привычка не создается.
         - Проверяет корректность формата времени.
         - Сохраняет время напоминания в состоянии.
         - Если пользователь найден в базе данных, создает привычку и добавляет напоминание.
@@ -142,28 +145,29 @@ async def process_reminder_time_and_create_habit(message: Message, state: FSMCon
     logger.info(f"User ID in process_password_and_create_user: {bot_user_id}")
     await add_sent_message_ids(message.chat.id, message.message_id)
     await clear_chat(sent_message_ids, message)
+    if not await require_session(state, message):
+        return
     reminder_time = message.text.strip()
     if validate_time_format(reminder_time):
         await state.update_data(reminder_time=reminder_time)
 
-        user = await get_user_by_bot_user_id(bot_user_id)
-        if isinstance(user, User):
+        user = await get_user_identity(bot_user_id, session)
+        if user:
             data = await state.get_data()
             data["reminder_time"] = message.text
             data["bot_user_id"] = user.id
             habit_info = data
             await state.clear()
-            async with get_async_session() as session:
-                habit = await create_habit(habit_info, session)
-                if habit:
-                    sent_message = await bot.send_message(message.chat.id, "Привычка успешно создана", reply_markup=await create_user_menu())
-                    await add_sent_message_ids(message.chat.id, sent_message.message_id)
-                    logger.info("Отправляем напоминание в работу")
-                    job = await add_job_reminder(bot_user_id, habit.reminder_time, habit.habit_name, habit.id)
-                    logger.info(f"Результат добавления напоминания - {job}")
-                else:
-                    sent_message = await bot.send_message(message.chat.id, "При создании привычки произошла ошибка")
-                    await add_sent_message_ids(message.chat.id, sent_message.message_id)
+            habit = await create_habit(habit_info, session)
+            if habit:
+                sent_message = await bot.send_message(message.chat.id, "Привычка успешно создана", reply_markup=await create_user_menu())
+                await add_sent_message_ids(message.chat.id, sent_message.message_id)
+                logger.info("Отправляем напоминание в работу")
+                minute = await add_job_reminder(habit.id, habit.reminder_time, session)
+                logger.info(f"Результат добавления напоминания - {minute}")
+            else:
+                sent_message = await bot.send_message(message.chat.id, "При создании привычки произошла ошибка")
+                await add_sent_message_ids(message.chat.id, sent_message.message_id)
         else:
             error_message = "Пользователь не найден в базе данных"
             return error_message
@@ -1,8 +1,9 @@
 import logging
 
-from app.db.database import get_async_session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from habit_bot.crud.habit.habit_info import get_habit_by_id
+from services.handlers import bump_habit_list_version, discard_job_reminder
 
 
 
@@ -10,7 +11,7 @@ logging.basicConfig(level=logging.INFO)
 logger: logging.Logger = logging.getLogger(__name__)
 
 
-async def habit_delete(habit_id):
+async def habit_delete(habit_id, session: AsyncSession):
     """
     Удаляет привычку по заданному идентификатору.
 
@@ -20,6 +21,7 @@ async def habit_delete(habit_id):
 
     Args:
        habit_id (int): Идентификатор привычки, которую необходимо удалить.
+       session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
        bool: Возвращает True, если привычка успешно удалена, иначе
@@ -28,7 +30,8 @@ async def habit_delete(habit_id):
     Flow Control:
        - Логирует начало операции удаления привычки.
        - Пытается получить привычку по идентификатору.
-       - Если привычка найдена, удаляет её и коммитит изменения.
+       - Если привычка найдена, удаляет её (фиксация выполняется в конце обработки обновления)
+         сбрасывает кешированный список привычек пользователя и убирает её из индекса напоминаний.
        - В случае возникновения ошибки возвращает сообщение об ошибке.
 
     Logging:
@@ -36,10 +39,11 @@ async def habit_delete(habit_id):
     """
     logger.info(f"Start delete habit by id- {habit_id}")
     try:
-        habit = await get_habit_by_id(habit_id)
-        async with get_async_session() as session:
-            await session.delete(habit)
-            await session.commit()
-            return True
+        habit = await get_habit_by_id(habit_id, session)
+        await session.delete(habit)
+        await session.flush()
+        bump_habit_list_version(habit.user_id, session)
+        await discard_job_reminder(habit_id, session)
+        return True
     except Exception as e:
         return f"Ошибка удаления привычки из базы данных - {e}"
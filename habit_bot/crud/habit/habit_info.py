@@ -1,11 +1,21 @@
 import logging
-from services.handlers import get_habit_by_id, get_complected_day
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import has_pending_commit
+from config import HABIT_CARD_CACHE_SIZE, HABIT_CARD_CACHE_TTL
+from services.cache import TTLLRUCache
+from services.handlers import get_habit_by_id, get_habit_card, habit_list_versions
 
 logging.basicConfig(level=logging.INFO)
 logger: logging.Logger = logging.getLogger(__name__)
 
+# habit_id -> (user_id, версия списка привычек пользователя, день отрисовки, текст карточки).
+habit_card_cache = TTLLRUCache(maxsize=HABIT_CARD_CACHE_SIZE, ttl=HABIT_CARD_CACHE_TTL)
+
 
-async def get_habit_info_by_id(habit_id):
+async def get_habit_info_by_id(habit_id, session: AsyncSession):
     """
     Получает информацию о привычке по её идентификатору.
 
@@ -14,37 +24,61 @@ async def get_habit_info_by_id(habit_id):
     невыполненных дней. Если привычка существует, функция возвращает строку с
     детализированной информацией о привычке. Если привычка не найдена, возвращает None.
 
+    Данные карточки получаются одним запросом (`get_habit_card`), а отрисованная
+    карточка кешируется вместе с версией списка привычек пользователя: любое изменение
+    привычек пользователя или наступление нового дня делает её устаревшей. Версия
+    увеличивается после фиксации транзакции, поэтому при незафиксированных изменениях
+    в сессии кеш не читается и не пополняется.
+
     Args:
         habit_id (int): Идентификатор привычки, информацию о которой нужно получить.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
         str or None: Строка с информацией о привычке, если она найдена; иначе None.
     """
-    habit = await get_habit_by_id(habit_id)
-    completed_data = await get_complected_day(habit_id)
-    if completed_data:
-        count_habit_complected = completed_data["completed"]
-        count_habit_not_complected = completed_data["not_completed"]
-    else:
-        count_habit_complected = 0
-        count_habit_not_complected = 0
-
-    if habit:
-        count_remaining_days = int(habit.duration) - int(habit.count_remained_day)
-        habit_info = (f"*Формируемая привычка:* {habit.habit_name}\n"
-                      f"*Создана* - {habit.created_date}\n"
-                      f"*Описание* - {habit.comments}\n"
-                      f"*Общая продолжительность дней* - {habit.duration}\n"
-                      f"*Отправлять напоминание в* - {habit.reminder_time}\n"
-                      f"*Выполнено* - {count_habit_complected} дней\n"
-                      f"*Не выполнено* - {count_habit_not_complected} дней\n"
-                      f"*Осталось* - {count_remaining_days} дней")
-        return habit_info
-    return None
-
-
+    today = datetime.today().date()
+    uncommitted = has_pending_commit(session)
+    cached = None if uncommitted else habit_card_cache.get(habit_id)
+    if cached is not None:
+        user_id, version, day, habit_info = cached
+        if version == habit_list_versions.get(user_id) and day == today:
+            return habit_info
 
+    clock = habit_list_versions.clock
+    card = await get_habit_card(habit_id, session)
+    if card is None:
+        return None
+    habit_info = render_habit_info(card, card.completed, card.not_completed)
+    version = habit_list_versions.get(card.user_id)
+    # Если привычки пользователя менялись во время запроса, карточка могла устареть и не кешируется.
+    if not uncommitted and version <= clock:
+        habit_card_cache.set(habit_id, (card.user_id, version, today, habit_info))
+    return habit_info
 
 
+def render_habit_info(habit, count_habit_complected, count_habit_not_complected):
+    """
+    Формирует текст карточки привычки в формате Markdown.
 
+    Args:
+        habit: Объект Habit или строка результата запроса с полями habit_name, created_date,
+               comments, duration, reminder_time, count_remained_day, current_streak
+               и longest_streak.
+        count_habit_complected (int): Количество дней, когда привычка была выполнена.
+        count_habit_not_complected (int): Количество дней, когда привычка не была выполнена.
 
+    Returns:
+        str: Строка с информацией о привычке.
+    """
+    count_remaining_days = int(habit.duration) - int(habit.count_remained_day)
+    habit_info = (f"*Формируемая привычка:* {habit.habit_name}\n"
+                  f"*Создана* - {habit.created_date}\n"
+                  f"*Описание* - {habit.comments}\n"
+                  f"*Общая продолжительность дней* - {habit.duration}\n"
+                  f"*Отправлять напоминание в* - {habit.reminder_time}\n"
+                  f"*Выполнено* - {count_habit_complected} дней\n"
+                  f"*Не выполнено* - {count_habit_not_complected} дней\n"
+                  f"*Серия* - {habit.current_streak} дней (лучшая - {habit.longest_streak})\n"
+                  f"*Осталось* - {count_remaining_days} дней")
+    return habit_info
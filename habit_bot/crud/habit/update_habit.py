@@ -3,9 +3,8 @@ import logging
 
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
-from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from habit_bot.bot_init import scheduler
 from habit_bot.button_menu import  create_update_keyboard
 from habit_bot.states_group.states import  UpdateHabit
 from services.handlers import update_habit_by_id, record_message_id, add_job_reminder, delete_job_reminder, \
@@ -152,7 +151,7 @@ async def update_habit_reminder(message: Message, state: FSMContext):
     await add_sent_message_ids(message.chat.id, sent_message.message_id)
 
 
-async def save_update_habit(state: FSMContext):
+async def save_update_habit(state: FSMContext, session: AsyncSession):
     """
     Сохраняет обновления привычки в базе данных.
 
@@ -161,6 +160,7 @@ async def save_update_habit(state: FSMContext):
 
     Args:
         state (FSMContext): Контекст состояния для получения обновленных данных.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
         Habit: Объект Habit, представляющий обновленную привычку.
@@ -186,22 +186,11 @@ async def save_update_habit(state: FSMContext):
 
     logger.info(f"Start save_update_habit - {habit_info}")
     await state.clear()
-    bot_user_id = habit_info["bot_user_id"]
-    habit = await update_habit_by_id(habit_info)
+    habit = await update_habit_by_id(habit_info, session)
     logger.info(f"Save data habit - {habit}")
     if habit:
-        logger.info("Обновляем напоминание в планировщике.")
-        # Ищем задачу в планировщике
-        job = scheduler.get_job(habit.id)
-
-        if job:
-            # Обновляем существующую задачу
-            hour, minute = map(int, habit.reminder_time.split(':'))
-            trigger = CronTrigger(hour=hour, minute=minute)
-            job.modify(trigger=trigger, args=[bot_user_id, habit.habit_name])
-            logger.info(f"Задача {habit.id} успешно обновлена.")
-        else:
-            # Создаем новую задачу, если она не найдена
-            job = await add_job_reminder(bot_user_id, habit.reminder_time, habit.habit_name, habit.id)
-            logger.info(f"Создано новое напоминание для задачи - {job}")
+        logger.info("Обновляем напоминание в индексе напоминаний.")
+        # Повторное добавление переносит привычку в корзину нового времени.
+        minute = await add_job_reminder(habit.id, habit.reminder_time, session)
+        logger.info(f"Напоминание для задачи {habit.id} обновлено - {minute}")
     return habit
\ No newline at end of file
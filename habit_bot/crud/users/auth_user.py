@@ -2,9 +2,10 @@ import logging
 
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_async_session
 from app.models import User
+from habit_bot.auth_session import issue_session
 from habit_bot.button_menu import get_user_menu
 from habit_bot.run_bot import bot
 from habit_bot.states_group.states import UserEntry
@@ -38,7 +39,7 @@ async def entering_the_password(message: Message, state: FSMContext):
     await bot.send_message(message.chat.id, "Введите пароль:", parse_mode='Markdown')
 
 
-async def sign_in_user(message: Message, state: FSMContext):
+async def sign_in_user(message: Message, state: FSMContext, session: AsyncSession):
     """
     Проверяет введенные учетные данные пользователя и выполняет вход в систему.
 
@@ -48,13 +49,14 @@ async def sign_in_user(message: Message, state: FSMContext):
     Args:
        message (Message): Сообщение от пользователя, содержащее пароль.
        state (FSMContext): Контекст состояния для сохранения промежуточных данных.
+       session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Flow Control:
        - Обновляет состояние с паролем пользователя.
        - Извлекает все данные о пользователе из состояния.
        - Очищает состояние после завершения входа.
        - Проверяет учетные данные пользователя с помощью асинхронной функции.
-       - Если вход успешен, отправляет приветственное сообщение пользователю.
+       - Если вход успешен, выдает токен сессии чата и отправляет приветственное сообщение пользователю.
        - Если вход неудачен, отправляет сообщение об ошибке.
 
     Logging:
@@ -63,17 +65,18 @@ async def sign_in_user(message: Message, state: FSMContext):
     await state.update_data(password=message.text)
     data = await state.get_data()
     user_info = data
+    user_info["bot_user_id"] = message.from_user.id
     await state.clear()
-    logger.info(f"GET NAME - {user_info}")
-    async with get_async_session() as session:
-        response = await check_username_and_password(user_info, session)
-        if isinstance(response, User):
-            # await send_user_welcome(bot, message.chat.id, response)
-            await bot.send_message(message.chat.id,
-                                   f"Здравствуйте, {response.nickname}! Вы вошли в свой аккаунт.",
-                                   reply_markup=get_user_menu()
-                                   )
-        else:
-            await bot.send_message(
-                message.chat.id, f"Ошибка:\n{response}", parse_mode="Markdown"
-            )
+    logger.info(f"GET NAME - {user_info.get('nickname')}")
+    response = await check_username_and_password(user_info, session)
+    if isinstance(response, User):
+        await issue_session(state, response.id)
+        # await send_user_welcome(bot, message.chat.id, response)
+        await bot.send_message(message.chat.id,
+                               f"Здравствуйте, {response.nickname}! Вы вошли в свой аккаунт.",
+                               reply_markup=get_user_menu()
+                               )
+    else:
+        await bot.send_message(
+            message.chat.id, f"Ошибка:\n{response}", parse_mode="Markdown"
+        )
@@ -3,6 +3,7 @@ import logging
 from habit_bot.bot_init import bot
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 from habit_bot.button_menu import update_user_keyboard
 from habit_bot.states_group.states import UpdateProfile
 from services.handlers import record_message_id, save_update_user_data, validate_age, validate_phone_number, \
@@ -25,7 +26,7 @@ async def update_username(message: Message, state: FSMContext):
     # await record_message_id(message.chat.id, sent_message.message_id, bot_user_id)
 
 
-async def update_age(message: Message, state: FSMContext):
+async def update_age(message: Message, state: FSMContext, session: AsyncSession):
     bot_user_id = message.from_user.id
     age = message.text
     if validate_age(age):
@@ -46,10 +47,10 @@ async def update_age(message: Message, state: FSMContext):
             "Неверный формат. Введите ваш возраст цифрами от 1 до 100",
             parse_mode="Markdown"
         )
-        await record_message_id(message.chat.id, sent_message.message_id, message.from_user.id)
+        await record_message_id(message.chat.id, sent_message.message_id, message.from_user.id, session)
 
 
-async def update_phone(message: Message, state: FSMContext):
+async def update_phone(message: Message, state: FSMContext, session: AsyncSession):
     bot_user_id = message.from_user.id
     number_phone = message.text
     if validate_phone_number(number_phone):
@@ -70,10 +71,10 @@ async def update_phone(message: Message, state: FSMContext):
             "Неверный формат. Пожалуйста, введите номер телефона в формате - 89995552211",
             parse_mode="Markdown"
         )
-        await record_message_id(message.chat.id, sent_message.message_id, message.from_user.id)
+        await record_message_id(message.chat.id, sent_message.message_id, message.from_user.id, session)
 
 
-async def update_email(message: Message, state: FSMContext):
+async def update_email(message: Message, state: FSMContext, session: AsyncSession):
     bot_user_id = message.from_user.id
     email = message.text
     if validate_email(email):
@@ -94,7 +95,7 @@ async def update_email(message: Message, state: FSMContext):
             "Неверный формат. Пожалуйста, адрес электронной почты в следующем формате - example@mail.ru",
             parse_mode="Markdown"
         )
-        await record_message_id(message.chat.id, sent_message.message_id, message.from_user.id)
+        await record_message_id(message.chat.id, sent_message.message_id, message.from_user.id, session)
 
 
 async def update_city(message: Message, state: FSMContext):
@@ -109,7 +110,7 @@ async def update_city(message: Message, state: FSMContext):
 #     await record_message_id(message.chat.id, sent_message.message_id, bot_user_id)
 
 
-async def update_user_data(state: FSMContext):
+async def update_user_data(state: FSMContext, session: AsyncSession):
     data = await state.get_data()
     user_info = {
         "bot_user_id": data.get("bot_user_id"),
@@ -121,6 +122,6 @@ async def update_user_data(state: FSMContext):
     }
     logger.info(f"Start save_update_habit - {user_info}")
     await state.clear()
-    user = await save_update_user_data(user_info)
+    user = await save_update_user_data(user_info, session)
     logger.info(f"Save data habit - {user}")
     return user
\ No newline at end of file
@@ -3,13 +3,15 @@ import logging
 
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
-from app.db.database import get_async_session
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.models import User
-from habit_bot.bot_init import bot, sent_message_ids
+from habit_bot.auth_session import issue_session
+from habit_bot.bot_init import bot
 from habit_bot.button_menu import get_user_menu, get_main_menu
 from habit_bot.states_group.states import UserRegistration
 from services.handlers import create_user, record_message_id, clear_message_in_chat, validate_username, \
-    validate_phone_number, validate_email, validate_password, validate_age
+    validate_phone_number, validate_email, validate_password, validate_age, add_sent_message_ids
 
 logging.basicConfig(level=logging.INFO)
 logger: logging.Logger = logging.getLogger(__name__)
@@ -191,7 +193,7 @@ async def process_email(message: Message, state: FSMContext):
 #         await record_message_id(message.chat.id, sent_message.message_id, message.from_user.id)
 
 
-async def process_password_and_create_user(message: Message, state: FSMContext):
+async def process_password_and_create_user(message: Message, state: FSMContext, session: AsyncSession):
     """
     Обрабатывает ввод пароля пользователя и создает нового пользователя в системе.
 
@@ -202,6 +204,7 @@ async def process_password_and_create_user(message: Message, state: FSMContext):
     Args:
        message (Message): Сообщение от пользователя, содержащее пароль.
        state (FSMContext): Контекст состояния для сохранения промежуточных данных.
+       session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Flow Control:
        - Обновляет состояние с паролем пользователя.
@@ -210,7 +213,7 @@ async def process_password_and_create_user(message: Message, state: FSMContext):
        - Удаляет сообщение пользователя.
        - Отправляет сообщение с данными пользователя.
        - Создает нового пользователя в базе данных.
-       - Если создание пользователя успешно, отправляет приветственное сообщение.
+       - Если создание пользователя успешно, выдает токен сессии чата и отправляет приветственное сообщение.
        - Если создание пользователя не удалось, отправляет сообщение об ошибке и
          предлагает повторить попытку.
 
@@ -241,23 +244,23 @@ async def process_password_and_create_user(message: Message, state: FSMContext):
                                )
         # await record_message_id(message.chat.id, sent_message.message_id, bot_user_id)
 
-        async with get_async_session() as session:
-            response = await create_user(user_info, session=session)
-            if isinstance(response, User):
-                sent_message = await bot.send_message(
-                    message.chat.id, f"Добро пожаловать в нашу команду {response.nickname}!",
-                    reply_markup=get_user_menu()
-                )
-                # await record_message_id(message.chat.id, sent_message.message_id, bot_user_id)
-            else:
-                sent_message = await bot.send_message(message.chat.id, f"Ошибка:\n{response}")
-                sent_message_ids.append(sent_message.message_id)
-                sent_message = await bot.send_message(message.chat.id,
-                                       "Давайте попробуем еще раз! Нажмите 'Вход' или 'Регистрация'.",
-                                       reply_markup=get_main_menu(),
-                                       parse_mode='Markdown',
-                                       )
-                # await record_message_id(message.chat.id, sent_message.message_id, bot_user_id)
+        response = await create_user(user_info, session=session)
+        if isinstance(response, User):
+            await issue_session(state, response.id)
+            sent_message = await bot.send_message(
+                message.chat.id, f"Добро пожаловать в нашу команду {response.nickname}!",
+                reply_markup=get_user_menu()
+            )
+            # await record_message_id(message.chat.id, sent_message.message_id, bot_user_id)
+        else:
+            sent_message = await bot.send_message(message.chat.id, f"Ошибка:\n{response}")
+            await add_sent_message_ids(message.chat.id, sent_message.message_id)
+            sent_message = await bot.send_message(message.chat.id,
+                                   "Давайте попробуем еще раз! Нажмите 'Вход' или 'Регистрация'.",
+                                   reply_markup=get_main_menu(),
+                                   parse_mode='Markdown',
+                                   )
+            # await record_message_id(message.chat.id, sent_message.message_id, bot_user_id)
     else:
         try:
             await bot.delete_message(message.chat.id, message.message_id)
@@ -0,0 +1,199 @@
+"""Хранилище состояний FSM aiogram в таблице user_state."""
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models import UserState
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class StateRecord:
+    """
+    Закешированное состояние FSM одного ключа.
+
+    Атрибуты:
+        state (str | None): Текущее состояние.
+        data (dict): Данные состояния.
+    """
+    __slots__ = ("state", "data")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None):
+        self.state = state
+        self.data = data or {}
+
+
+class PostgresStorage(BaseStorage):
+    """
+    Хранилище FSM aiogram на таблице user_state с кешем и отложенной записью.
+
+    Чтение выполняется через LRU-кеш процесса: база данных запрашивается только
+    при промахе. Изменения помечают запись как измененную, а запись в базу
+    выполняется одним запросом через `flush_delay` секунд после первого изменения,
+    поэтому несколько вызовов `update_data` и `set_state` при обработке одного
+    сообщения объединяются в одну запись. Пустые состояния (после `state.clear()`)
+    удаляются из таблицы.
+
+    Кеш предполагает, что обновления одного чата обрабатывает один процесс бота.
+    При нескольких процессах (`shared=True`) кеш и отложенная запись отключаются:
+    каждое чтение выполняется из базы, а каждое изменение записывается сразу
+    и обновляет только свой столбец, поэтому процессы видят состояние друг друга.
+
+    Атрибуты:
+        session_pool: Фабрика асинхронных сессий базы данных.
+        cache_size (int): Максимальное количество записей в кеше.
+        flush_delay (float): Задержка отложенной записи в секундах.
+        shared (bool): Состояния читаются и записываются только в базе данных.
+    """
+
+    def __init__(self, session_pool, cache_size: int = 10000, flush_delay: float = 0.5,
+                 key_builder: Optional[KeyBuilder] = None, shared: bool = False):
+        self.session_pool = session_pool
+        self.shared = shared
+        self.cache_size = cache_size
+        self.flush_delay = flush_delay
+        self.key_builder = key_builder or DefaultKeyBuilder(
+            with_bot_id=True, with_business_connection_id=True, with_destiny=True
+        )
+        self._cache = OrderedDict()
+        self._dirty = set()
+        self._flush_task = None
+
+    async def _record(self, key: StorageKey) -> StateRecord:
+        storage_key = self.key_builder.build(key)
+        record = self._cache.get(storage_key)
+        if record is not None:
+            self._cache.move_to_end(storage_key)
+            return record
+
+        async with self.session_pool() as session:
+            result = await session.execute(
+                select(UserState.state, UserState.data).where(UserState.storage_key == storage_key)
+            )
+            row = result.one_or_none()
+        if self.shared:
+            return StateRecord(row.state, json.loads(row.data) if row.data else {}) if row else StateRecord()
+        # Пока шел запрос, запись могла появиться в кеше из параллельного обработчика.
+        record = self._cache.get(storage_key)
+        if record is None:
+            record = StateRecord(row.state, json.loads(row.data) if row.data else {}) if row else StateRecord()
+            self._cache[storage_key] = record
+            self._evict()
+        return record
+
+    def _evict(self):
+        # Вытесняем самые старые записи, кроме еще не записанных в базу.
+        while len(self._cache) > self.cache_size:
+            for storage_key in self._cache:
+                if storage_key not in self._dirty:
+                    del self._cache[storage_key]
+                    break
+            else:
+                return
+
+    def _mark_dirty(self, key: StorageKey):
+        self._dirty.add(self.key_builder.build(key))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.flush_delay)
+        finally:
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Записывает измененные состояния в базу данных одной транзакцией."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        upserts = []
+        deletes = []
+        for storage_key in dirty:
+            record = self._cache.get(storage_key)
+            if record is None or (record.state is None and not record.data):
+                deletes.append(storage_key)
+            else:
+                upserts.append({"storage_key": storage_key, "state": record.state, "data": json.dumps(record.data)})
+        try:
+            async with self.session_pool() as session:
+                if deletes:
+                    await session.execute(delete(UserState).where(UserState.storage_key.in_(deletes)))
+                if upserts:
+                    statement = pg_insert(UserState).values(upserts)
+                    await session.execute(statement.on_conflict_do_update(
+                        index_elements=[UserState.storage_key],
+                        set_={"state": statement.excluded.state, "data": statement.excluded.data},
+                    ))
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Не удалось сохранить состояния FSM: {e}")
+            self._dirty |= dirty
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _write(self, key: StorageKey, column: str, value: Optional[str]):
+        """
+        Сразу записывает один столбец состояния (режим `shared`).
+
+        Остальные столбцы не перезаписываются, чтобы не потерять изменение
+        из другого процесса. Пустое после записи состояние удаляется.
+
+        Args:
+            key (StorageKey): Ключ состояния.
+            column (str): Столбец "state" или "data".
+            value (str | None): Новое значение столбца.
+        """
+        storage_key = self.key_builder.build(key)
+        async with self.session_pool() as session:
+            statement = pg_insert(UserState).values(storage_key=storage_key, **{column: value})
+            await session.execute(statement.on_conflict_do_update(
+                index_elements=[UserState.storage_key], set_={column: getattr(statement.excluded, column)},
+            ))
+            await session.execute(
+                delete(UserState).where(
+                    UserState.storage_key == storage_key,
+                    UserState.state.is_(None),
+                    (UserState.data.is_(None)) | (UserState.data == "{}"),
+                )
+            )
+            await session.commit()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        if self.shared:
+            await self._write(key, "state", state)
+            return
+        record = await self._record(key)
+        record.state = state
+        self._mark_dirty(key)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._record(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        if self.shared:
+            await self._write(key, "data", json.dumps(data))
+            return
+        record = await self._record(key)
+        record.data = data.copy()
+        self._mark_dirty(key)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._record(key)).data.copy()
+
+    async def close(self) -> None:
+        """Отменяет отложенную запись и сразу сохраняет все изменения."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
@@ -1,20 +1,24 @@
+import html
 import logging
 
 from aiogram import Router
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Habit
+from habit_bot.auth_session import get_session, require_session
 from habit_bot.button_menu import (
     get_habit_list_menu,
     get_habit_info_menu,
     get_user_menu,
+    get_main_menu,
     get_confirmation_del_habit,
     create_user_menu,
     create_update_keyboard, update_user_keyboard, edit_profile_menu
 )
 from habit_bot.crud.habit.delete_habit import habit_delete
-from habit_bot.crud.habit.habit_info import get_habit_info_by_id
+from habit_bot.crud.habit.habit_info import get_habit_info_by_id, render_habit_info
 from habit_bot.crud.habit.habit_list import get_habit_list
 from habit_bot.crud.habit.update_habit import save_update_habit
 from habit_bot.crud.users.update_user_data import update_user_data
@@ -35,6 +39,7 @@ from services.handlers import (
     delete_job_reminder,
     get_not_completed_habit_list,
     save_update_user_data, add_sent_message_ids, clear_chat,
+    check_in_habit, toggle_reminder_digest,
 )
 
 logger: logging.Logger = logging.getLogger(__name__)
@@ -65,7 +70,7 @@ async def handle_main_menu(call: CallbackQuery):
     """
     bot_user_id = call.from_user.id
     if call.data == "main_menu":
-        await add_sent_message_ids(call.message.chat.id, call.id)
+        await add_sent_message_ids(call.message.chat.id, call.message.message_id)
         await clear_chat(sent_message_ids, call.message)
         sent_message = await call.message.answer("Главное меню:", reply_markup=await create_user_menu())
         await add_sent_message_ids(call.message.chat.id, sent_message.message_id)
@@ -84,7 +89,8 @@ async def handle_main_menu(call: CallbackQuery, state: FSMContext):
     Процедура выполнения:
     1. Получение идентификатора пользователя Telegram из объекта обратного вызова.
     2. В зависимости от значения данных обратного вызова:
-       - "sign_in": установка состояния `UserEntry.nickname` и запрос ввода имени и фамилии.
+       - "sign_in": при действующей сессии чата - переход в меню пользователя, иначе установка
+         состояния `UserEntry.nickname` и запрос ввода имени и фамилии.
        - "profile": установка состояния `UserRegistration.nickname` и запрос ввода имени и фамилии.
     3. Запись идентификатора нового сообщения в базу данных для последующего управления.
 
@@ -94,6 +100,10 @@ async def handle_main_menu(call: CallbackQuery, state: FSMContext):
     bot_user_id = call.from_user.id
     await clear_chat(sent_message_ids, call.message)
     if call.data == "sign_in":
+        if await get_session(state):
+            sent_message = await call.message.answer("Добро пожаловать!", reply_markup=await create_user_menu())
+            await add_sent_message_ids(call.message.chat.id, sent_message.message_id)
+            return
         await state.set_state(UserEntry.nickname)
         sent_message = await call.message.answer("Введите ваше имя и фамилию:")
         await add_sent_message_ids(call.message.chat.id, sent_message.message_id)
@@ -112,7 +122,7 @@ async def handle_main_menu(call: CallbackQuery, state: FSMContext):
         "achievements",
         "main_user_menu",
     ])
-async def handle_main_menu(call: CallbackQuery, state: FSMContext):
+async def handle_main_menu(call: CallbackQuery, state: FSMContext, session: AsyncSession):
     """
    Обработчик для различных команд меню пользователя, переключающий состояние пользователя
    и выполняющий соответствующие действия в зависимости от команды.
@@ -120,6 +130,7 @@ async def handle_main_menu(call: CallbackQuery, state: FSMContext):
    Parameters:
    call (CallbackQuery): Объект обратного вызова Telegram, содержащий информацию о сообщении и данных обратного вызова.
    state (FSMContext): Контекст состояния конечного автомата, используемый для управления состояниями пользователя.
+   session (AsyncSession): Сессия базы данных текущего обновления.
 
    Процедура выполнения:
    1. Получение идентификатора пользователя Telegram из объекта обратного вызова.
@@ -141,7 +152,7 @@ async def handle_main_menu(call: CallbackQuery, state: FSMContext):
         await add_sent_message_ids(call.message.chat.id, sent_message.message_id)
     elif call.data == "process_habit":
 
-        habit_list = await get_not_completed_habit_list(bot_user_id)
+        habit_list = await get_not_completed_habit_list(bot_user_id, session)
         if habit_list != []:
             habit_menu = await get_habit_list_menu(habit_list)
             sent_message = await call.message.answer(
@@ -162,13 +173,14 @@ async def handle_main_menu(call: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(lambda call: call.data.startswith("habit_item_"))
-async def handle_habit_item(call: CallbackQuery):
+async def handle_habit_item(call: CallbackQuery, session: AsyncSession):
     """
     Обработчик для взаимодействия с элементами привычек, отображающих информацию о привычке и
     предоставляющих меню действий.
 
     Parameters:
     call (CallbackQuery): Объект обратного вызова Telegram, содержащий информацию о сообщении и данных обратного вызова.
+    session (AsyncSession): Сессия базы данных текущего обновления.
 
     Процедура выполнения:
     1. Получение идентификатора пользователя Telegram и идентификатора привычки из данных обратного вызова.
@@ -183,7 +195,7 @@ async def handle_habit_item(call: CallbackQuery):
     """
     bot_user_id = call.from_user.id
     habit_id = int(call.data.split("_")[2])
-    habit_info = await get_habit_info_by_id(habit_id)
+    habit_info = await get_habit_info_by_id(habit_id, session)
     await clear_chat(sent_message_ids, call.message)
     sent_message = await bot.send_message(
         call.message.chat.id, f"{habit_info}", parse_mode="Markdown", reply_markup=await get_habit_info_menu(habit_id))
@@ -192,12 +204,13 @@ async def handle_habit_item(call: CallbackQuery):
 
 # Обработчик для динамических кнопок привычек
 @router.callback_query(lambda call: call.data.startswith("delete_habit_"))
-async def handle_habit_item(call: CallbackQuery):
+async def handle_habit_item(call: CallbackQuery, session: AsyncSession):
     """
    Обработчик для удаления привычки пользователя.
 
    Parameters:
    call (CallbackQuery): Объект обратного вызова Telegram, содержащий информацию о сообщении и данных обратного вызова.
+   session (AsyncSession): Сессия базы данных текущего обновления.
 
    Процедура выполнения:
    1. Получение идентификатора пользователя Telegram и идентификатора привычки из данных обратного вызова.
@@ -213,7 +226,7 @@ async def handle_habit_item(call: CallbackQuery):
    """
     bot_user_id = call.from_user.id
     habit_id = int(call.data.split("_")[2])
-    response = await get_habit_by_id(habit_id)
+    response = await get_habit_by_id(habit_id, session)
     await clear_chat(sent_message_ids, call.message)
 
     if isinstance(response, Habit):
@@ -233,14 +246,17 @@ async def handle_habit_item(call: CallbackQuery):
 
 # Обработка подтверждения удаления.
 @router.callback_query(lambda call: call.data.startswith("confirmation_"))
-async def handle_habit_item(call: CallbackQuery):
+async def handle_habit_item(call: CallbackQuery, state: FSMContext, session: AsyncSession):
     """
     Обработчик для подтверждения удаления привычки пользователя.
 
     Parameters:
     call (CallbackQuery): Объект обратного вызова Telegram, содержащий информацию о сообщении и данных обратного вызова.
+    state (FSMContext): Контекст состояния чата (проверка сессии).
+    session (AsyncSession): Сессия базы данных текущего обновления.
 
     Процедура выполнения:
+    0. Проверка действующей сессии чата; без нее привычка не удаляется.
     1. Получение идентификатора пользователя Telegram и идентификатора привычки из данных обратного вызова.
     2. Удаление привычки по идентификатору.
     3. Удаление сообщения с командой кнопки.
@@ -255,9 +271,11 @@ async def handle_habit_item(call: CallbackQuery):
     Returns:
     None
     """
+    if not await require_session(state, call.message):
+        return
     bot_user_id = call.from_user.id
     habit_id = int(call.data.split("_")[1])
-    success = await habit_delete(habit_id)
+    success = await habit_delete(habit_id, session)
 
     if success:
         sent_message = await bot.send_message(
@@ -270,7 +288,7 @@ async def handle_habit_item(call: CallbackQuery):
         await add_sent_message_ids(call.message.chat.id, sent_message.message_id)
 
         try:
-            await delete_job_reminder(habit_id)
+            await delete_job_reminder(habit_id, session)
             logger.info(f"Запись напоминания для привычки - {habit_id} успешно удалена.")
         except Exception as e:
             logger.warning(f"При удалении записи напоминания привычки - {habit_id} произошла ошибка :{e}")
@@ -285,12 +303,13 @@ async def handle_habit_item(call: CallbackQuery):
 
 # Обработка команды, если передумал удалять привычку.
 @router.callback_query(lambda call: call.data.startswith("not_confirmation"))
-async def handle_habit_item(call: CallbackQuery):
+async def handle_habit_item(call: CallbackQuery, session: AsyncSession):
     """
     Обработчик для отмены подтверждения удаления привычки пользователя и возврата к списку привычек.
 
     Parameters:
     call (CallbackQuery): Объект обратного вызова Telegram, содержащий информацию о сообщении и данных обратного вызова.
+    session (AsyncSession): Сессия базы данных текущего обновления.
 
     Процедура выполнения:
     1. Получение идентификатора пользователя Telegram.
@@ -305,7 +324,7 @@ async def handle_habit_item(call: CallbackQuery):
     """
     bot_user_id = call.from_user.id
 
-    habit_list = await get_not_completed_habit_list(bot_user_id)
+    habit_list = await get_not_completed_habit_list(bot_user_id, session)
     logger.info(f"ПОлучили данные при подтсверждении удаления - {habit_list}, botID - {bot_user_id}")
     habit_menu = await get_habit_list_menu(habit_list)
 
@@ -321,89 +340,144 @@ async def handle_habit_item(call: CallbackQuery):
     lambda call: call.data.startswith("habit_complected_")
                  or call.data.startswith("habit_not_complected_")
 )
-async def handle_habit_item(call: CallbackQuery):
+async def handle_habit_item(call: CallbackQuery, state: FSMContext, session: AsyncSession):
     """
     Обработчик для отметки привычек как выполненных или невыполненных.
 
     Parameters:
     call (CallbackQuery): Объект обратного вызова Telegram, содержащий информацию о сообщении и данных обратного вызова.
+    state (FSMContext): Контекст состояния чата (проверка сессии).
+    session (AsyncSession): Сессия базы данных текущего обновления.
 
     Процедура выполнения:
+    0. Проверка действующей сессии чата; без нее отметка не ставится.
     1. Получение идентификатора пользователя Telegram.
     2. Разделение данных обратного вызова для определения действия (выполнено или не выполнено).
     3. Удаление сообщения с командой кнопки.
     4. Очистка сообщений в чате для данного пользователя.
-    5. В зависимости от действия, отметка привычки как выполненной или невыполненной.
-    6. Получение информации о привычке и отправка сообщения с обновленной информацией.
+    5. В зависимости от действия, атомарная отметка привычки как выполненной или невыполненной.
+    6. Отправка карточки привычки по данным, которые вернула отметка.
     7. В случае, если действие неизвестно, отправка сообщения с меню пользователя.
 
     Returns:
     None
     """
+    await clear_chat(sent_message_ids, call.message)
+    if not await require_session(state, call.message):
+        return
     bot_user_id = call.from_user.id
     data_parts = call.data.split("_")
     action = data_parts[1]
-    await clear_chat(sent_message_ids, call.message)
 
-    if action == "complected":
-
-        habit_id = int(data_parts[2])
-        complected = await mark_habit_completed(habit_id)
-        if complected:
-            habit_info = await get_habit_info_by_id(habit_id)
-            sent_message = await bot.send_message(
-                call.message.chat.id, f"{habit_info}",
-                reply_markup=await get_habit_info_menu(habit_id),
-                parse_mode="Markdown",
-            )
-            await add_sent_message_ids(call.message.chat.id, sent_message.message_id)
-
-        else:
-            habit_info = await get_habit_info_by_id(habit_id)
-            sent_message = await bot.send_message(
-                call.message.chat.id,
-                f"*Сегодня вы уже ставили отметку этому заданию.*\n{habit_info}",
-                reply_markup=await get_habit_info_menu(habit_id),
-                parse_mode="Markdown",
-            )
-            await add_sent_message_ids(call.message.chat.id, sent_message.message_id)
-    elif action == "not":
-        habit_id = int(data_parts[3])
-        not_complected = await mark_habit_not_completed(habit_id)
-        if not_complected:
-            habit_info = await get_habit_info_by_id(habit_id)
-            sent_message = await bot.send_message(
-                call.message.chat.id, f"{habit_info}",
-                reply_markup=await get_habit_info_menu(habit_id),
-                parse_mode="Markdown",
-            )
-            await add_sent_message_ids(call.message.chat.id, sent_message.message_id)
+    try:
+        if action == "complected":
+            habit_id = int(data_parts[2])
+            check_in = await mark_habit_completed(habit_id, bot_user_id, session)
+        elif action == "not":
+            habit_id = int(data_parts[3])
+            check_in = await mark_habit_not_completed(habit_id, bot_user_id, session)
         else:
-            habit_info = await get_habit_info_by_id(habit_id)
             sent_message = await bot.send_message(
                 call.message.chat.id,
-                f"*Сегодня вы уже ставили отметку этому заданию.*\n{habit_info}",
-                reply_markup=await get_habit_info_menu(habit_id),
-                parse_mode="Markdown",
+                "Неизвестное действие.",
+                reply_markup=get_user_menu(),
             )
             await add_sent_message_ids(call.message.chat.id, sent_message.message_id)
-    else:
+            return
+    except ValueError as e:
+        logger.warning(f"Отметка привычки отклонена, bot_user_id - {bot_user_id}: {e}")
         sent_message = await bot.send_message(
             call.message.chat.id,
-            "Неизвестное действие.",
+            "Привычка не найдена.",
             reply_markup=get_user_menu(),
         )
         await add_sent_message_ids(call.message.chat.id, sent_message.message_id)
+        return
+
+    # Счетчики для карточки возвращаются самой отметкой, повторный запрос не нужен.
+    habit_info = render_habit_info(check_in, check_in.completed, check_in.not_completed)
+    if check_in.checked_in:
+        sent_message = await bot.send_message(
+            call.message.chat.id, f"{habit_info}",
+            reply_markup=await get_habit_info_menu(habit_id),
+            parse_mode="Markdown",
+        )
+    else:
+        sent_message = await bot.send_message(
+            call.message.chat.id,
+            f"*Сегодня вы уже ставили отметку этому заданию.*\n{habit_info}",
+            reply_markup=await get_habit_info_menu(habit_id),
+            parse_mode="Markdown",
+        )
+    await add_sent_message_ids(call.message.chat.id, sent_message.message_id)
+
+
+@router.callback_query(lambda call: call.data.startswith("reminder_done_") or call.data.startswith("reminder_skip_"))
+async def handle_reminder_check_in(call: CallbackQuery, session: AsyncSession):
+    """
+    Обработчик кнопок "Выполнено" и "Пропустить" в сообщении с напоминанием
+    (в том числе в сводке напоминаний нескольких привычек).
+
+    Parameters:
+    call (CallbackQuery): Объект обратного вызова Telegram, содержащий информацию о сообщении и данных обратного вызова.
+    session (AsyncSession): Сессия базы данных текущего обновления.
+
+    Действующая сессия чата не требуется: напоминание приходит в любое время, часто
+    спустя часы после входа, и кнопки должны работать без повторного входа. Право на
+    отметку проверяет `check_in_habit` по пользователю, нажавшему кнопку.
+
+    Процедура выполнения:
+    1. Разделение данных обратного вызова для определения действия и идентификатора привычки.
+    2. Атомарная отметка привычки как выполненной или невыполненной (`check_in_habit`) - только
+       привычки пользователя, нажавшего кнопку. Если привычка не найдена или принадлежит другому
+       пользователю, показывается уведомление об ошибке, и сообщение с напоминанием не меняется.
+    3. Изменение сообщения с напоминанием: к тексту добавляется результат отметки, кнопки этой
+       привычки убираются, кнопки остальных привычек сводки остаются.
+       Чат не очищается, и новые сообщения не отправляются.
+
+    Returns:
+    None
+    """
+    _, action, habit_id = call.data.split("_")
+    completed = action == "done"
+    check_in = await check_in_habit(int(habit_id), completed, call.from_user.id, session)
+    if check_in is None:
+        # Привычка удалена или принадлежит другому пользователю: сообщение не меняем.
+        await call.answer("Привычка не найдена.", show_alert=True)
+        return
+    habit_buttons = {f"reminder_done_{habit_id}", f"reminder_skip_{habit_id}"}
+    keyboard = [
+        row for row in call.message.reply_markup.inline_keyboard
+        if not any(button.callback_data in habit_buttons for button in row)
+    ] if call.message.reply_markup else []
+
+    if check_in.checked_in and completed:
+        status = f"✅ Выполнено! Серия - {check_in.current_streak} дней (лучшая - {check_in.longest_streak})."
+    elif check_in.checked_in:
+        status = "⏭ Пропущено."
+    elif check_in.duration <= check_in.count_remained_day:
+        status = "Привычка уже сформирована."
+    else:
+        status = "Сегодня вы уже ставили отметку этому заданию."
+    status = f"{check_in.habit_name}: {status}"
+
+    await call.message.edit_text(
+        f"{call.message.html_text}\n\n<b>{html.escape(status)}</b>",
+        parse_mode="HTML",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None,
+    )
+    await call.answer()
 
 
 @router.callback_query(
     lambda call: call.data.startswith("update_habit_"))
-async def handle_habit_item(call: CallbackQuery):
+async def handle_habit_item(call: CallbackQuery, session: AsyncSession):
     """
     Обработчик для обновления информации о привычке.
 
     Parameters:
     call (CallbackQuery): Объект обратного вызова Telegram, содержащий информацию о сообщении и данных обратного вызова.
+    session (AsyncSession): Сессия базы данных текущего обновления.
 
     Процедура выполнения:
     1. Получение идентификатора пользователя Telegram.
@@ -420,7 +494,7 @@ async def handle_habit_item(call: CallbackQuery):
     data_parts = call.data.split("_")
     habit_id = data_parts[2]
     logger.info(f"Habit update - {habit_id}")
-    habit_info = await get_habit_info_by_id(int(habit_id))
+    habit_info = await get_habit_info_by_id(int(habit_id), session)
     await clear_chat(sent_message_ids, call.message)
     sent_message = await bot.send_message(
         call.message.chat.id, f"*Выберите что хотите изменить.*\n{habit_info}",
@@ -438,13 +512,14 @@ async def handle_habit_item(call: CallbackQuery):
                  call.data.startswith("reminder_time_") or
                  call.data.startswith("update_save_")
 )
-async def update_habit_callback(call: CallbackQuery, state: FSMContext):
+async def update_habit_callback(call: CallbackQuery, state: FSMContext, session: AsyncSession):
     """
     Обработчик для обновления информации о привычке.
 
     Parameters:
     call (CallbackQuery): Объект обратного вызова Telegram, содержащий информацию о сообщении и данных обратного вызова.
     state (FSMContext): Контекст состояния для управления состояниями пользователя.
+    session (AsyncSession): Сессия базы данных текущего обновления.
 
     Процедура выполнения:
     1. Получение идентификатора пользователя Telegram.
@@ -454,7 +529,8 @@ async def update_habit_callback(call: CallbackQuery, state: FSMContext):
     5. В зависимости от типа действия (название, описание, длительность, время напоминания, сохранение):
        - Запрашивает соответствующую информацию у пользователя.
        - Обновляет состояние пользователя для дальнейшей обработки.
-    6. При успешном обновлении привычки отправляет подтверждение, в противном случае сообщает об ошибке.
+    6. Сохранение выполняется только при действующей сессии чата. При успешном обновлении привычки
+       отправляет подтверждение, в противном случае сообщает об ошибке.
 
     Returns:
     None
@@ -499,9 +575,11 @@ async def update_habit_callback(call: CallbackQuery, state: FSMContext):
 
     elif call.data.startswith("update_save_"):
         await clear_chat(sent_message_ids, call.message)
-        upd_habit = await save_update_habit(state)
+        if not await require_session(state, call.message):
+            return
+        upd_habit = await save_update_habit(state, session)
         if upd_habit:
-            habit_list = await get_not_completed_habit_list(bot_user_id)
+            habit_list = await get_not_completed_habit_list(bot_user_id, session)
             habit_menu = await get_habit_list_menu(habit_list)
 
             sent_message = await call.message.answer(
@@ -531,6 +609,35 @@ async def handle_edit_profile(call: CallbackQuery):
 
 
 
+@router.callback_query(lambda call: call.data.startswith("reminder_digest_"))
+async def handle_reminder_digest(call: CallbackQuery, state: FSMContext, session: AsyncSession):
+    """
+    Обработчик переключения режима напоминаний: одним сообщением или по одной привычке.
+
+    Режим хранится в профиле, поэтому, как и другие изменения профиля, требует действующей сессии.
+
+    Parameters:
+    call (CallbackQuery): Объект обратного вызова Telegram, содержащий информацию о сообщении и данных обратного вызова.
+    state (FSMContext): Контекст состояния чата (проверка сессии).
+    session (AsyncSession): Сессия базы данных текущего обновления.
+
+    Returns:
+    None
+    """
+    if not await require_session(state, call.message):
+        await call.answer()
+        return
+    bot_user_id = call.from_user.id
+    await toggle_reminder_digest(bot_user_id, session)
+    user_info = await get_user_info(bot_user_id, session)
+    await call.message.edit_text(
+        f"*Профиль:* \n{user_info}",
+        reply_markup=await edit_profile_menu(bot_user_id),
+        parse_mode="Markdown",
+    )
+    await call.answer()
+
+
 @router.callback_query(
     lambda call: call.data.startswith("user_name_") or
                  call.data.startswith("user_age_") or
@@ -539,7 +646,7 @@ async def handle_edit_profile(call: CallbackQuery):
                  call.data.startswith("user_city_") or
                 call.data.startswith("save_user_data_")
 )
-async def update_habit_callback(call: CallbackQuery, state: FSMContext):
+async def update_habit_callback(call: CallbackQuery, state: FSMContext, session: AsyncSession):
     bot_user_id = call.from_user.id
     await state.update_data(bot_user_id=bot_user_id)
     await clear_chat(sent_message_ids, call.message)
@@ -572,9 +679,17 @@ async def update_habit_callback(call: CallbackQuery, state: FSMContext):
     elif call.data.startswith("save_user_data_"):
         await clear_chat(sent_message_ids, call.message)
         bot_user_id = call.from_user.id
-        upd_user = await update_user_data(state)
+        if not await get_session(state):
+            await state.clear()
+            sent_message = await call.message.answer(
+                "Сессия истекла. Войдите в аккаунт, чтобы сохранить изменения профиля.",
+                reply_markup=get_main_menu()
+            )
+            await add_sent_message_ids(call.message.chat.id, sent_message.message_id)
+            return
+        upd_user = await update_user_data(state, session)
         if upd_user:
-            user_info = await get_user_info(bot_user_id)
+            user_info = await get_user_info(bot_user_id, session)
             sent_message = await call.message.answer(
                 f"Данные успешно обновлены!\n{user_info}",
                 reply_markup=await edit_profile_menu(bot_user_id),
@@ -4,14 +4,14 @@ from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_async_session
-from app.models import User
+from habit_bot.auth_session import get_session
 from habit_bot.bot_init import bot, sent_message_ids
 from habit_bot.button_menu import create_user_menu, get_habit_list_menu, sign_in_menu, sign_up_menu, edit_profile_menu
 from habit_bot.crud.users.user_info import get_user_info
-from habit_bot.states_group.states import UserRegistration, CreateHabit
-from services.handlers import get_completed_habit_list, get_user_by_bot_user_id, get_not_completed_habit_list, \
+from habit_bot.states_group.states import UserRegistration, UserEntry, CreateHabit
+from services.handlers import get_completed_habit_list, update_user_chat_id, get_not_completed_habit_list, \
     add_sent_message_ids, delete_message_ids, clear_chat
 
 logging.basicConfig(level=logging.INFO)
@@ -21,7 +21,7 @@ router = Router()
 
 
 @router.message(Command(commands=['start']))
-async def start(message: Message):
+async def start(message: Message, session: AsyncSession):
     """
     Обрабатывает команду '/start' от пользователя.
 
@@ -33,6 +33,7 @@ async def start(message: Message):
 
     Args:
     message (Message): Сообщение от пользователя, содержащие команду '/start'.
+    session (AsyncSession): Сессия базы данных текущего обновления.
 
     Returns:
     None
@@ -41,14 +42,9 @@ async def start(message: Message):
     chat_id = message.chat.id
     logger.info(f"message.chat.id - {message.chat.id}, message_id - {message.message_id}")
 
-    user = await get_user_by_bot_user_id(bot_user_id)
+    user = await update_user_chat_id(bot_user_id, chat_id, session)
 
-    if isinstance(user, User):
-        async with get_async_session() as session:
-            user = await get_user_by_bot_user_id(bot_user_id)
-            user.chat_id = chat_id
-            session.add(user)
-            await session.commit()
+    if user:
         sent_message = await message.answer(
            f"Вы уже зарегистрированы нажмите кнопку 'Войти' ⬇️",
            reply_markup=await sign_in_menu(),
@@ -180,16 +176,18 @@ async def user_registration(message: Message, state: FSMContext):
 
 
 @router.message(lambda message: message.text == '📖 Войти')
-async def entry_user(message: Message):
+async def entry_user(message: Message, state: FSMContext):
     """
     Обрабатывает запрос пользователя на вход в систему.
 
     Эта функция выполняет следующие действия:
     1. Удаляет сообщение с текстом '📖 Войти' для поддержания чистоты чата.
-    2. Отправляет приветственное сообщение пользователю и предоставляет меню с опциями.
+    2. Если у чата есть действующая сессия, отправляет приветственное сообщение и меню с опциями.
+    3. Иначе запрашивает никнейм и пароль для входа.
 
     Args:
         message (Message): Сообщение от пользователя, инициирующее вход в систему.
+        state (FSMContext): Контекст состояния пользователя.
 
     Returns:
         None
@@ -197,12 +195,16 @@ async def entry_user(message: Message):
     bot_user_id = message.from_user.id
     await add_sent_message_ids(message.chat.id, message.message_id)
     await clear_chat(sent_message_ids, message)
-    sent_message = await message.answer("Добро пожаловать!", reply_markup=await create_user_menu())
+    if await get_session(state):
+        sent_message = await message.answer("Добро пожаловать!", reply_markup=await create_user_menu())
+    else:
+        await state.set_state(UserEntry.nickname)
+        sent_message = await message.answer("Введите ваш никнейм:")
     await add_sent_message_ids(message.chat.id, sent_message.message_id)
 
 
 @router.message(lambda message: message.text == 'Незавершенные привычки')
-async def entry_user(message: Message):
+async def entry_user(message: Message, session: AsyncSession):
     """
     Обрабатывает запрос пользователя на отображение незавершенных привычек.
 
@@ -214,6 +216,7 @@ async def entry_user(message: Message):
 
     Args:
         message (Message): Сообщение от пользователя, инициирующее запрос на отображение незавершенных привычек.
+        session (AsyncSession): Сессия базы данных текущего обновления.
 
     Returns:
         None
@@ -221,7 +224,7 @@ async def entry_user(message: Message):
     bot_user_id = message.from_user.id
     await add_sent_message_ids(message.chat.id, message.message_id)
     await clear_chat(sent_message_ids, message)
-    habit_list = await get_not_completed_habit_list(bot_user_id)
+    habit_list = await get_not_completed_habit_list(bot_user_id, session)
     if habit_list != []:
         habit_menu = await get_habit_list_menu(habit_list)
         sent_message = await message.answer(
@@ -261,7 +264,7 @@ async def entry_user(message: Message, state: FSMContext):
 
 
 @router.message(lambda message: message.text == "Завершенные привычки")
-async def completed_habits(message: Message):
+async def completed_habits(message: Message, session: AsyncSession):
     """
     Обрабатывает запрос пользователя на получение списка завершенных привычек.
 
@@ -272,6 +275,7 @@ async def completed_habits(message: Message):
 
     Args:
         message (Message): Сообщение от пользователя, инициирующее запрос на отображение завершенных привычек.
+        session (AsyncSession): Сессия базы данных текущего обновления.
 
     Returns:
         None
@@ -279,7 +283,7 @@ async def completed_habits(message: Message):
     bot_user_id = message.from_user.id
     await add_sent_message_ids(message.chat.id, message.message_id)
     await clear_chat(sent_message_ids, message)
-    completed_list = await get_completed_habit_list(bot_user_id)
+    completed_list = await get_completed_habit_list(bot_user_id, session)
     if completed_list is None:
         sent_message = await message.answer(
             "У вас нет еще ни одной завершенной привычки.",
@@ -298,12 +302,12 @@ async def completed_habits(message: Message):
 
 
 @router.message(lambda message: message.text == 'Профиль')
-async def user_info(message: Message):
+async def user_info(message: Message, session: AsyncSession):
     logger.info("Start get profile")
     bot_user_id = message.from_user.id
     await add_sent_message_ids(message.chat.id, message.message_id)
     await clear_chat(sent_message_ids, message)
-    user_info = await get_user_info(bot_user_id)
+    user_info = await get_user_info(bot_user_id, session)
     if user_info:
         sent_message = await message.answer(
             f"*Профиль:* \n{user_info}",
@@ -3,6 +3,7 @@ import logging
 from aiogram import Router
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from habit_bot.crud.habit.create_habit import (
     process_duration,
@@ -42,7 +43,7 @@ router = Router()
 
 
 @router.message(lambda message: True)
-async def handle_message(message: Message, state: FSMContext):
+async def handle_message(message: Message, state: FSMContext, session: AsyncSession):
     """
     Обрабатывает входящие сообщения от пользователей в зависимости от их текущего состояния.
 
@@ -53,6 +54,7 @@ async def handle_message(message: Message, state: FSMContext):
     Args:
         message (Message): Сообщение, отправленное пользователем.
         state (FSMContext): Контекст состояния для отслеживания состояния пользователя.
+        session (AsyncSession): Сессия базы данных текущего обновления (из DbSessionMiddleware).
 
     Logs:
         - Записывает идентификатор пользователя и текущее состояние в лог.
@@ -96,12 +98,12 @@ async def handle_message(message: Message, state: FSMContext):
     elif current_state == UserRegistration.email:
         await process_email(message, state)
     elif current_state == UserRegistration.password:
-        await process_password_and_create_user(message, state)
+        await process_password_and_create_user(message, state, session)
 
     elif current_state == UserEntry.nickname:
         await entering_the_password(message, state)
     elif current_state == UserEntry.password:
-        await sign_in_user(message, state)
+        await sign_in_user(message, state, session)
 
     elif current_state == CreateHabit.habit_name:
         await process_habit_name(message, state)
@@ -110,7 +112,7 @@ async def handle_message(message: Message, state: FSMContext):
     elif current_state == CreateHabit.comments:
         await process_comments(message, state)
     elif current_state == CreateHabit.reminder_time:
-        await process_reminder_time_and_create_habit(message, state)
+        await process_reminder_time_and_create_habit(message, state, session)
 
     elif current_state == UpdateHabit.habit_name:
         await update_habit_name(message, state)
@@ -121,17 +123,17 @@ async def handle_message(message: Message, state: FSMContext):
     elif current_state == UpdateHabit.reminder_time:
         await update_habit_reminder(message, state)
     elif current_state == UpdateHabit.save_update:
-        await save_update_habit(state)
+        await save_update_habit(state, session)
 
     elif current_state == UpdateProfile.fullname:
         await update_username(message, state)
     elif current_state == UpdateProfile.age:
-        await update_age(message, state)
+        await update_age(message, state, session)
     elif current_state == UpdateProfile.phone:
-        await update_phone(message, state)
+        await update_phone(message, state, session)
     elif current_state == UpdateProfile.email:
-        await update_email(message, state)
+        await update_email(message, state, session)
     elif current_state == UpdateProfile.city:
         await update_city(message, state)
     elif current_state == UpdateProfile.save_update:
-        await update_user_data(state)
\ No newline at end of file
+        await update_user_data(state, session)
\ No newline at end of file
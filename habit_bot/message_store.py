@@ -0,0 +1,332 @@
+"""Хранилище идентификаторов сообщений, которые бот удаляет при очистке чата."""
+import asyncio
+import logging
+import time
+from array import array
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models import TrackedMessage
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class DbMessageBackend:
+    """
+    Постоянное хранилище отслеживаемых сообщений в таблице tracked_message.
+
+    Атрибуты:
+        session_pool: Фабрика асинхронных сессий базы данных.
+    """
+
+    def __init__(self, session_pool):
+        self.session_pool = session_pool
+
+    async def load(self, ttl: float):
+        """
+        Возвращает сообщения, добавленные не раньше `ttl` секунд назад.
+
+        Args:
+            ttl (float): Время жизни записи в секундах.
+
+        Returns:
+            list[tuple[int, int]]: Пары (идентификатор чата, идентификатор сообщения).
+        """
+        since = datetime.now() - timedelta(seconds=ttl)
+        async with self.session_pool() as session:
+            result = await session.execute(
+                select(TrackedMessage.chat_id, TrackedMessage.message_id)
+                .where(TrackedMessage.created_at >= since)
+                .order_by(TrackedMessage.created_at)
+            )
+            return result.all()
+
+    async def save(self, added, cleared_chats, ttl: float):
+        """
+        Записывает накопленные изменения одной транзакцией.
+
+        Сначала удаляются сообщения очищенных чатов и устаревшие записи,
+        затем вставляются новые сообщения.
+
+        Args:
+            added (dict[int, list[int]]): Добавленные сообщения по чатам.
+            cleared_chats (set[int]): Чаты, список сообщений которых был очищен.
+            ttl (float): Время жизни записи в секундах.
+        """
+        async with self.session_pool() as session:
+            if cleared_chats:
+                await session.execute(delete(TrackedMessage).where(TrackedMessage.chat_id.in_(cleared_chats)))
+            await session.execute(
+                delete(TrackedMessage).where(TrackedMessage.created_at < datetime.now() - timedelta(seconds=ttl))
+            )
+            if added:
+                rows = [
+                    {"chat_id": chat_id, "message_id": message_id}
+                    for chat_id, message_ids in added.items() for message_id in message_ids
+                ]
+                await session.execute(pg_insert(TrackedMessage).values(rows).on_conflict_do_nothing())
+            await session.commit()
+
+    async def delete_expired(self, ttl: float):
+        """
+        Удаляет устаревшие записи.
+
+        Args:
+            ttl (float): Время жизни записи в секундах.
+        """
+        async with self.session_pool() as session:
+            await session.execute(
+                delete(TrackedMessage).where(TrackedMessage.created_at < datetime.now() - timedelta(seconds=ttl))
+            )
+            await session.commit()
+
+    async def add(self, chat_id: int, message_id: int):
+        """
+        Сразу записывает одно сообщение чата.
+
+        Args:
+            chat_id (int): Идентификатор чата.
+            message_id (int): Идентификатор сообщения.
+        """
+        async with self.session_pool() as session:
+            await session.execute(
+                pg_insert(TrackedMessage).values(chat_id=chat_id, message_id=message_id).on_conflict_do_nothing()
+            )
+            await session.commit()
+
+    async def take(self, chat_id: int, ttl: float) -> list[int]:
+        """
+        Забирает и удаляет все сообщения чата одним запросом.
+
+        Args:
+            chat_id (int): Идентификатор чата.
+            ttl (float): Время жизни записи в секундах; более старые сообщения удаляются, но не возвращаются.
+
+        Returns:
+            list[int]: Идентификаторы сообщений по возрастанию.
+        """
+        since = datetime.now() - timedelta(seconds=ttl)
+        async with self.session_pool() as session:
+            result = await session.execute(
+                delete(TrackedMessage)
+                .where(TrackedMessage.chat_id == chat_id)
+                .returning(TrackedMessage.message_id, TrackedMessage.created_at)
+            )
+            rows = result.all()
+            await session.commit()
+        return sorted(message_id for message_id, created_at in rows if created_at >= since)
+
+
+class MessageStore:
+    """
+    Ограниченное хранилище идентификаторов отправленных сообщений по чатам.
+
+    Идентификаторы хранятся в `array('q')` на чат, количество сообщений чата
+    ограничено `chat_cap` (старые вытесняются), а чаты без новых сообщений
+    дольше `ttl` секунд удаляются целиком: удалить такие сообщения бот уже не сможет.
+    При наличии `backend` изменения накапливаются и записываются в фоне
+    (write-behind) раз в `flush_interval` секунд.
+
+    В общем режиме (`shared=True`, несколько процессов bot-worker) обновления
+    одного чата могут обрабатываться разными процессами, поэтому сообщения
+    не хранятся в памяти: `track` сразу записывает сообщение в `backend`,
+    а `take` забирает сообщения чата из него.
+
+    Атрибуты:
+        chat_cap (int): Максимальное количество сообщений одного чата.
+        ttl (float): Время жизни списка сообщений чата в секундах.
+        backend (DbMessageBackend | None): Постоянное хранилище.
+        flush_interval (float): Интервал фоновой записи изменений в секундах.
+        shared (bool): Сообщения читаются и изменяются только в `backend`.
+    """
+
+    # Через сколько добавлений выполняется очистка устаревших чатов.
+    EVICT_EVERY = 1000
+
+    def __init__(self, chat_cap: int, ttl: float, backend: DbMessageBackend = None, flush_interval: float = 5,
+                 shared: bool = False):
+        if shared and backend is None:
+            raise ValueError("Общему хранилищу сообщений нужен backend")
+        self.chat_cap = chat_cap
+        self.ttl = ttl
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.shared = shared
+        self._messages = {}
+        self._touched = {}
+        # Сообщения, еще не записанные в backend, по чатам.
+        self._added = {}
+        self._cleared = set()
+        self._adds_since_evict = 0
+        self._flush_task = None
+
+    def __contains__(self, chat_id):
+        return chat_id in self._messages
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __repr__(self):
+        return f"MessageStore(chats={len(self._messages)}, messages={sum(map(len, self._messages.values()))})"
+
+    def _append(self, chat_id, message_id):
+        messages = self._messages.get(chat_id)
+        if messages is None:
+            messages = self._messages[chat_id] = array('q')
+        messages.append(message_id)
+        if len(messages) > self.chat_cap:
+            del messages[:len(messages) - self.chat_cap]
+        self._touched[chat_id] = time.monotonic()
+
+    def add(self, chat_id: int, message_id: int):
+        """
+        Запоминает сообщение чата для последующего удаления.
+
+        Args:
+            chat_id (int): Идентификатор чата.
+            message_id (int): Идентификатор сообщения.
+        """
+        message_id = int(message_id)
+        self._append(chat_id, message_id)
+        if self.backend is not None:
+            self._added.setdefault(chat_id, []).append(message_id)
+        self._adds_since_evict += 1
+        if self._adds_since_evict >= self.EVICT_EVERY:
+            self.evict_expired()
+
+    def get(self, chat_id: int, default=()):
+        """
+        Возвращает сообщения чата без их удаления из хранилища.
+
+        Args:
+            chat_id (int): Идентификатор чата.
+            default: Значение, если сообщений чата нет.
+
+        Returns:
+            list[int]: Идентификаторы сообщений.
+        """
+        messages = self._messages.get(chat_id)
+        return messages.tolist() if messages is not None else default
+
+    def pop(self, chat_id: int) -> list[int]:
+        """
+        Забирает и удаляет из хранилища все сообщения чата.
+
+        Args:
+            chat_id (int): Идентификатор чата.
+
+        Returns:
+            list[int]: Идентификаторы сообщений.
+        """
+        messages = self._messages.pop(chat_id, None)
+        self._touched.pop(chat_id, None)
+        if self.backend is not None:
+            self._added.pop(chat_id, None)
+            self._cleared.add(chat_id)
+        return messages.tolist() if messages is not None else []
+
+    async def track(self, chat_id: int, message_id: int):
+        """
+        Запоминает сообщение чата; в общем режиме сразу записывает его в `backend`.
+
+        Args:
+            chat_id (int): Идентификатор чата.
+            message_id (int): Идентификатор сообщения.
+        """
+        if self.shared:
+            await self.backend.add(chat_id, int(message_id))
+        else:
+            self.add(chat_id, message_id)
+
+    async def take(self, chat_id: int) -> list[int]:
+        """
+        Забирает и удаляет все сообщения чата; в общем режиме - из `backend`.
+
+        Args:
+            chat_id (int): Идентификатор чата.
+
+        Returns:
+            list[int]: Идентификаторы сообщений (не больше `chat_cap` последних).
+        """
+        if self.shared:
+            return (await self.backend.take(chat_id, self.ttl))[-self.chat_cap:]
+        return self.pop(chat_id)
+
+    def evict_expired(self):
+        """
+        Удаляет чаты, в которые не добавлялись сообщения дольше `ttl` секунд.
+
+        Returns:
+            int: Количество удаленных чатов.
+        """
+        self._adds_since_evict = 0
+        deadline = time.monotonic() - self.ttl
+        expired = [chat_id for chat_id, touched in self._touched.items() if touched < deadline]
+        for chat_id in expired:
+            del self._messages[chat_id]
+            del self._touched[chat_id]
+        return len(expired)
+
+    async def load(self):
+        """
+        Загружает сообщения из постоянного хранилища (например, после перезапуска).
+
+        Returns:
+            int: Количество загруженных сообщений.
+        """
+        if self.backend is None:
+            return 0
+        rows = await self.backend.load(self.ttl)
+        for chat_id, message_id in rows:
+            self._append(chat_id, message_id)
+        logger.info(f"Загружено отслеживаемых сообщений - {len(rows)}")
+        return len(rows)
+
+    async def flush(self):
+        """Записывает накопленные изменения в постоянное хранилище."""
+        if self.backend is None or not (self._added or self._cleared):
+            return
+        added, cleared = self._added, self._cleared
+        self._added, self._cleared = {}, set()
+        try:
+            await self.backend.save(added, cleared, self.ttl)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить отслеживаемые сообщения: {e}")
+            # Возвращаем изменения, чтобы записать их при следующей попытке; сообщения чатов,
+            # очищенных во время записи, уже не нужны.
+            cleared_meanwhile = self._cleared
+            self._cleared = cleared | cleared_meanwhile
+            for chat_id, message_ids in added.items():
+                if chat_id not in cleared_meanwhile:
+                    self._added[chat_id] = message_ids + self._added.get(chat_id, [])
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self.shared:
+                # В общем режиме в памяти ничего не накапливается, остается удалить устаревшие записи.
+                try:
+                    await self.backend.delete_expired(self.ttl)
+                except Exception as e:
+                    logger.error(f"Не удалось удалить устаревшие отслеживаемые сообщения: {e}")
+                continue
+            self.evict_expired()
+            await self.flush()
+
+    async def start(self):
+        """Загружает сохраненные сообщения и запускает фоновую запись изменений."""
+        if self.backend is None or self._flush_task is not None:
+            return
+        if not self.shared:
+            await self.load()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Останавливает фоновую запись и сохраняет оставшиеся изменения."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
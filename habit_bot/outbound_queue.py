@@ -0,0 +1,288 @@
+"""Очередь исходящих запросов к Telegram с ограничением скорости и приоритетами."""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import DeleteMessage, DeleteMessages, EditMessageText
+
+from config import (
+    TELEGRAM_PROCESS_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST,
+    TELEGRAM_SEND_WORKERS, TELEGRAM_MAX_RETRIES,
+)
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Приоритеты исходящих запросов: меньшее значение отправляется раньше.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+send_priority: ContextVar[int] = ContextVar("send_priority", default=PRIORITY_INTERACTIVE)
+
+# Запросы, которые не создают новых сообщений и не расходуют лимит отправки в чат.
+CHAT_LIMIT_EXEMPT_METHODS = (DeleteMessage, DeleteMessages, EditMessageText)
+
+
+@contextmanager
+def background_priority():
+    """
+    Отправляет запросы внутри блока с фоновым приоритетом (например, напоминания).
+
+    Использование:
+        with background_priority():
+            await bot.send_message(...)
+    """
+    token = send_priority.set(PRIORITY_BACKGROUND)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Ограничитель скорости по алгоритму token bucket.
+
+    Атрибуты:
+        rate (float): Количество токенов, добавляемых в секунду.
+        capacity (float): Максимальное количество накопленных токенов (допустимый всплеск).
+        tokens (float): Текущее количество токенов.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    @property
+    def idle(self) -> bool:
+        """Bucket заполнен полностью, то есть давно не использовался."""
+        self._refill()
+        return self.tokens >= self.capacity
+
+    def delay(self) -> float:
+        """Возвращает время в секундах до появления токена (0, если токен уже есть)."""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def try_acquire(self) -> bool:
+        """Забирает токен, если он есть, не ожидая."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self):
+        """Ожидает и забирает один токен."""
+        while not self.try_acquire():
+            await asyncio.sleep(self.delay())
+
+
+class ChatQueue:
+    """
+    Очередь запросов одного чата.
+
+    Атрибуты:
+        items (list): Куча запросов (приоритет, порядковый номер, время постановки, make_request,
+                      bot, method, future).
+        bucket (TokenBucket): Лимит отправки сообщений в чат.
+        active (bool): Чат стоит в очереди готовых чатов, ожидает токена или обрабатывается воркером.
+    """
+
+    __slots__ = ("items", "bucket", "active")
+
+    def __init__(self, bucket: TokenBucket):
+        self.items = []
+        self.bucket = bucket
+        self.active = False
+
+
+class OutboundQueue(BaseRequestMiddleware):
+    """
+    Middleware сессии бота, пропускающий запросы к чатам через общую очередь.
+
+    Запросы, адресованные чату (у метода есть `chat_id`), ставятся в очередь
+    своего чата. В общую очередь с приоритетом попадают чаты, у которых есть
+    запросы и доступен токен лимита чата; пул воркеров берет из нее чат и
+    отправляет один его запрос с учетом общего лимита. Чат, исчерпавший лимит,
+    возвращается в общую очередь по таймеру, поэтому воркеры не ожидают лимит
+    одного чата и не задерживают остальные чаты. Чат обрабатывается не более
+    чем одним воркером одновременно, поэтому порядок запросов чата сохраняется.
+
+    Общий лимит действует в пределах процесса, поэтому по умолчанию это доля общего
+    лимита бота на один отправляющий процесс (TELEGRAM_PROCESS_RATE).
+
+    Удаление и редактирование сообщений (CHAT_LIMIT_EXEMPT_METHODS) не расходует
+    лимит чата. При ответе 429 отправка приостанавливается на `retry_after`
+    секунд, и запрос повторяется. Остальные запросы (getUpdates, answerCallbackQuery
+    и т.п.) проходят напрямую.
+
+    Атрибуты:
+        workers (int): Количество воркеров отправки.
+        max_retries (int): Максимальное количество повторов при 429.
+    """
+
+    # Порог количества очередей чатов, после которого удаляются неиспользуемые.
+    MAX_IDLE_CHAT_QUEUES = 10000
+
+    def __init__(self, global_rate: float = TELEGRAM_PROCESS_RATE, chat_rate: float = TELEGRAM_CHAT_RATE,
+                 chat_burst: float = TELEGRAM_CHAT_BURST, workers: int = TELEGRAM_SEND_WORKERS,
+                 max_retries: int = TELEGRAM_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = workers
+        self.max_retries = max_retries
+        self._chats = {}
+        self._ready = None
+        self._tasks = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self.pending = 0
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.deferred = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        self._ensure_workers()
+        future = asyncio.get_running_loop().create_future()
+        chat = self._chat_queue(chat_id)
+        heapq.heappush(
+            chat.items,
+            (send_priority.get(), next(self._sequence), time.perf_counter(), make_request, bot, method, future),
+        )
+        self.enqueued += 1
+        self.pending += 1
+        if not chat.active:
+            chat.active = True
+            self._schedule(chat_id, chat)
+        return await future
+
+    def _ensure_workers(self):
+        if self._ready is None:
+            self._ready = asyncio.PriorityQueue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _chat_queue(self, chat_id) -> ChatQueue:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if len(self._chats) >= self.MAX_IDLE_CHAT_QUEUES:
+                # Удаляются только очереди без запросов, которые не обрабатываются и не ожидают токена.
+                self._chats = {
+                    key: value for key, value in self._chats.items()
+                    if value.active or value.items or not value.bucket.idle
+                }
+            chat = self._chats[chat_id] = ChatQueue(TokenBucket(self.chat_rate, self.chat_burst))
+        return chat
+
+    def _schedule(self, chat_id, chat: ChatQueue):
+        """Ставит чат в очередь готовых сразу или по таймеру, когда появится токен лимита чата."""
+        if self._ready is None:
+            return
+        priority, sequence, *_, method, _ = chat.items[0]
+        delay = 0.0 if isinstance(method, CHAT_LIMIT_EXEMPT_METHODS) else chat.bucket.delay()
+        if delay > 0:
+            self.deferred += 1
+            asyncio.get_running_loop().call_later(delay, self._schedule, chat_id, chat)
+        else:
+            self._ready.put_nowait((priority, sequence, chat_id))
+
+    async def _worker(self):
+        while True:
+            _, _, chat_id = await self._ready.get()
+            chat = self._chats[chat_id]
+            _, _, enqueued_at, make_request, bot, method, future = chat.items[0]
+            if not isinstance(method, CHAT_LIMIT_EXEMPT_METHODS) and not chat.bucket.try_acquire():
+                self._schedule(chat_id, chat)
+                continue
+            heapq.heappop(chat.items)
+            self.pending -= 1
+            try:
+                response = await self._send(chat_id, make_request, bot, method)
+                if not future.done():
+                    future.set_result(response)
+                self.sent += 1
+            except Exception as e:
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                latency = time.perf_counter() - enqueued_at
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+                if chat.items:
+                    self._schedule(chat_id, chat)
+                else:
+                    chat.active = False
+
+    async def _send(self, chat_id, make_request, bot, method):
+        attempt = 0
+        while True:
+            await self.global_bucket.acquire()
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                self.retries += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(f"Telegram flood control: пауза {e.retry_after} c. (чат {chat_id})")
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+
+    async def close(self):
+        """Останавливает воркеры очереди."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._ready = None
+        self._chats = {}
+        self.pending = 0
+
+    def get_stats(self) -> dict:
+        """
+        Возвращает метрики очереди.
+
+        Returns:
+            dict: Глубина очереди, количество чатов, ожидающих отправки, количество отправленных,
+                  неудачных, повторенных и отложенных по лимиту чата запросов, среднее
+                  и максимальное время от постановки в очередь до ответа в миллисекундах.
+        """
+        done = self.sent + self.failed
+        return {
+            "depth": self.pending,
+            "chats": sum(1 for chat in self._chats.values() if chat.items),
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "deferred": self.deferred,
+            "avg_latency_ms": round(self.total_latency / done * 1000, 3) if done else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 3),
+        }
+
+
+outbound_queue = OutboundQueue()
@@ -3,15 +3,19 @@ import asyncio
 import logging
 from aiogram import Dispatcher
 from apscheduler.triggers.cron import CronTrigger
-from habit_bot.bot_init import bot, dp, set_commands, scheduler
+from habit_bot.bot_init import bot, dp, set_commands, scheduler, sent_message_ids
 from habit_bot.handlers import commands, callbacks, messages_handler
 from habit_bot.run_reminder import check_and_add_jobs
-from services.handlers import check_current_day_for_habit
+from config import WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_IN_FLIGHT
+from services.handlers import check_current_day_for_habit, reminder_tick
 
 
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+# Маршруты можно подключить к диспетчеру только один раз.
+routers_registered = False
+
 
 def register_routers(dispatcher: Dispatcher):
     dispatcher.include_router(commands.router)
@@ -19,12 +23,30 @@ def register_routers(dispatcher: Dispatcher):
     dispatcher.include_router(messages_handler.router)
 
 
+async def setup_bot():
+    """
+    Подготавливает бота к обработке обновлений.
+
+    Регистрирует маршруты (routers) для обработки различных команд (один раз
+    за время жизни процесса), загружает сохраненные идентификаторы сообщений
+    для очистки чатов и устанавливает команды для бота.
+
+    Returns:
+        None
+    """
+    global routers_registered
+    if not routers_registered:
+        register_routers(dp)
+        routers_registered = True
+    await sent_message_ids.start()
+    await set_commands(bot)
+
+
 async def start_bot():
     """
     Запускает бота и начинает прослушивание обновлений.
 
-    Функция настраивает уровень логирования, регистрирует маршруты (routers)
-    для обработки различных команд и устанавливает команды для бота.
+    Функция настраивает уровень логирования и подготавливает бота.
     После этого она начинает опрос обновлений от Telegram с использованием
     метода `start_polling`.
 
@@ -32,26 +54,70 @@ async def start_bot():
         None
     """
     logging.basicConfig(level=logging.INFO)
-    register_routers(dp)
-    await set_commands(bot)
+    await setup_bot()
+    await bot.delete_webhook()
     await dp.start_polling(bot)
 
 
-async def start_scheduler():
+async def start_webhook():
+    """
+    Подготавливает бота к приему обновлений через webhook.
+
+    Регистрирует адрес webhook в Telegram с секретным токеном и ограничением
+    количества одновременных соединений. Сами обновления принимает маршрут
+    FastAPI `WEBHOOK_PATH`.
+
+    Returns:
+        None
+    """
+    logging.basicConfig(level=logging.INFO)
+    await setup_bot()
+    await bot.set_webhook(
+        url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        max_connections=min(WEBHOOK_MAX_IN_FLIGHT, 100),
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    logger.info(f"Webhook установлен - {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+
+
+async def start_scheduler(paused: bool = False):
     """
     Запускает планировщик для выполнения задач по расписанию.
 
     Функция настраивает триггер, чтобы задача `check_current_day_for_habit`
     выполнялась каждый день в полночь. После добавления задачи в планировщик
     функция запускает планировщик и регистрирует соответствующее сообщение
-    в логах.
+    в логах. Если запуск в полночь задержался (например, из-за занятого цикла событий),
+    задача выполняется один раз в течение часа; задачи хранятся в памяти, поэтому
+    полночь, пропущенная из-за остановки процесса, не наверстывается.
+    Также добавляет ежеминутный тик `reminder_tick`, отправляющий напоминания
+    привычек текущей минуты.
+
+    Args:
+        paused (bool): Запустить планировщик приостановленным (задачи не выполняются до `resume`).
 
     Returns:
        None
     """
     trigger = CronTrigger(hour=0, minute=0)  # Запускать каждый день в полночь
-    scheduler.add_job(check_current_day_for_habit, trigger)
-    scheduler.start()
+    scheduler.add_job(
+        check_current_day_for_habit,
+        trigger,
+        id="nightly_rollover",
+        replace_existing=True,
+        coalesce=True,
+        misfire_grace_time=3600,
+    )
+    scheduler.add_job(
+        reminder_tick,
+        CronTrigger(minute="*"),
+        id="reminder_tick",
+        replace_existing=True,
+        coalesce=True,
+        misfire_grace_time=30,
+    )
+    scheduler.start(paused=paused)
     logger.info("Scheduler started every day.")
 
 
@@ -71,11 +137,8 @@ async def main():
        None
     """
     try:
-        scheduler.start()
-        logger.info("Scheduler started successfully.")
-        # await start_scheduler()
+        await start_scheduler()
         await check_and_add_jobs()
-        # await scheduler.start()
         await start_bot()
     except Exception as e:
         logger.error(f"Bot polling failed: {e}")
@@ -1,74 +1,79 @@
 import logging
-import datetime
-from sqlalchemy import and_, select
+import time
+from sqlalchemy import select
 from app.db.database import get_async_session
-from app.models import  User, Habit
-from services.handlers import add_job_reminder
+from app.models import Habit
+from config import STARTUP_BATCH_SIZE
+from habit_bot.bot_init import scheduler
+from services.handlers import REMINDER_JOB_PREFIX
+from services.reminder_wheel import ReminderWheel, reminder_wheel
 
 logger: logging.Logger = logging.getLogger(__name__)
 
 
-async def check_and_add_jobs():
+def remove_legacy_reminder_jobs():
     """
-    Проверяет пользователей на наличие незавершенных привычек и добавляет задачи
-    напоминания для них в планировщик.
+    Удаляет из хранилища планировщика прежние задачи "одна задача на привычку".
 
-    Эта функция выполняет автоматическую проверку всех пользователей на наличие
-    незавершенных привычек. Если такая привычка найдена, функция добавляет задачу
-    на отправку уведомления в планировщик задач.
+    Returns:
+        int: Количество удаленных задач.
+    """
+    removed = 0
+    for job in scheduler.get_jobs():
+        if job.id.startswith(REMINDER_JOB_PREFIX):
+            job.remove()
+            removed += 1
+    return removed
+
+
+async def check_and_add_jobs(batch_size: int = STARTUP_BATCH_SIZE):
+    """
+    Загружает индекс напоминаний незавершенных привычек.
+
+    Из базы данных читаются только идентификатор и время напоминания активных
+    привычек, порциями через серверный курсор. Индекс строится отдельно и
+    подменяет текущий целиком, после чего напоминания отправляет тик
+    `reminder_tick` раз в минуту.
+
+    Args:
+        batch_size (int): Количество привычек в одной порции.
 
-    Flow Control:
-        - Извлекает список всех пользователей из базы данных.
-        - Для каждого пользователя:
-            - Извлекает незавершенные привычки, у которых осталось время для выполнения.
-            - Для каждой незавершенной привычки:
-                - Добавляет задачу напоминания в планировщик.
-                - Логирует успешное добавление задачи или предупреждение об ошибке.
+    Returns:
+        int: Количество привычек в индексе напоминаний.
 
     Logging:
-        - Логирует начало проверки незавершенных задач.
-        - Логирует список пользователей.
-        - Логирует список незавершенных привычек для каждого пользователя.
-        - Логирует успешное добавление задач и любые ошибки, которые могут возникнуть
-          при добавлении.
+        - Логирует начало загрузки напоминаний.
+        - Логирует количество удаленных прежних задач планировщика.
+        - Логирует прогресс и время загрузки после каждой порции.
+        - Логирует итоговое количество напоминаний и общее время загрузки.
 
-    Exception Handling:
-        - Логирует ошибки, возникающие при выполнении запросов к базе данных
-          или добавлении задач.
+    Raises:
+        Exception: Ошибка запроса к базе данных записывается в журнал и передается
+                   вызывающей стороне; текущий индекс при этом не изменяется.
     """
     logger.info("Start автоматической проверки выполненных заданий")
+    started = time.perf_counter()
+    removed = remove_legacy_reminder_jobs()
+    if removed:
+        logger.info(f"Удалено прежних задач напоминаний из планировщика - {removed}")
+
+    loaded = ReminderWheel()
+    count = 0
+    query = (
+        select(Habit.id, Habit.reminder_time)
+        .where(Habit.duration > Habit.count_remained_day)
+        .execution_options(yield_per=batch_size)
+    )
     async with get_async_session() as session:
         try:
-            # Получаем список всех пользователей.
-            query_user = select(User.id, User.bot_user_id)
-            result = await session.execute(query_user)
-            user_list = result.fetchall()
-            logger.info(f"GET USER list - {user_list}")
-
-            # Проходим циклом по всем пользователям.
-            for user in user_list:
-                # Собираем список всех незавершенных привычек для данного пользователя.
-                query = select(Habit.id, Habit.reminder_time, Habit.habit_name).where(and_(
-                    Habit.duration > Habit.count_remained_day,
-                    Habit.user_id == user[0]
-                ))
-                result = await session.execute(query)
-                habit_list = result.fetchall()
-                logger.info(f"GET Habit ID list - {habit_list}")
-
-                # Добавляем задачу отправки уведомлений в планировщик задач.
-                for habit in habit_list:
-                    habit_id = habit[0]
-                    reminder_time = habit[1]
-                    habit_name = habit[2]
-                    try:
-                        job = await add_job_reminder(bot_user_id=user[1], reminder_time=reminder_time,
-                                                     habit_name=habit_name, habit_id=habit_id)
-                        if job:
-                            logger.info(f"Привычка - {habit_name} добавлена в стек задач ID - {job.id}")
-                    except Exception as e:
-                        logger.warning(f"Не удалось добавить привычку в стек задач - {habit_name}: {e}")
+            result = await session.stream(query)
+            async for batch in result.partitions():
+                count += loaded.extend(batch)
+                logger.info(f"Загружено напоминаний - {count} за {time.perf_counter() - started:.2f} c.")
         except Exception as e:
             logger.error(f"Error during check_and_add_jobs: {e}")
-
-
+            raise
+    loaded.sort()
+    reminder_wheel.buckets = loaded.buckets
+    logger.info(f"Загрузка напоминаний завершена: {count} привычек за {time.perf_counter() - started:.2f} c.")
+    return count
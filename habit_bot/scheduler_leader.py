@@ -0,0 +1,108 @@
+"""Выбор единственного активного планировщика через advisory lock Postgres."""
+import asyncio
+import logging
+
+from sqlalchemy import func, select
+
+from app.db.database import engine
+from config import SCHEDULER_LOCK_KEY, SCHEDULER_LEADER_INTERVAL
+from habit_bot.bot_init import scheduler
+from habit_bot.run_bot import start_scheduler
+from habit_bot.run_reminder import check_and_add_jobs
+from services.reminder_wheel import REMINDER_WHEEL_CHANNEL, reminder_wheel
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class SchedulerLeader:
+    """
+    Запускает планировщик только в одном процессе из всех с ролью scheduler.
+
+    Процесс держит отдельное соединение с базой данных и пытается взять на нем
+    `pg_try_advisory_lock`. Получивший блокировку процесс подписывается на изменения
+    индекса напоминаний (LISTEN), загружает индекс и запускает планировщик.
+    Соединение проверяется каждые `interval` секунд: при его потере планировщик
+    приостанавливается. Если индекс напоминаний загрузить не удалось, процесс
+    отказывается от лидерства (освобождает блокировку) и повторяет попытку через
+    интервал, а не запускает планировщик с пустым индексом. Блокировка сессии освобождается Postgres сразу при разрыве
+    соединения, поэтому резервный процесс забирает её в пределах одного интервала.
+
+    Атрибуты:
+        lock_key (int): Ключ advisory lock.
+        interval (float): Интервал попыток захвата и проверки соединения в секундах.
+        is_leader (bool): Процесс сейчас является активным планировщиком.
+    """
+
+    def __init__(self, lock_key: int = SCHEDULER_LOCK_KEY, interval: float = SCHEDULER_LEADER_INTERVAL):
+        self.lock_key = lock_key
+        self.interval = interval
+        self.is_leader = False
+        self._pending_notifications = None
+
+    def _on_notification(self, connection, pid, channel, payload):
+        # Во время загрузки индекса изменения откладываются и применяются после подмены индекса.
+        if self._pending_notifications is not None:
+            self._pending_notifications.append(payload)
+        else:
+            reminder_wheel.apply_notification(payload)
+
+    async def run(self):
+        """Бесконечный цикл выбора лидера; завершается отменой задачи."""
+        while True:
+            try:
+                await self._campaign()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Процесс перестал быть активным планировщиком из-за ошибки: {e}")
+            finally:
+                self._step_down()
+            await asyncio.sleep(self.interval)
+
+    async def _campaign(self):
+        async with engine.connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = (await connection.execute(select(func.pg_try_advisory_lock(self.lock_key)))).scalar()
+            if not acquired:
+                return
+
+            raw_connection = await connection.get_raw_connection()
+            driver_connection = raw_connection.driver_connection
+            # Подписываемся до загрузки индекса, чтобы не пропустить изменения во время загрузки.
+            await driver_connection.add_listener(REMINDER_WHEEL_CHANNEL, self._on_notification)
+            try:
+                await self._step_up()
+                while True:
+                    await asyncio.sleep(self.interval)
+                    await connection.execute(select(1))
+            finally:
+                try:
+                    await driver_connection.remove_listener(REMINDER_WHEEL_CHANNEL, self._on_notification)
+                    await connection.execute(select(func.pg_advisory_unlock(self.lock_key)))
+                except Exception as e:
+                    logger.warning(f"Не удалось освободить блокировку планировщика: {e}")
+
+    async def _step_up(self):
+        logger.info("Процесс стал активным планировщиком.")
+        self.is_leader = True
+        # Задачи не выполняются, пока индекс напоминаний не загружен.
+        if not scheduler.running:
+            await start_scheduler(paused=True)
+        self._pending_notifications = []
+        try:
+            await check_and_add_jobs()
+        finally:
+            pending, self._pending_notifications = self._pending_notifications, None
+        for payload in pending:
+            reminder_wheel.apply_notification(payload)
+        scheduler.resume()
+
+    def _step_down(self):
+        if self.is_leader:
+            logger.info("Процесс больше не является активным планировщиком.")
+            self.is_leader = False
+            if scheduler.running:
+                scheduler.pause()
+
+
+scheduler_leader = SchedulerLeader()
@@ -0,0 +1,188 @@
+"""Сводная аналитика по истории отметок привычек всех пользователей (NumPy)."""
+import asyncio
+import logging
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+from app.db.database import get_async_session
+from app.models import Habit
+from config import ANALYTICS_BATCH_SIZE, ANALYTICS_CACHE_TTL, ANALYTICS_HORIZON_DAYS
+from services.cache import TTLLRUCache
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Границы интервалов распределения серий: 0, 1, 2-3, 4-7, 8-14, 15-30, 31-60, 61 и больше.
+STREAK_BINS = np.array([1, 2, 4, 8, 15, 31, 61])
+STREAK_LABELS = ["0", "1", "2-3", "4-7", "8-14", "15-30", "31-60", "61+"]
+
+# Последний рассчитанный отчет; расчет читает все привычки, поэтому повторяется не чаще ANALYTICS_CACHE_TTL.
+analytics_cache = TTLLRUCache(maxsize=1, ttl=ANALYTICS_CACHE_TTL)
+analytics_lock = asyncio.Lock()
+
+
+def unpack_bitmaps(bitmaps, horizon: int) -> np.ndarray:
+    """
+    Разворачивает битовые карты дней в матрицу отметок.
+
+    Args:
+        bitmaps (Sequence[bytes | None]): Битовые карты привычек (см. services.day_bitmap).
+        horizon (int): Количество дней (столбцов) матрицы; карты обрезаются или дополняются нулями.
+
+    Returns:
+        np.ndarray: Матрица bool размером (количество привычек, horizon).
+    """
+    width = (horizon + 7) // 8
+    raw = b"".join((bitmap or b"")[:width].ljust(width, b"\0") for bitmap in bitmaps)
+    packed = np.frombuffer(raw, dtype=np.uint8).reshape(len(bitmaps), width)
+    return np.unpackbits(packed, axis=1, count=horizon, bitorder="little").astype(bool)
+
+
+class HabitAnalytics:
+    """
+    Накопитель метрик по порциям привычек.
+
+    Каждая порция обрабатывается векторными операциями NumPy, а в накопителе
+    хранятся только суммы по дням и гистограммы, поэтому память не зависит
+    от количества привычек.
+
+    Атрибуты:
+        horizon (int): Количество дней от создания привычки, учитываемых в кривых.
+        habits (int): Количество обработанных привычек.
+    """
+
+    def __init__(self, horizon: int = ANALYTICS_HORIZON_DAYS):
+        self.horizon = horizon
+        self.habits = 0
+        self.finished = 0
+        self.completed_total = 0
+        self.missed_total = 0
+        self.rate_histogram = np.zeros(10, dtype=np.int64)
+        self.streak_histogram = np.zeros(len(STREAK_LABELS), dtype=np.int64)
+        self.done_by_day = np.zeros(horizon, dtype=np.int64)
+        self.marked_by_day = np.zeros(horizon, dtype=np.int64)
+        self.last_done_histogram = np.zeros(horizon + 1, dtype=np.int64)
+
+    def add_batch(self, rows):
+        """
+        Добавляет порцию привычек.
+
+        Args:
+            rows (Sequence[Row]): Строки с полями duration, count_remained_day, completed_count,
+                                  missed_count, current_streak, done_days и missed_days.
+        """
+        if not rows:
+            return
+        duration, remained, completed, missed, streak = (
+            np.fromiter((row[index] or 0 for row in rows), dtype=np.int64, count=len(rows))
+            for index in range(5)
+        )
+        self.habits += len(rows)
+        self.finished += int(np.count_nonzero(remained >= duration))
+        self.completed_total += int(completed.sum())
+        self.missed_total += int(missed.sum())
+
+        # Доля выполненных дней по привычкам с отметками, десять интервалов по 10%.
+        marked = completed + missed
+        has_marks = marked > 0
+        rates = completed[has_marks] / marked[has_marks]
+        self.rate_histogram += np.bincount(np.minimum((rates * 10).astype(np.int64), 9), minlength=10)
+
+        self.streak_histogram += np.bincount(np.digitize(streak, STREAK_BINS), minlength=len(STREAK_LABELS))
+
+        done = unpack_bitmaps([row.done_days for row in rows], self.horizon)
+        missed_days = unpack_bitmaps([row.missed_days for row in rows], self.horizon)
+        self.done_by_day += done.sum(axis=0)
+        self.marked_by_day += (done | missed_days).sum(axis=0)
+
+        # Последний выполненный день привычки (0, если выполненных дней нет; иначе номер дня + 1).
+        any_done = done.any(axis=1)
+        last_done = np.where(any_done, self.horizon - np.argmax(done[:, ::-1], axis=1), 0)
+        self.last_done_histogram += np.bincount(last_done, minlength=self.horizon + 1)
+
+    def result(self) -> dict:
+        """
+        Возвращает рассчитанные метрики.
+
+        Returns:
+            dict: Количество привычек, общая доля выполненных дней, распределения долей выполнения
+                  и серий, доля выполненных отметок по дням от создания привычки (completion_by_day)
+                  и кривая отвала (drop_off) - доля привычек, выполненных хотя бы раз
+                  в день N или позже.
+        """
+        marked_total = self.completed_total + self.missed_total
+        with np.errstate(divide="ignore", invalid="ignore"):
+            completion_by_day = np.where(self.marked_by_day > 0, self.done_by_day / self.marked_by_day, 0.0)
+        # Сумма по хвосту гистограммы: сколько привычек выполнялись в день N или позже.
+        still_active = np.cumsum(self.last_done_histogram[::-1])[::-1][1:]
+        drop_off = still_active / self.habits if self.habits else np.zeros(self.horizon)
+        return {
+            "habits": self.habits,
+            "finished_habits": self.finished,
+            "completion_rate": round(self.completed_total / marked_total, 4) if marked_total else 0.0,
+            "completion_rate_histogram": {
+                f"{index * 10}-{index * 10 + 10}%": int(count) for index, count in enumerate(self.rate_histogram)
+            },
+            "streak_histogram": dict(zip(STREAK_LABELS, self.streak_histogram.tolist())),
+            "completion_by_day": np.round(completion_by_day, 4).tolist(),
+            "drop_off": np.round(drop_off, 4).tolist(),
+        }
+
+
+async def compute_habit_analytics(batch_size: int = ANALYTICS_BATCH_SIZE,
+                                  horizon: int = ANALYTICS_HORIZON_DAYS) -> dict:
+    """
+    Рассчитывает сводные метрики по всем привычкам.
+
+    Привычки читаются порциями через серверный курсор, только нужные столбцы
+    (счетчики и битовые карты дней). Обработка порции выполняется в отдельном
+    потоке, чтобы не останавливать цикл событий.
+
+    Args:
+        batch_size (int): Количество привычек в одной порции.
+        horizon (int): Количество дней от создания привычки, учитываемых в кривых.
+
+    Returns:
+        dict: Метрики `HabitAnalytics.result` и время расчета в секундах.
+
+    Logs:
+        - Записывает количество обработанных привычек и время расчета.
+    """
+    started = time.perf_counter()
+    analytics = HabitAnalytics(horizon)
+    query = (
+        select(
+            Habit.duration, Habit.count_remained_day, Habit.completed_count, Habit.missed_count,
+            Habit.current_streak, Habit.done_days, Habit.missed_days,
+        )
+        .execution_options(yield_per=batch_size)
+    )
+    async with get_async_session() as session:
+        result = await session.stream(query)
+        async for batch in result.partitions():
+            await asyncio.to_thread(analytics.add_batch, batch)
+    report = await asyncio.to_thread(analytics.result)
+    report["elapsed"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Аналитика по {analytics.habits} привычкам рассчитана за {report['elapsed']} c.")
+    return report
+
+
+async def get_habit_analytics() -> dict:
+    """
+    Возвращает сводные метрики из кеша или рассчитывает их.
+
+    Одновременные запросы при пустом кеше ожидают один общий расчет.
+
+    Returns:
+        dict: Метрики `compute_habit_analytics`.
+    """
+    report = analytics_cache.get("report")
+    if report is not None:
+        return report
+    async with analytics_lock:
+        report = analytics_cache.get("report")
+        if report is None:
+            report = await compute_habit_analytics()
+            analytics_cache.set("report", report)
+    return report
@@ -0,0 +1,141 @@
+"""Кеши процесса с ограничением размера и времени жизни записей."""
+import time
+from collections import OrderedDict
+
+
+class TTLLRUCache:
+    """
+    LRU-кеш с ограничением времени жизни записей и счетчиками попаданий.
+
+    При превышении `maxsize` вытесняется запись, к которой дольше всего
+    не обращались. Запись старше `ttl` секунд считается отсутствующей.
+    Кеш с `maxsize` 0 отключен: записи не сохраняются, каждое чтение - промах.
+
+    Атрибуты:
+        maxsize (int): Максимальное количество записей.
+        ttl (float): Время жизни записи в секундах.
+        hits (int): Количество попаданий.
+        misses (int): Количество промахов.
+        evictions (int): Количество вытесненных по размеру записей.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """
+        Возвращает значение по ключу, если оно есть и не устарело.
+
+        Args:
+            key: Ключ записи.
+            default: Значение при промахе.
+
+        Returns:
+            Значение записи или `default`.
+        """
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key, value):
+        """
+        Сохраняет значение по ключу.
+
+        Args:
+            key: Ключ записи.
+            value: Значение записи.
+        """
+        if not self.maxsize:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        """
+        Удаляет запись по ключу.
+
+        Args:
+            key: Ключ записи.
+        """
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Удаляет все записи."""
+        self._data.clear()
+
+    def get_stats(self) -> dict:
+        """
+        Возвращает статистику кеша.
+
+        Returns:
+            dict: Размер, количество попаданий, промахов, вытеснений и доля попаданий.
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class VersionCounter:
+    """
+    Версии ключей для проверки актуальности закешированных данных.
+
+    Версии берутся из общего возрастающего счетчика `clock`, поэтому по значению
+    `clock`, прочитанному до запроса к базе данных, можно определить, менялся ли
+    ключ во время запроса, даже если ключ до запроса был неизвестен.
+
+    Атрибуты:
+        clock (int): Последняя выданная версия.
+    """
+
+    def __init__(self):
+        self.clock = 0
+        self._versions = {}
+
+    def get(self, key) -> int:
+        """
+        Возвращает текущую версию ключа (0, если ключ не менялся).
+
+        Args:
+            key: Ключ.
+
+        Returns:
+            int: Версия ключа.
+        """
+        return self._versions.get(key, 0)
+
+    def bump(self, key) -> int:
+        """
+        Присваивает ключу новую версию.
+
+        Args:
+            key: Ключ.
+
+        Returns:
+            int: Новая версия ключа.
+        """
+        self.clock += 1
+        self._versions[key] = self.clock
+        return self.clock
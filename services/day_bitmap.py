@@ -0,0 +1,174 @@
+"""Битовые карты дней привычки.
+
+Бит N карты соответствует N-му дню от даты создания привычки. Нумерация битов
+совпадает с функциями Postgres get_bit/set_bit для bytea: бит N находится в байте
+N // 8 и отсчитывается от младшего разряда байта. Карта на 365 дней занимает 46 байт.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import LargeBinary, case, func, literal
+
+EMPTY_BITMAP = b""
+
+
+def has_day(bitmap: bytes, offset: int) -> bool:
+    """
+    Проверяет, отмечен ли день в карте.
+
+    Args:
+        bitmap (bytes): Битовая карта или None.
+        offset (int): Номер дня от даты создания привычки.
+
+    Returns:
+        bool: True, если бит дня установлен.
+    """
+    if not bitmap or offset < 0 or offset >> 3 >= len(bitmap):
+        return False
+    return bool(bitmap[offset >> 3] >> (offset & 7) & 1)
+
+
+def with_day(bitmap: bytes, offset: int) -> bytes:
+    """
+    Возвращает карту с установленным битом дня, расширяя её при необходимости.
+
+    Args:
+        bitmap (bytes): Битовая карта или None.
+        offset (int): Номер дня от даты создания привычки.
+
+    Returns:
+        bytes: Новая битовая карта.
+    """
+    result = bytearray(bitmap or EMPTY_BITMAP)
+    if offset >> 3 >= len(result):
+        result.extend(bytes((offset >> 3) + 1 - len(result)))
+    result[offset >> 3] |= 1 << (offset & 7)
+    return bytes(result)
+
+
+def count_days(bitmap: bytes) -> int:
+    """
+    Возвращает количество отмеченных дней.
+
+    Args:
+        bitmap (bytes): Битовая карта или None.
+
+    Returns:
+        int: Количество установленных битов.
+    """
+    return int.from_bytes(bitmap or EMPTY_BITMAP, "little").bit_count()
+
+
+def last_day(*bitmaps: bytes):
+    """
+    Возвращает номер последнего отмеченного дня в любой из карт.
+
+    Args:
+        *bitmaps (bytes): Битовые карты.
+
+    Returns:
+        int | None: Номер дня или None, если отметок нет.
+    """
+    value = 0
+    for bitmap in bitmaps:
+        value |= int.from_bytes(bitmap or EMPTY_BITMAP, "little")
+    return value.bit_length() - 1 if value else None
+
+
+def current_streak(done: bytes, missed: bytes) -> int:
+    """
+    Возвращает количество выполненных подряд дней, заканчивающихся последней отметкой.
+
+    Args:
+        done (bytes): Карта выполненных дней.
+        missed (bytes): Карта невыполненных дней.
+
+    Returns:
+        int: Длина серии; 0, если последняя отметка - невыполнение.
+    """
+    offset = last_day(done, missed)
+    streak = 0
+    while offset is not None and offset >= 0 and has_day(done, offset):
+        streak += 1
+        offset -= 1
+    return streak
+
+
+def longest_streak(done: bytes) -> int:
+    """
+    Возвращает наибольшее количество выполненных подряд дней.
+
+    Каждый шаг `value &= value >> 1` укорачивает все серии установленных битов
+    на один бит, поэтому количество шагов равно длине самой длинной серии.
+
+    Args:
+        done (bytes): Карта выполненных дней.
+
+    Returns:
+        int: Длина самой длинной серии.
+    """
+    value = int.from_bytes(done or EMPTY_BITMAP, "little")
+    streak = 0
+    while value:
+        value &= value >> 1
+        streak += 1
+    return streak
+
+
+def calendar(done: bytes, missed: bytes, start_date: date, days: int):
+    """
+    Возвращает календарь отметок привычки.
+
+    Args:
+        done (bytes): Карта выполненных дней.
+        missed (bytes): Карта невыполненных дней.
+        start_date (date): Дата создания привычки (день с номером 0).
+        days (int): Количество дней календаря.
+
+    Returns:
+        list[tuple[date, bool | None]]: Дата и отметка дня: True - выполнено,
+                                        False - не выполнено, None - отметки нет.
+    """
+    result = []
+    for offset in range(days):
+        if has_day(done, offset):
+            mark = True
+        elif has_day(missed, offset):
+            mark = False
+        else:
+            mark = None
+        result.append((start_date + timedelta(days=offset), mark))
+    return result
+
+
+def sql_has_day(column, offset):
+    """
+    SQL-выражение: отмечен ли день в карте-столбце.
+
+    Args:
+        column: Столбец bytea с битовой картой.
+        offset: SQL-выражение номера дня.
+
+    Returns:
+        ColumnElement: Логическое выражение.
+    """
+    bitmap = func.coalesce(column, literal(EMPTY_BITMAP, LargeBinary))
+    # CASE гарантирует, что get_bit не вызывается за пределами карты.
+    return case((func.length(bitmap) * 8 > offset, func.get_bit(bitmap, offset) == 1), else_=False)
+
+
+def sql_with_day(column, offset):
+    """
+    SQL-выражение: карта-столбец с установленным битом дня.
+
+    Карта дополняется нулевыми байтами до нужной длины и изменяется set_bit.
+
+    Args:
+        column: Столбец bytea с битовой картой.
+        offset: SQL-выражение номера дня.
+
+    Returns:
+        ColumnElement: Выражение bytea.
+    """
+    bitmap = func.coalesce(column, literal(EMPTY_BITMAP, LargeBinary))
+    padding = func.decode(func.repeat("00", func.greatest(0, offset // 8 + 1 - func.length(bitmap))), "hex")
+    return func.set_bit(bitmap.op("||")(padding), offset, 1, type_=LargeBinary)
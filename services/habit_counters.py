@@ -0,0 +1,117 @@
+"""Проверка и пересчет счетчиков привычки (completed_count, missed_count, серии, last_checkin_date)."""
+import asyncio
+import logging
+import sys
+from datetime import timedelta
+
+from sqlalchemy import and_, func, select, update
+
+from app.db.database import get_async_session
+from app.models import Habit
+from config import HABIT_COUNTERS_CONCURRENCY, ROLLOVER_CHUNK_SIZE
+from services import day_bitmap
+
+logging.basicConfig(level=logging.INFO)
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def expected_counters(habit) -> dict:
+    """
+    Вычисляет значения счетчиков привычки по её битовым картам дней.
+
+    Args:
+        habit: Строка с полями created_date, done_days и missed_days.
+
+    Returns:
+        dict: Значения completed_count, missed_count, current_streak, longest_streak и last_checkin_date.
+    """
+    last_day = day_bitmap.last_day(habit.done_days, habit.missed_days)
+    return {
+        "completed_count": day_bitmap.count_days(habit.done_days),
+        "missed_count": day_bitmap.count_days(habit.missed_days),
+        "current_streak": day_bitmap.current_streak(habit.done_days, habit.missed_days),
+        "longest_streak": day_bitmap.longest_streak(habit.done_days),
+        "last_checkin_date": habit.created_date + timedelta(days=last_day) if last_day is not None else None,
+    }
+
+
+async def check_chunk(chunk_start: int, chunk_end: int, fix: bool) -> int:
+    """
+    Сверяет счетчики привычек одного диапазона идентификаторов.
+
+    Args:
+        chunk_start (int): Начало диапазона идентификаторов привычек (включительно).
+        chunk_end (int): Конец диапазона идентификаторов привычек (не включительно).
+        fix (bool): Исправить найденные расхождения.
+
+    Returns:
+        int: Количество привычек с расхождениями.
+
+    Logs:
+        - Записывает идентификаторы привычек с расхождениями.
+    """
+    async with get_async_session() as session:
+        result = await session.execute(
+            select(
+                Habit.id, Habit.created_date, Habit.done_days, Habit.missed_days,
+                Habit.completed_count, Habit.missed_count, Habit.current_streak, Habit.longest_streak,
+                Habit.last_checkin_date,
+            )
+            .where(and_(Habit.id >= chunk_start, Habit.id < chunk_end))
+        )
+        repairs = []
+        for habit in result:
+            expected = expected_counters(habit)
+            if any(getattr(habit, name) != value for name, value in expected.items()):
+                repairs.append({"id": habit.id, **expected})
+        if repairs and fix:
+            await session.execute(update(Habit), repairs)
+            await session.commit()
+    if repairs:
+        logger.warning(f"Счетчики привычек расходятся с картами дней: {[item['id'] for item in repairs]}")
+    return len(repairs)
+
+
+async def check_habit_counters(fix: bool = False) -> int:
+    """
+    Сверяет счетчики всех привычек с битовыми картами дней.
+
+    Привычки читаются по диапазонам идентификаторов размером ROLLOVER_CHUNK_SIZE,
+    одновременно обрабатывается до HABIT_COUNTERS_CONCURRENCY диапазонов (каждый
+    в своей сессии). Привычки с расхождениями записываются в журнал, а при `fix=True`
+    их счетчики и серии пересчитываются - так серии восстанавливаются после
+    исправления данных.
+
+    Args:
+        fix (bool): Исправить найденные расхождения.
+
+    Returns:
+        int: Количество привычек с расхождениями.
+
+    Logs:
+        - Записывает итог проверки.
+    """
+    async with get_async_session() as session:
+        result = await session.execute(select(func.min(Habit.id), func.max(Habit.id)))
+        min_id, max_id = result.one()
+    if min_id is None:
+        return 0
+
+    semaphore = asyncio.Semaphore(HABIT_COUNTERS_CONCURRENCY)
+
+    async def run_chunk(chunk_start: int) -> int:
+        async with semaphore:
+            return await check_chunk(chunk_start, chunk_start + ROLLOVER_CHUNK_SIZE, fix)
+
+    results = await asyncio.gather(*(
+        run_chunk(chunk_start) for chunk_start in range(min_id, max_id + 1, ROLLOVER_CHUNK_SIZE)
+    ))
+    total = sum(results)
+
+    logger.info(f"Проверка счетчиков привычек завершена, расхождений - {total}, исправлено - {total if fix else 0}")
+    return total
+
+
+if __name__ == "__main__":
+    # python -m services.habit_counters [--fix]
+    asyncio.run(check_habit_counters(fix="--fix" in sys.argv[1:]))
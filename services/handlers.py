@@ -1,26 +1,120 @@
 
+import asyncio
 import logging
 import re
-from datetime import datetime
+import time
+from datetime import date, datetime, timedelta
 import random
+from typing import NamedTuple
 
 import aiogram
-from apscheduler.triggers.cron import CronTrigger
-from sqlalchemy import and_, select, delete
+from sqlalchemy import and_, case, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from sqlalchemy.orm import joinedload
 from telebot.formatting import escape_markdown
 
-from app.db.database import get_async_session
-from app.models import User, Habit, HabitComplected, MessageControl, SchedulerJobs
+from app.db.database import get_async_session, has_pending_commit, run_after_commit
+from app.models import User, Habit, HabitCheckinEvent, MessageControl, SchedulerJobs
+from config import REMINDER_DISPATCH_BATCH_SIZE, ROLLOVER_CHUNK_SIZE, USER_CACHE_SIZE, USER_CACHE_TTL, \
+    HABIT_LIST_CACHE_SIZE, HABIT_LIST_CACHE_TTL
 from habit_bot.bot_init import bot, sent_message_ids, scheduler
+from habit_bot.button_menu import get_reminder_digest_menu, get_reminder_menu
+from habit_bot.outbound_queue import background_priority
+from services.cache import TTLLRUCache, VersionCounter
+from services.day_bitmap import sql_has_day, sql_with_day
+from services.passwords import password_hasher
+from services.reminder_wheel import REMINDER_WHEEL_CHANNEL, minute_of_day, reminder_wheel
 
 logging.basicConfig(level=logging.INFO)
 logger: logging.Logger = logging.getLogger(__name__)
 
 
+class UserIdentity(NamedTuple):
+    """Идентификационные данные пользователя, которые кешируются по bot_user_id."""
+    id: int
+    nickname: str
+    chat_id: int
+
+
+user_identity_cache = TTLLRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+class HabitSummary(NamedTuple):
+    """Краткие данные привычки для отображения в списке привычек пользователя."""
+    id: int
+    habit_name: str
+    duration: int
+    count_remained_day: int
+
+    @property
+    def is_completed(self) -> bool:
+        return self.duration == self.count_remained_day
+
+
+# user_id -> (версия, день загрузки, кортеж HabitSummary всех привычек пользователя).
+habit_list_cache = TTLLRUCache(maxsize=HABIT_LIST_CACHE_SIZE, ttl=HABIT_LIST_CACHE_TTL)
+# user_id -> версия списка привычек; меняется при любом изменении привычек пользователя.
+habit_list_versions = VersionCounter()
+
+
+def bump_habit_list_version(user_id: int, session: AsyncSession):
+    """
+    Помечает закешированный список привычек пользователя как устаревший после фиксации транзакции.
+
+    Вызывается при создании, изменении, удалении привычки и отметке о выполнении.
+    Список, загрузка которого началась до увеличения версии, не будет использован.
+    Версия увеличивается только после фиксации, иначе параллельный обработчик
+    успел бы закешировать с новой версией данные, прочитанные до фиксации.
+
+    Args:
+        user_id (int): Идентификатор пользователя (User.id).
+        session (AsyncSession): Сессия, в транзакции которой изменены привычки.
+    """
+    run_after_commit(session, _bump_habit_list_version, user_id)
+
+
+def _bump_habit_list_version(user_id: int):
+    habit_list_versions.bump(user_id)
+    habit_list_cache.invalidate(user_id)
+
+
+async def get_habit_summaries(user_id: int, session: AsyncSession) -> tuple[HabitSummary, ...]:
+    """
+    Возвращает краткие данные всех привычек пользователя из кеша или базы данных.
+
+    Запись кеша действительна, пока не изменилась версия списка пользователя
+    и не наступил следующий день: ночная проверка меняет счетчики привычек
+    в процессе планировщика, поэтому списки прошлого дня перечитываются.
+    Если в сессии есть незафиксированные изменения, кеш не используется.
+
+    Args:
+        user_id (int): Идентификатор пользователя (User.id).
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
+
+    Returns:
+        tuple[HabitSummary, ...]: Привычки пользователя в порядке создания.
+    """
+    uncommitted = has_pending_commit(session)
+    version = habit_list_versions.get(user_id)
+    today = datetime.today().date()
+    cached = None if uncommitted else habit_list_cache.get(user_id)
+    if cached is not None and cached[0] == version and cached[1] == today:
+        return cached[2]
+
+    query = (
+        select(Habit.id, Habit.habit_name, Habit.duration, Habit.count_remained_day)
+        .where(Habit.user_id == user_id)
+        .order_by(Habit.id)
+    )
+    summaries = tuple(HabitSummary(*row) for row in (await session.execute(query)).all())
+    # Если версия изменилась во время запроса, результат мог устареть и не кешируется.
+    if not uncommitted and habit_list_versions.get(user_id) == version:
+        habit_list_cache.set(user_id, (version, today, summaries))
+    return summaries
+
+
 async def delete_message_ids(message):
     try:
         await bot.delete_message(chat_id=message.chat.id, message_id=message.message_id)
@@ -34,36 +128,81 @@ async def delete_message_ids(message):
 
 
 async def add_sent_message_ids(key, value):
-    if key in sent_message_ids:
-        sent_message_ids[key].append(value)
-    else:
-        sent_message_ids[key] = [value]
+    await sent_message_ids.track(key, value)
     return sent_message_ids
 
 
+# Максимальное количество сообщений в одном запросе deleteMessages.
+DELETE_MESSAGES_BATCH_SIZE = 100
+
+# Запущенные фоновые очистки чатов (храним ссылки, чтобы их не собрал сборщик мусора).
+clear_chat_tasks = set()
+
+
+async def delete_chat_message(chat_id: int, message_id: int):
+    """
+    Удаляет одно сообщение из чата, логируя ошибки удаления.
+
+    Args:
+        chat_id (int): Идентификатор чата.
+        message_id (int): Идентификатор сообщения.
+    """
+    try:
+        await bot.delete_message(chat_id=chat_id, message_id=message_id)
+    except aiogram.exceptions.TelegramBadRequest as e:
+        if "message to delete not found" in str(e):
+            logger.info(f"Message {message_id} not found, might have been deleted already.")
+        else:
+            logger.warning(f"Failed to delete message {chat_id}: {e}")
+    except Exception as e:
+        logger.warning(f"Unexpected error when trying to delete message {chat_id}: {e}")
+
+
+async def delete_chat_messages(chat_id: int, message_ids: list[int]):
+    """
+    Удаляет сообщения из чата пакетами через deleteMessages.
+
+    Если пакет не удалось удалить целиком (например, в нем есть сообщение старше 48 часов),
+    сообщения этого пакета удаляются по одному параллельно.
+
+    Args:
+        chat_id (int): Идентификатор чата.
+        message_ids (list[int]): Идентификаторы сообщений.
+    """
+    for offset in range(0, len(message_ids), DELETE_MESSAGES_BATCH_SIZE):
+        chunk = message_ids[offset:offset + DELETE_MESSAGES_BATCH_SIZE]
+        try:
+            await bot.delete_messages(chat_id=chat_id, message_ids=chunk)
+        except aiogram.exceptions.TelegramBadRequest as e:
+            logger.info(f"Batch delete failed in chat {chat_id}, deleting one by one: {e}")
+            await asyncio.gather(*(delete_chat_message(chat_id, message_id) for message_id in chunk))
+        except Exception as e:
+            logger.warning(f"Unexpected error when trying to delete messages {chat_id}: {e}")
+
+
 async def clear_chat(sent_message_ids, message):
     """
     Функция удаления сообщений из чата.
+
+    Список отправленных сообщений чата забирается и очищается сразу, поэтому
+    сообщения, отправленные после вызова, не удаляются. Само удаление
+    выполняется в фоне, чтобы не задерживать ответ пользователю.
+
     Args:
-        sent_message_ids: словарь с ID сообщений и чата
-    Returns:
+        sent_message_ids (MessageStore): хранилище ID сообщений по чатам
+        message: сообщение, из чата которого удаляются сообщения
 
+    Returns:
+        asyncio.Task | None: фоновая задача удаления, если она была запущена
     """
     chat_id = message.chat.id
-    if chat_id in sent_message_ids:
-        for user_id in sent_message_ids[chat_id]:
-            try:
-                await bot.delete_message(chat_id=chat_id, message_id=user_id)
-            except aiogram.exceptions.TelegramBadRequest as e:
-                if "message to delete not found" in str(e):
-                    logger.info(f"Message {message.message_id} not found, might have been deleted already.")
-                else:
-                    logger.warning(f"Failed to delete message {chat_id}: {e}")
-            except Exception as e:
-                logger.warning(f"Unexpected error when trying to delete message {chat_id}: {e}")
-        sent_message_ids[chat_id].clear()
-
-
+    message_ids = list(dict.fromkeys((await sent_message_ids.take(chat_id))))
+    if not message_ids:
+        return None
+    task = asyncio.create_task(delete_chat_messages(chat_id, message_ids))
+    clear_chat_tasks.add(task)
+    task.add_done_callback(clear_chat_tasks.discard)
+    return task
 
 
 async def check_username_and_password(user_data, session: AsyncSession) -> [User, str]:
@@ -78,7 +217,8 @@ async def check_username_and_password(user_data, session: AsyncSession) -> [User
     Args:
        user_data (dict): Словарь, содержащий информацию о пользователе с ключами:
                          'nickname' (str) - полное имя пользователя,
-                         'password' (str) - пароль пользователя.
+                         'password' (str) - пароль пользователя,
+                         'bot_user_id' (int, необязательно) - идентификатор пользователя в системе бота.
        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
@@ -87,23 +227,57 @@ async def check_username_and_password(user_data, session: AsyncSession) -> [User
     """
     logger.info("Start check user!!!")
     nickname: str = user_data['nickname']
-    result = await session.execute(select(User).where(User.nickname == nickname))
+    query = select(User).where(User.nickname == nickname)
+    if user_data.get('bot_user_id') is not None:
+        # Никнейм не уникален: ищем только среди учетных записей этого пользователя Telegram.
+        query = query.where(User.bot_user_id == user_data['bot_user_id'])
+    result = await session.execute(query.limit(1))
     user = result.scalar_one_or_none()
-    if user and user.verify_password(user_data['password']):
+    verified, new_hash = False, None
+    if user:
+        # Проверка пароля выполняется в пуле потоков, чтобы не блокировать цикл событий.
+        verified, new_hash = await password_hasher.verify(user_data['password'], user.password_hash)
+    if verified:
         logger.info(f"USER - {user}")
+        if new_hash:
+            user.password_hash = new_hash
         return user
     else:
         error_message = "Неверные имя пользователя или пароль."
         return error_message
 
 
-async def get_user_profile(bot_user_id: int):
-    async with get_async_session() as session:
-        query = select(User.nickname, User.fullname, User.phone, User.email, User.age, User.city).where(User.bot_user_id == bot_user_id)
-        result = await session.execute(query)
-        user = result.fetchone()
-        return user
+async def get_user_profile(bot_user_id: int, session: AsyncSession):
+    query = (
+        select(User.nickname, User.fullname, User.phone, User.email, User.age, User.city, User.reminder_digest)
+        .where(User.bot_user_id == bot_user_id)
+    )
+    result = await session.execute(query)
+    user = result.fetchone()
+    return user
+
+
+
+async def toggle_reminder_digest(bot_user_id: int, session: AsyncSession):
+    """
+    Переключает режим напоминаний пользователя: одним сообщением или по одной привычке.
 
+    Args:
+        bot_user_id (int): Идентификатор пользователя бота в Telegram.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
+
+    Returns:
+        bool or None: Новое значение reminder_digest; None, если пользователь не найден.
+    """
+    result = await session.execute(
+        update(User)
+        .where(User.bot_user_id == bot_user_id)
+        .values(reminder_digest=~User.reminder_digest)
+        .returning(User.reminder_digest)
+    )
+    reminder_digest = result.scalar_one_or_none()
+    logger.info(f"Режим напоминаний пользователя {bot_user_id}: сводка - {reminder_digest}")
+    return reminder_digest
 
 
 async def create_habit(habit_data, session: AsyncSession) -> [Habit, None]:
@@ -151,8 +325,8 @@ async def create_habit(habit_data, session: AsyncSession) -> [Habit, None]:
             created_date=datetime.today().date()
         )
         session.add(new_habit)
-        await session.commit()
-        await session.refresh(new_habit)
+        await session.flush()
+        bump_habit_list_version(new_habit.user_id, session)
 
         return new_habit
 
@@ -199,17 +373,19 @@ async def create_user(user_data: dict, session: AsyncSession) -> [User, str]:
             logger.warning(f"Пользователь уже зарегистрирован, ID: {existing_user.bot_user_id}.")
             error_message = f"Пользователь уже зарегистрирован, ID: {existing_user.bot_user_id}."
             return error_message
+        password_hash = await password_hasher.hash(user_data['password'])
         user = User(
             nickname=user_data['nickname'],
             age=user_data['age'],
             phone=user_data['phone'],
             email=user_data['email'],
-            password=user_data['password'],
+            password_hash=password_hash,
             bot_user_id=user_data['bot_user_id'],
             created_date=datetime.today().date()
         )
         session.add(user)
-        await session.commit()
+        await session.flush()
+        run_after_commit(session, user_identity_cache.invalidate, user.bot_user_id)
         return user
 
     except IntegrityError as e:
@@ -223,7 +399,7 @@ async def create_user(user_data: dict, session: AsyncSession) -> [User, str]:
         return None
 
 
-async def get_user_id_by_habit_id(habit_id: int) -> [int, None]:
+async def get_user_id_by_habit_id(habit_id: int, session: AsyncSession) -> [int, None]:
     """
     Получает идентификатор пользователя по идентификатору привычки.
 
@@ -233,24 +409,22 @@ async def get_user_id_by_habit_id(habit_id: int) -> [int, None]:
 
     Args:
         habit_id (int): Уникальный идентификатор привычки.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
         int or None: Возвращает идентификатор пользователя, если привычка найдена,
                       иначе возвращает None.
     """
     try:
-        async with get_async_session() as session:
-            query = select(Habit).where(Habit.id == habit_id)
-            result = await session.execute(query)
-            habit = result.scalars().one_or_none()
-            if habit:
-                return habit.user_id
+        query = select(Habit.user_id).where(Habit.id == habit_id)
+        result = await session.execute(query)
+        return result.scalar_one_or_none()
     except Exception as e:
         logger.error(f"Error fetching user by habit_id {habit_id}: {e}")
         return None
 
 
-async def get_user_by_bot_user_id(bot_user_id: int) -> [int, None]:
+async def get_user_by_bot_user_id(bot_user_id: int, session: AsyncSession) -> [User, None]:
     """
     Получает пользователя по его идентификатору бота.
 
@@ -260,6 +434,7 @@ async def get_user_by_bot_user_id(bot_user_id: int) -> [int, None]:
 
     Args:
         bot_user_id (int): Уникальный идентификатор пользователя в системе бота.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
         User or None: Возвращает объект пользователя, если он найден,
@@ -269,216 +444,276 @@ async def get_user_by_bot_user_id(bot_user_id: int) -> [int, None]:
         Exception: Логирует ошибку, если запрос к базе данных не удался.
     """
     try:
-        async with get_async_session() as session:
-            query = select(User).where(User.bot_user_id == bot_user_id)
-            result = await session.execute(query)
-            user = result.scalar_one_or_none()
-            return user
+        query = select(User).where(User.bot_user_id == bot_user_id)
+        result = await session.execute(query)
+        user = result.scalar_one_or_none()
+        return user
     except Exception as e:
         logger.error(f"Error fetching user by bot_user_id {bot_user_id}: {e}")
         return None
 
 
-async def create_habit_complected_record(habit_id: int, user_id: int) -> HabitComplected:
+async def get_user_identity(bot_user_id: int, session: AsyncSession) -> [UserIdentity, None]:
     """
-    Создает запись о выполнении привычки для указанного пользователя.
+    Получает идентификатор, никнейм и chat_id пользователя по идентификатору бота.
 
-    Эта функция добавляет запись о том, что пользователь выполнил
-    определенную привычку. Запись включает идентификатор пользователя,
-    идентификатор привычки и дату выполнения.
+    Результат кешируется в процессе на USER_CACHE_TTL секунд; кеш сбрасывается
+    после фиксации создания пользователя, изменения его данных и обновления chat_id.
+    Отсутствие пользователя не кешируется; при незафиксированных изменениях
+    в сессии кеш не используется.
 
     Args:
-        habit_id (int): Уникальный идентификатор привычки, которая была выполнена.
-        user_id (int): Уникальный идентификатор пользователя, который выполнил привычку.
+        bot_user_id (int): Уникальный идентификатор пользователя в системе бота.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
-        HabitComplected: Возвращает созданную запись о выполненной привычке.
+        UserIdentity or None: Данные пользователя, если он найден, иначе None.
+    """
+    uncommitted = has_pending_commit(session)
+    identity = None if uncommitted else user_identity_cache.get(bot_user_id)
+    if identity is not None:
+        return identity
+    try:
+        query = select(User.id, User.nickname, User.chat_id).where(User.bot_user_id == bot_user_id)
+        row = (await session.execute(query)).one_or_none()
+    except Exception as e:
+        logger.error(f"Error fetching user identity by bot_user_id {bot_user_id}: {e}")
+        return None
+    if row is None:
+        return None
+    identity = UserIdentity(*row)
+    if not uncommitted:
+        user_identity_cache.set(bot_user_id, identity)
+    return identity
 
-    Raises:
-        Exception: Логирует ошибку, если возникает проблема при создании записи в базе данных.
+
+async def update_user_chat_id(bot_user_id: int, chat_id: int, session: AsyncSession) -> [UserIdentity, None]:
     """
-    async with get_async_session() as session:
-        async with session.begin():
-            complected_record = HabitComplected(
-                user_id=user_id,
-                habit_id=habit_id,
-                created_date=datetime.today().date()
-            )
-            session.add(complected_record)
-            await session.commit()
-            return complected_record
+    Сохраняет chat_id пользователя, если он изменился.
 
+    Args:
+        bot_user_id (int): Уникальный идентификатор пользователя в системе бота.
+        chat_id (int): Идентификатор чата пользователя.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
-async def mark_habit_completed(habit_id: int):
+    Returns:
+        UserIdentity or None: Данные пользователя, если он найден, иначе None.
     """
-    Отмечает привычку как выполненную для текущего пользователя.
+    identity = await get_user_identity(bot_user_id, session)
+    if identity is None or identity.chat_id == chat_id:
+        return identity
+    await session.execute(update(User).where(User.id == identity.id).values(chat_id=chat_id))
+    run_after_commit(session, user_identity_cache.invalidate, bot_user_id)
+    return identity._replace(chat_id=chat_id)
+
 
-    Эта функция проверяет, была ли привычка уже выполнена пользователем
-    в текущий день. Если нет, создается новая запись о выполнении
-    привычки, и увеличиваются соответствующие счетчики.
+def checkin_event_insert(updated, day: date, completed: bool, source: str):
+    """
+    Строит INSERT записей журнала отметок для привычек, измененных выражением `updated`.
 
     Args:
-        habit_id (int): Уникальный идентификатор привычки, которую нужно отметить как выполненную.
+        updated: CTE UPDATE habit, возвращающий id и user_id привычек.
+        day (date): День отметки.
+        completed (bool): True - привычка выполнена, False - не выполнена.
+        source (str): Источник отметки.
 
     Returns:
-        bool: Возвращает True, если привычка была успешно отмечена как выполненная,
-              и False, если привычка уже была выполнена в текущий день.
-
-    Raises:
-        ValueError: Если привычка с заданным идентификатором не существует.
+        Insert: INSERT ... SELECT в habit_checkin_event.
     """
-    logger.info(f"Start mark_habit_completed, habit_id - {habit_id}")
-    current_day = datetime.today().date()
-    user_id = await get_user_id_by_habit_id(habit_id)
-    if user_id is None:
-        # Обработка случая, когда habit_id не существует
-        raise ValueError(f"Habit with id {habit_id} does not exist")
+    # Время записи заполняет server_default: вызываемое значение по умолчанию модели
+    # в INSERT ... SELECT подставилось бы как NULL.
+    return pg_insert(HabitCheckinEvent).from_select(
+        ["habit_id", "user_id", "day", "completed", "source"],
+        select(updated.c.id, updated.c.user_id, literal(day), literal(completed), literal(source)),
+        include_defaults=False,
+    )
 
-    async with get_async_session() as session:
-        async with session.begin():
-            # Проверка в базе данных уже существующей записи за текущий день
-            query = select(HabitComplected).options(joinedload(HabitComplected.habit)).where(and_(
-                HabitComplected.habit_id == habit_id,
-                HabitComplected.user_id == user_id,
-                HabitComplected.created_date == current_day
-            ))
 
-            result = await session.execute(query)
-            complected = result.scalars().one_or_none()
+async def check_in_habit(habit_id: int, completed: bool, bot_user_id: int, session: AsyncSession):
+    """
+    Атомарно ставит отметку о выполнении или невыполнении привычки за текущий день.
+
+    Одним SQL-выражением устанавливает бит текущего дня в битовой карте привычки
+    (done_days или missed_days) и обновляет счетчики: count_remained_day,
+    completed_count или missed_count, current_streak, longest_streak и last_checkin_date. Через CTE
+    в том же выражении отметка добавляется в журнал habit_checkin_event.
+    UPDATE выполняется, только если бит дня еще не установлен ни в одной карте,
+    поэтому повторное нажатие в тот же день не меняет счетчики, а параллельное
+    нажатие после блокировки строки увидит установленный бит. Выражение сразу
+    возвращает данные для карточки привычки, поэтому дополнительный запрос для её
+    отображения не нужен. При новой отметке кешированный список привычек
+    пользователя сбрасывается.
+
+    Отметка ставится и данные возвращаются только для привычки пользователя
+    `bot_user_id`: идентификатор привычки приходит из данных кнопки, и без этой
+    проверки можно было бы отметить чужую привычку.
 
-            # Если записи нет, то создаем новую запись и увеличиваем счетчик
-            if complected is None:
-                logger.info(f"Записи счетчиков для привычки {habit_id} еще нет. Создаем.")
-                habit_complected = await create_habit_complected_record(habit_id, user_id)
+    Args:
+        habit_id (int): Уникальный идентификатор привычки.
+        completed (bool): True - привычка выполнена, False - не выполнена.
+        bot_user_id (int): Идентификатор пользователя в системе бота, которому должна принадлежать привычка.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
+
+    Returns:
+        Row or None: Строка с полями привычки (id, user_id, habit_name, comments, created_date,
+                     duration, reminder_time, count_remained_day), итоговыми счетчиками
+                     completed, not_completed, current_streak и longest_streak и флагом checked_in (False, если
+                     отметка за сегодня уже была). None, если привычка не найдена
+                     или принадлежит другому пользователю.
+    """
+    current_day = datetime.today().date()
+    offset = literal(current_day) - Habit.created_date
+    owned = Habit.user_id == select(User.id).where(User.bot_user_id == bot_user_id).scalar_subquery()
+    if completed:
+        # Серия продолжается, только если вчера привычка тоже была выполнена.
+        current_streak = case(
+            (Habit.last_checkin_date == current_day - timedelta(days=1), Habit.current_streak + 1),
+            else_=1,
+        )
+        marks = {"done_days": sql_with_day(Habit.done_days, offset), "completed_count": Habit.completed_count + 1}
+    else:
+        current_streak = literal(0)
+        marks = {"missed_days": sql_with_day(Habit.missed_days, offset), "missed_count": Habit.missed_count + 1}
+    updated = (
+        update(Habit)
+        .where(and_(
+            Habit.id == habit_id,
+            owned,
+            Habit.duration > Habit.count_remained_day,
+            Habit.created_date <= current_day,
+            ~sql_has_day(Habit.done_days, offset),
+            ~sql_has_day(Habit.missed_days, offset),
+        ))
+        .values(
+            count_remained_day=Habit.count_remained_day + 1,
+            current_streak=current_streak,
+            # Выражения SET видят значения до обновления, поэтому сравниваем с новой серией целиком.
+            longest_streak=func.greatest(Habit.longest_streak, current_streak),
+            last_checkin_date=current_day,
+            **marks,
+        )
+        .returning(
+            Habit.id, Habit.user_id, Habit.count_remained_day,
+            Habit.completed_count, Habit.missed_count, Habit.current_streak, Habit.longest_streak,
+        )
+        .cte("updated")
+    )
+    events = checkin_event_insert(updated, current_day, completed, "user").cte("events")
+    # Основной запрос видит данные до выполнения выражения, поэтому новые значения берем из CTE.
+    query = (
+        select(
+            Habit.id,
+            Habit.user_id,
+            Habit.habit_name,
+            Habit.comments,
+            Habit.created_date,
+            Habit.duration,
+            Habit.reminder_time,
+            func.coalesce(updated.c.count_remained_day, Habit.count_remained_day).label("count_remained_day"),
+            func.coalesce(updated.c.completed_count, Habit.completed_count).label("completed"),
+            func.coalesce(updated.c.missed_count, Habit.missed_count).label("not_completed"),
+            func.coalesce(updated.c.current_streak, Habit.current_streak).label("current_streak"),
+            func.coalesce(updated.c.longest_streak, Habit.longest_streak).label("longest_streak"),
+            updated.c.id.isnot(None).label("checked_in"),
+        )
+        .outerjoin(updated, updated.c.id == Habit.id)
+        .where(Habit.id == habit_id, owned)
+        .add_cte(events)
+    )
+    result = await session.execute(query)
+    check_in = result.one_or_none()
+    if check_in is not None and check_in.checked_in:
+        bump_habit_list_version(check_in.user_id, session)
+    return check_in
+
+
+async def mark_habit_completed(habit_id: int, bot_user_id: int, session: AsyncSession):
+    """
+    Отмечает привычку как выполненную для текущего пользователя.
 
-                # Увеличиваем счетчик выполненного задания
-                habit_complected.increment_count_complected()
-                # Получаем запись привычки, увеличиваем кол-во пройденных дней
+    Отметка ставится атомарно через `check_in_habit`: если за текущий день
+    отметки еще нет, создается запись о выполнении и увеличивается счетчик
+    пройденных дней привычки.
 
-                habit_query = select(Habit).where(Habit.id == habit_id)
-                habit_result = await session.execute(habit_query)
-                habit = habit_result.scalars().one_or_none()
-                habit.increment_remained_day()
+    Args:
+        habit_id (int): Уникальный идентификатор привычки, которую нужно отметить как выполненную.
+        bot_user_id (int): Идентификатор пользователя в системе бота, которому должна принадлежать привычка.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
-                session.add(habit)
-                session.add(habit_complected)
-                await session.commit()
+    Returns:
+        Row: Данные карточки привычки со счетчиками. Поле checked_in равно True, если привычка
+             была успешно отмечена как выполненная, и False, если отметка за текущий день уже была.
 
-                return True
-            else:
-                return False
+    Raises:
+        ValueError: Если привычка с заданным идентификатором не существует или принадлежит другому пользователю.
+    """
+    logger.info(f"Start mark_habit_completed, habit_id - {habit_id}")
+    check_in = await check_in_habit(habit_id, True, bot_user_id, session)
+    if check_in is None:
+        # Обработка случая, когда habit_id не существует или привычка принадлежит другому пользователю.
+        raise ValueError(f"Habit with id {habit_id} does not exist")
+    return check_in
 
 
-async def mark_habit_not_completed(habit_id: int):
+async def mark_habit_not_completed(habit_id: int, bot_user_id: int, session: AsyncSession):
     """
     Отмечает привычку как не выполненную для текущего пользователя.
 
-    Эта функция проверяет, была ли привычка уже отмечена как не выполненная
-    в текущий день. Если нет, создается новая запись о невыполнении
-    привычки, и увеличиваются соответствующие счетчики.
+    Отметка ставится атомарно через `check_in_habit`: если за текущий день
+    отметки еще нет, создается запись о невыполнении и увеличивается счетчик
+    пройденных дней привычки.
 
     Args:
         habit_id (int): Уникальный идентификатор привычки, которую нужно отметить как не выполненную.
+        bot_user_id (int): Идентификатор пользователя в системе бота, которому должна принадлежать привычка.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
-        bool: Возвращает True, если привычка была успешно отмечена как не выполненная,
-              и False, если привычка уже была отмечена как не выполненная в текущий день.
+        Row: Данные карточки привычки со счетчиками. Поле checked_in равно True, если привычка
+             была успешно отмечена как не выполненная, и False, если отметка за текущий день уже была.
 
     Raises:
-        ValueError: Если привычка с заданным идентификатором не существует.
+        ValueError: Если привычка с заданным идентификатором не существует или принадлежит другому пользователю.
     """
     logger.info(f"Start mark_habit_not_completed, habit_id - {habit_id}")
-    current_day = datetime.today().date()
-    user_id = await get_user_id_by_habit_id(habit_id)
-    if user_id is None:
-        # Обработка случая, когда habit_id не существует.
+    check_in = await check_in_habit(habit_id, False, bot_user_id, session)
+    if check_in is None:
+        # Обработка случая, когда habit_id не существует или привычка принадлежит другому пользователю.
         raise ValueError(f"Habit with id {habit_id} does not exist")
+    return check_in
 
-    async with get_async_session() as session:
-        async with session.begin():
-            # Проверка в базе данных уже существующей записи за текущий день.
-            query = select(HabitComplected).where(and_(
-                HabitComplected.habit_id == habit_id,
-                HabitComplected.user_id == user_id,
-                HabitComplected.created_date == current_day
-            ))
-            result = await session.execute(query)
-            habit_not_complected = result.scalars().one_or_none()
-
-            # Если записи нет, то создаем новую запись и увеличиваем счетчик.
-            if habit_not_complected is None:
-                logger.info(f"Записи счетчиков для привычки {habit_id} еще нет. Создаем.")
-                habit_not_complected = await create_habit_complected_record(habit_id, user_id)
-                # Увеличиваем счетчик не выполненного задания.
-                habit_not_complected.increment_count_not_complected()
-
-                habit_query = select(Habit).where(Habit.id == habit_id)
-                habit_result = await session.execute(habit_query)
-                habit = habit_result.scalars().one_or_none()
-                habit.increment_remained_day()
-
-                session.add(habit)
-                session.add(habit_not_complected)
-                await session.commit()
-                return True
-            else:
-                return False
-
-
-async def get_complected_day(habit_id: int):
+
+async def get_complected_day(habit_id: int, session: AsyncSession):
     """
     Получает количество выполненных и не выполненных дней для заданной привычки.
 
-    Эта функция извлекает записи о выполнении привычки из базы данных
-    по заданному идентификатору привычки и возвращает количество дней,
-    когда привычка была выполнена и не выполнена.
+    Эта функция читает счетчики выполненных и не выполненных дней
+    (completed_count и missed_count) из записи привычки одним запросом.
 
     Args:
     habit_id (int): Уникальный идентификатор привычки, для которой необходимо получить
                     количество выполненных и не выполненных дней.
+    session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
     dict: Словарь с количеством выполненных и не выполненных дней, где:
          - "completed": количество дней, когда привычка была выполнена.
          - "not_completed": количество дней, когда привычка не была выполнена.
 
-         Если записи о привычке не найдены, возвращает None.
-
-    Logs:
-    - Записывает информацию о начале выполнения функции, а также
-     о получении идентификатора пользователя и записях привычек.
+         Если привычка не найдена, возвращает None.
 
     Raises:
     Exception: Возникает, если происходит ошибка при выполнении запроса к базе данных.
     """
-    logger.info("Start rest_of_the_days")
-    user_id = await get_user_id_by_habit_id(habit_id)
-    logger.info(f"Start rest_of_the_days, get user_id - {user_id}")
-    async with get_async_session() as session:
-        # Получаем привычку по идентификатору
-        query = (
-            select(HabitComplected)
-            .where(and_(
-                HabitComplected.habit_id == habit_id,
-                HabitComplected.user_id == user_id,
-            ))
-        )
-        result = await session.execute(query)
-        habit_complected = result.scalars().first()
-        logger.info(f"Start rest_of_the_days, get habit_complected - {habit_complected}")
-
-        if habit_complected:
-            count_complected_day = {
-                "completed": habit_complected.count_habit_complected,
-                "not_completed": habit_complected.count_habit_not_complected
-            }
-            return count_complected_day
-        else:
-            logger.info("habit_complected - НЕ НАЙДЕНО В БАЗЕ")
-            return None
+    query = select(Habit.completed_count, Habit.missed_count).where(Habit.id == habit_id)
+    row = (await session.execute(query)).one_or_none()
+    if row is None:
+        logger.info(f"Привычка {habit_id} не найдена")
+        return None
+    return {"completed": row.completed_count, "not_completed": row.missed_count}
 
 
-async def get_habit_by_id(habit_id: int):
+async def get_habit_by_id(habit_id: int, session: AsyncSession):
     """
     Получает привычку по её уникальному идентификатору.
 
@@ -488,6 +723,7 @@ async def get_habit_by_id(habit_id: int):
 
     Args:
         habit_id (int): Уникальный идентификатор привычки, которую необходимо получить.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
         Habit or None: Объект Habit, если привычка найдена, или None, если
@@ -499,17 +735,53 @@ async def get_habit_by_id(habit_id: int):
     Raises:
         Exception: Возникает, если происходит ошибка при выполнении запроса к базе данных.
         """
-    async with get_async_session() as session:
-        async with session.begin():
-            habit_query = select(Habit).where(Habit.id == habit_id)
-            habit_result = await session.execute(habit_query)
-            habit = habit_result.scalars().one_or_none()
-            if habit:
-                return habit
-            return None
+    habit_query = select(Habit).where(Habit.id == habit_id)
+    habit_result = await session.execute(habit_query)
+    habit = habit_result.scalars().one_or_none()
+    if habit:
+        return habit
+    return None
+
 
+async def get_habit_card(habit_id: int, session: AsyncSession):
+    """
+    Получает данные карточки привычки одним запросом.
+
+    Итоговые количества выполненных и невыполненных дней хранятся в самой
+    привычке (completed_count, missed_count) и обновляются при каждой отметке,
+    поэтому карточка читается одной строкой без агрегации отметок.
+
+    Args:
+        habit_id (int): Уникальный идентификатор привычки.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
-async def record_message_id(chat_id, message_id, user_id):
+    Returns:
+        Row or None: Строка с полями привычки (id, user_id, habit_name, comments, created_date,
+                     duration, reminder_time, count_remained_day) и счетчиками completed,
+                     not_completed, current_streak и longest_streak. None, если привычка не найдена.
+    """
+    query = (
+        select(
+            Habit.id,
+            Habit.user_id,
+            Habit.habit_name,
+            Habit.comments,
+            Habit.created_date,
+            Habit.duration,
+            Habit.reminder_time,
+            Habit.count_remained_day,
+            Habit.completed_count.label("completed"),
+            Habit.missed_count.label("not_completed"),
+            Habit.current_streak,
+            Habit.longest_streak,
+        )
+        .where(Habit.id == habit_id)
+    )
+    result = await session.execute(query)
+    return result.one_or_none()
+
+
+async def record_message_id(chat_id, message_id, user_id, session: AsyncSession):
     """
     Записывает идентификатор сообщения в базу данных.
 
@@ -522,6 +794,7 @@ async def record_message_id(chat_id, message_id, user_id):
        chat_id (int): Идентификатор чата, в котором было отправлено сообщение.
        message_id (int): Идентификатор сообщения, которое нужно записать.
        user_id (int): Идентификатор пользователя, которому принадлежит сообщение.
+       session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
        None: Функция не возвращает значения, но создает запись в базе данных.
@@ -534,17 +807,15 @@ async def record_message_id(chat_id, message_id, user_id):
        Exception: Может возникнуть ошибка при добавлении записи в базу данных
                   или при выполнении операции commit.
     """
-    async with get_async_session() as session:
-        message_record = MessageControl(
-            chat_id=chat_id,
-            message_id=message_id,
-            user_id=user_id,
-        )
-        session.add(message_record)
-        await session.commit()
+    message_record = MessageControl(
+        chat_id=chat_id,
+        message_id=message_id,
+        user_id=user_id,
+    )
+    session.add(message_record)
 
 
-async def clear_message_in_chat(chat_id: int, user_id: int):
+async def clear_message_in_chat(chat_id: int, user_id: int, session: AsyncSession):
     """
     Очищает все сообщения пользователя в указанном чате.
 
@@ -555,6 +826,7 @@ async def clear_message_in_chat(chat_id: int, user_id: int):
     Args:
         chat_id (int): Идентификатор чата, из которого необходимо удалить сообщения.
         user_id (int): Идентификатор пользователя, чьи сообщения необходимо удалить.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
         None: Функция не возвращает значений, но выполняет операции по удалению
@@ -573,33 +845,31 @@ async def clear_message_in_chat(chat_id: int, user_id: int):
                    или при попытке удалить сообщение, если возникли проблемы
                    с доступом к Telegram API.
     """
-    async with get_async_session() as session:
-        query = select(MessageControl).where(
-            MessageControl.user_id == user_id,
-            MessageControl.user_id == chat_id,
-        )
-        result = await session.execute(query)
-        message_list = result.scalars().all()
-        logger.info(f"Message List - {message_list}")
-        if message_list:
-            for message in message_list:
-                try:
-                    await bot.delete_message(chat_id, message.message_id)
-                    logger.info(f"Сообщение {message.message_id} в чате {chat_id} удалено")
-                except Exception as e:
-                    if 'message to delete not found' in str(e):
-                        logger.warning(f"Сообщение {message.message_id} в чате {chat_id} уже удалено")
-                    else:
-                        logger.error(f"Не удалось удалить сообщение {message.message_id} из чата {chat_id}: {e}")
-        delete_stmt = delete(MessageControl).where(
-            MessageControl.user_id == user_id,
-            MessageControl.user_id == chat_id,
-        )
-        await session.execute(delete_stmt)
-        await session.commit()
+    query = select(MessageControl).where(
+        MessageControl.user_id == user_id,
+        MessageControl.user_id == chat_id,
+    )
+    result = await session.execute(query)
+    message_list = result.scalars().all()
+    logger.info(f"Message List - {message_list}")
+    if message_list:
+        for message in message_list:
+            try:
+                await bot.delete_message(chat_id, message.message_id)
+                logger.info(f"Сообщение {message.message_id} в чате {chat_id} удалено")
+            except Exception as e:
+                if 'message to delete not found' in str(e):
+                    logger.warning(f"Сообщение {message.message_id} в чате {chat_id} уже удалено")
+                else:
+                    logger.error(f"Не удалось удалить сообщение {message.message_id} из чата {chat_id}: {e}")
+    delete_stmt = delete(MessageControl).where(
+        MessageControl.user_id == user_id,
+        MessageControl.user_id == chat_id,
+    )
+    await session.execute(delete_stmt)
 
 
-async def update_habit_by_id(habit_info) -> [Habit, None]:
+async def update_habit_by_id(habit_info, session: AsyncSession) -> [Habit, None]:
     """
     Обновляет запись привычки по ее идентификатору.
 
@@ -615,6 +885,7 @@ async def update_habit_by_id(habit_info) -> [Habit, None]:
                            - "habit_description": Новое описание привычки (str), если требуется обновление.
                            - "all_duration": Новая продолжительность привычки (int), если требуется обновление.
                            - "reminder_time": Новое время напоминания (str), если требуется обновление.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
         Habit | None: Возвращает обновленный объект Habit, если обновление прошло успешно.
@@ -636,40 +907,40 @@ async def update_habit_by_id(habit_info) -> [Habit, None]:
     reminder_time = habit_info.get("reminder_time")
     logger.info(f"HABIT INFO - {habit_name}, {habit_description}, {all_duration}, {reminder_time}")
 
-    async with get_async_session() as session:
-        habit = await get_habit_by_id(int(habit_id))
-        if habit:
-            if habit_name is not None:
-                habit.habit_name = habit_name
-            if habit_description is not None:
-                habit.comments = habit_description
-            if all_duration is not None:
-                habit.duration = int(all_duration)
-            if reminder_time is not None:
-                habit.reminder_time = reminder_time
-
-            session.add(habit)
-            await session.commit()
-            return habit
-        else:
-            logger.info(f"Что пошло не так при сохранении")
-            return None
+    habit = await get_habit_by_id(int(habit_id), session)
+    if habit:
+        if habit_name is not None:
+            habit.habit_name = habit_name
+        if habit_description is not None:
+            habit.comments = habit_description
+        if all_duration is not None:
+            habit.duration = int(all_duration)
+        if reminder_time is not None:
+            habit.reminder_time = reminder_time
+
+        await session.flush()
+        bump_habit_list_version(habit.user_id, session)
+        return habit
+    else:
+        logger.info(f"Что пошло не так при сохранении")
+        return None
 
 
-async def get_completed_habit_list(bot_user_id: int) -> [Habit, None]:
+async def get_completed_habit_list(bot_user_id: int, session: AsyncSession) -> [list[HabitSummary], None]:
     """
     Получает список завершенных привычек для пользователя по его идентификатору бота.
 
-    Эта функция выполняет запрос к базе данных для получения привычек,
-    которые пользователь завершил (т.е. количество оставшихся дней совпадает
-    с продолжительностью привычки).
+    Эта функция выбирает из закешированного списка привычек пользователя
+    (`get_habit_summaries`) те, которые пользователь завершил (т.е. количество
+    оставшихся дней совпадает с продолжительностью привычки).
 
     Args:
         bot_user_id (int): Идентификатор пользователя бота для которого
                             требуется получить список завершенных привычек.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
-        List[Habit] | None: Возвращает список объектов Habit, представляющих завершенные привычки,
+        List[HabitSummary] | None: Возвращает список кратких данных завершенных привычек,
                             если такие есть. Если у пользователя нет завершенных привычек,
                             возвращает None.
 
@@ -679,36 +950,32 @@ async def get_completed_habit_list(bot_user_id: int) -> [Habit, None]:
     Raises:
         Exception: Может возникнуть ошибка при выполнении операций с базой данных.
     """
-    async with get_async_session() as session:
-        user = await get_user_by_bot_user_id(bot_user_id)
-        logger.info(f"get_completed_habit_list - user_id - {user.id}")
-        if user:
-            query = select(Habit).where(and_(
-                Habit.user_id == user.id,
-                Habit.duration == Habit.count_remained_day
-            ))
-            result = await session.execute(query)
-            completed_habit_list = result.scalars().all()
-            if completed_habit_list:
-                return completed_habit_list
-            else:
-                return None
-
-
-async def get_not_completed_habit_list(bot_user_id: int):
+    user = await get_user_identity(bot_user_id, session)
+    logger.info(f"get_completed_habit_list - user - {user}")
+    if user:
+        summaries = await get_habit_summaries(user.id, session)
+        completed_habit_list = [habit for habit in summaries if habit.is_completed]
+        if completed_habit_list:
+            return completed_habit_list
+        else:
+            return None
+
+
+async def get_not_completed_habit_list(bot_user_id: int, session: AsyncSession):
     """
     Получает список незавершенных привычек для пользователя по его идентификатору бота.
 
-    Эта функция выполняет запрос к базе данных для получения привычек,
-    которые пользователь не завершил (т.е. количество оставшихся дней
-    меньше, чем продолжительность привычки).
+    Эта функция выбирает из закешированного списка привычек пользователя
+    (`get_habit_summaries`) те, которые пользователь не завершил (т.е. количество
+    оставшихся дней меньше, чем продолжительность привычки).
 
     Args:
         bot_user_id (int): Идентификатор пользователя бота, для которого
                             требуется получить список незавершенных привычек.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
-        List[Habit] | None: Возвращает список объектов Habit, представляющих незавершенные привычки,
+        List[HabitSummary] | None: Возвращает список кратких данных незавершенных привычек,
                             если такие имеются. Если у пользователя нет незавершенных привычек,
                             возвращает None.
 
@@ -719,88 +986,101 @@ async def get_not_completed_habit_list(bot_user_id: int):
         Exception: Может возникнуть ошибка при выполнении операций с базой данных.
     """
     logger.info(f"Start get_habit_list")
-    async with get_async_session() as session:
-        user = await get_user_by_bot_user_id(bot_user_id)
-        logger.info(f"get_habit_list - bot_user_id - {bot_user_id}")
-        logger.info(f"get_habit_list - user_id - {user}")
-        if user:
-            query = select(Habit).where(and_(
-                Habit.user_id == user.id,
-                Habit.duration > Habit.count_remained_day
-            ))
-            result = await session.execute(query)
-            completed_habit_list = result.scalars().all()
-            return completed_habit_list
+    user = await get_user_identity(bot_user_id, session)
+    logger.info(f"get_habit_list - bot_user_id - {bot_user_id}")
+    logger.info(f"get_habit_list - user_id - {user}")
+    if user:
+        summaries = await get_habit_summaries(user.id, session)
+        return [habit for habit in summaries if not habit.is_completed]
 
 
-async def check_current_day_for_habit():
+async def check_current_day_for_habit(rollover_day: date = None):
     """
-        Выполняет автоматическую проверку выполненных заданий для всех пользователей.
+    Выполняет ночную проверку выполненных заданий для всех пользователей.
 
-        Эта функция проверяет все привычки для каждого пользователя и обновляет
-        статус их выполнения. Если у пользователя есть незавершенные привычки
-        за текущий день, то создается новая запись о невыполненной привычке
-        и увеличивается соответствующий счетчик.
+    Все незавершенные привычки, по которым за прошедший день не было отметки,
+    отмечаются как невыполненные, а их счетчик пройденных дней увеличивается.
+    Работа выполняется set-based выражениями (UPDATE с проверкой битовых карт дней
+    и записью в журнал отметок через CTE) по диапазонам идентификаторов привычек,
+    каждая порция фиксируется отдельной транзакцией.
 
-        Returns:
-            bool: Возвращает True, если запись о невыполненной привычке была создана,
-                  иначе возвращает None.
+    Args:
+        rollover_day (date): День, за который ставятся отметки. По умолчанию -
+                             вчерашний день, так как задача запускается в полночь.
 
-        Logs:
-            - Записывает информацию о начале автоматической проверки выполненных заданий.
-            - Записывает информацию о создании записи счетчика для привычки, если таковая отсутствует.
+    Returns:
+        int: Количество привычек, отмеченных как невыполненные.
 
-        Raises:
-            Exception: Может возникнуть ошибка при выполнении операций с базой данных.
-        """
-    logger.info("Start автоматической проверки выполненных заданий")
-    current_day = datetime.today().date()
+    Logs:
+        - Записывает информацию о начале и завершении проверки, количестве обработанных привычек и времени работы.
+
+    Raises:
+        Exception: Может возникнуть ошибка при выполнении операций с базой данных.
+    """
+    rollover_day = rollover_day or datetime.today().date() - timedelta(days=1)
+    logger.info(f"Start автоматической проверки выполненных заданий за {rollover_day}")
+    started = time.perf_counter()
+    total = 0
     async with get_async_session() as session:
-        # Получаем список всех пользователей.
-        query_user = select(User.id)
-        result = await session.execute(query_user)
-        user_list = result.scalars().all()
-        # Проходим циклом по всем пользователям.
-        for user_id in user_list:
-        # Собираем список всех незавершенных привычек для данного пользователя
-            query = select(Habit.id, Habit.reminder_time, Habit.habit_name).where(and_(
-                Habit.duration > Habit.count_remained_day,
-                Habit.user_id == user_id
-            ))
-            result = await session.execute(query)
-            habit_list = result.fetchall()
-
-            for habit in habit_list:
-                habit_id = habit[0]
-
-                query = select(HabitComplected).where(and_(
-                    HabitComplected.habit_id == habit_id,
-                    HabitComplected.user_id == user_id,
-                    HabitComplected.created_date == current_day
-                ))
-                result = await session.execute(query)
-                habit_complected = result.scalars().one_or_none()
-                # Если записи нет, то создаем новую запись и увеличиваем счетчик.
-                if habit_complected is None:
-                    logger.info(f"Записи счетчиков для привычки {habit} еще нет. Создаем.")
-                    habit_not_complected = await create_habit_complected_record(habit_id, user_id)
-                    # Увеличиваем счетчик не выполненного задания.
-                    habit_not_complected.increment_count_not_complected()
-
-                    habit_query = select(Habit).where(Habit.id == habit_id)
-                    habit_result = await session.execute(habit_query)
-                    habit = habit_result.scalars().one_or_none()
-
-                    if habit is not None:
-                        habit.increment_remained_day()
-                        session.add(habit)
-
-                    session.add(habit_not_complected)
-                    await session.commit()
-                    return True
-
-
-async def save_update_user_data(user_info):
+        result = await session.execute(select(func.min(Habit.id), func.max(Habit.id)))
+        min_id, max_id = result.one()
+    if min_id is None:
+        logger.info("Привычек для проверки нет")
+        return total
+
+    for chunk_start in range(min_id, max_id + 1, ROLLOVER_CHUNK_SIZE):
+        chunk_end = chunk_start + ROLLOVER_CHUNK_SIZE
+        async with get_async_session() as session:
+            result = await session.execute(rollover_statement(rollover_day, chunk_start, chunk_end))
+            await session.commit()
+        total += result.rowcount
+        logger.info(f"Ночная проверка: привычки {chunk_start}-{chunk_end - 1}, отмечено {result.rowcount}")
+
+    logger.info(f"Ночная проверка завершена за {time.perf_counter() - started:.2f} c., отмечено привычек - {total}")
+    return total
+
+
+def rollover_statement(rollover_day: date, chunk_start: int, chunk_end: int):
+    """
+    Строит выражение ночной отметки для диапазона идентификаторов привычек.
+
+    Args:
+        rollover_day (date): День, за который ставятся отметки о невыполнении.
+        chunk_start (int): Начало диапазона идентификаторов привычек (включительно).
+        chunk_end (int): Конец диапазона идентификаторов привычек (не включительно).
+
+    Returns:
+        Insert: INSERT в журнал habit_checkin_event с CTE, который устанавливает бит дня
+                в missed_days и обновляет счетчики привычек (count_remained_day, missed_count,
+                current_streak, last_checkin_date), у которых за день еще нет отметки.
+                Отметка о невыполнении не удлиняет серию, поэтому longest_streak не меняется.
+    """
+    offset = literal(rollover_day) - Habit.created_date
+    updated = (
+        update(Habit)
+        .where(and_(
+            Habit.id >= chunk_start,
+            Habit.id < chunk_end,
+            Habit.duration > Habit.count_remained_day,
+            Habit.created_date <= rollover_day,
+            ~sql_has_day(Habit.done_days, offset),
+            ~sql_has_day(Habit.missed_days, offset),
+        ))
+        .values(
+            count_remained_day=Habit.count_remained_day + 1,
+            missed_count=Habit.missed_count + 1,
+            missed_days=sql_with_day(Habit.missed_days, offset),
+            # Отметка за сегодня, поставленная до ночной проверки, начинает новую серию и сохраняется.
+            current_streak=case((Habit.last_checkin_date > rollover_day, Habit.current_streak), else_=0),
+            last_checkin_date=func.greatest(Habit.last_checkin_date, rollover_day),
+        )
+        .returning(Habit.id, Habit.user_id)
+        .cte("updated")
+    )
+    return checkin_event_insert(updated, rollover_day, False, "rollover")
+
+
+async def save_update_user_data(user_info, session: AsyncSession):
     logger.info(f"Start UPDATE user data. - {user_info}, {type(user_info)}")
     bot_user_id = user_info.get("bot_user_id")
     fullname = user_info.get("fullname")
@@ -811,144 +1091,303 @@ async def save_update_user_data(user_info):
 
     logger.info(f"USER INFO - {bot_user_id}, {fullname}, {age}, {phone}, {email}, {city}")
 
-    async with get_async_session() as session:
-        user = await get_user_by_bot_user_id(bot_user_id)
-        if user:
-            if fullname is not None:
-                user.fullname = fullname
-            if age is not None:
-                user.age = age
-            if phone is not None:
-                user.phone = phone
-            if email is not None:
-                user.email = email
-            if city is not None:
-                user.city = city
-            session.add(user)
-            await session.commit()
-            return user
-        else:
-            logger.info(f"Что пошло не так при сохранении - {user}")
-            return None
+    user = await get_user_by_bot_user_id(bot_user_id, session)
+    if user:
+        if fullname is not None:
+            user.fullname = fullname
+        if age is not None:
+            user.age = age
+        if phone is not None:
+            user.phone = phone
+        if email is not None:
+            user.email = email
+        if city is not None:
+            user.city = city
+        await session.flush()
+        run_after_commit(session, user_identity_cache.invalidate, bot_user_id)
+        return user
+    else:
+        logger.info(f"Что пошло не так при сохранении - {user}")
+        return None
 
 
-async def add_job_reminder(bot_user_id, reminder_time, habit_name, habit_id) -> scheduler:
+# Префикс идентификаторов прежних задач APScheduler "одна задача на привычку".
+REMINDER_JOB_PREFIX = "habit_reminder_"
+# Сколько пропущенных минут наверстывает опоздавший тик напоминаний.
+REMINDER_MAX_CATCH_UP = 5
+
+# Запущенные задачи отправки напоминаний (храним ссылки, чтобы их не собрал сборщик мусора).
+reminder_dispatch_tasks = set()
+
+
+async def notify_reminder_wheel(payload: str, session: AsyncSession):
     """
-    Добавляет задачу напоминания для заданной привычки.
+    Передает изменение индекса напоминаний активному планировщику.
 
-    Эта функция создает задачу, которая будет отправлять напоминание пользователю
-    о привычке в указанное время. Задача добавляется в планировщик с использованием
-    формата cron для определения времени.
+    Уведомление отправляется через Postgres NOTIFY в транзакции сессии,
+    поэтому планировщик получит его только после фиксации изменений привычки.
+
+    Args:
+        payload (str): 'add:<habit_id>:<HH:MM>' или 'discard:<habit_id>'.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
+    """
+    await session.execute(select(func.pg_notify(REMINDER_WHEEL_CHANNEL, payload)))
+
+
+async def add_job_reminder(habit_id, reminder_time, session: AsyncSession):
+    """
+    Добавляет напоминание привычки в индекс напоминаний или переносит его на новое время.
 
     Args:
-        bot_user_id (int): Идентификатор пользователя бота, которому будет отправлено напоминание.
-        reminder_time (str): Время напоминания в формате 'HH:MM'.
-        habit_name (str): Название привычки, для которой будет создано напоминание.
         habit_id (int): Идентификатор привычки, связанной с напоминанием.
+        reminder_time (str): Время напоминания в формате 'HH:MM'.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
-        Job: Возвращает объект задачи (job) из планировщика, если задача была успешно добавлена,
-              иначе возвращает None.
+        int: Минута суток напоминания или None, если время имеет неверный формат.
 
     Logs:
-        - Записывает информацию о начале добавления задачи напоминания для заданной привычки.
-        - Записывает информацию о найденном пользователе по идентификатору бота.
-        - Записывает успешное добавление задачи для привычки.
-        - Записывает предупреждение, если пользователь не найден.
-        - Записывает информацию об ошибках, возникающих при добавлении задачи.
+        - Записывает информацию о добавлении напоминания и ошибку неверного формата времени.
+    """
+    try:
+        minute = minute_of_day(reminder_time)
+    except (ValueError, AttributeError) as e:
+        logger.error(f"Error adding reminder for habit_id {habit_id}: {e}")
+        return None
+    await notify_reminder_wheel(f"add:{habit_id}:{reminder_time}", session)
+    logger.info(f"Reminder for habit_id {habit_id} added to minute {minute}")
+    return minute
 
-    Raises:
-        Exception: Может возникнуть ошибка при выполнении операций с базой данных или
-                    добавлении задачи в планировщик.
+
+async def discard_job_reminder(habit_id: int, session: AsyncSession):
     """
-    logger.info(f"Start add_job_reminder for habit_id {habit_id}")
-    async with get_async_session() as session:
-        try:
-            hour, minute = map(int, reminder_time.split(':'))
-            trigger = CronTrigger(hour=hour, minute=minute)
-            job = scheduler.add_job(send_reminder, trigger, args=[bot_user_id, habit_name])
-
-            user = await get_user_by_bot_user_id(bot_user_id)
-            if user:
-                logger.info(f"Found user {user.id} for bot_user_id {bot_user_id}")
-                new_job = SchedulerJobs(job_id=job.id, user_id=user.id, habit_id=habit_id)
-                session.add(new_job)
-                await session.commit()
-                logger.info(f"Job for habit_id {habit_id} added successfully")
-                return job
-            else:
-                logger.warning(f"No user found for bot_user_id {bot_user_id}")
-        except Exception as e:
-            logger.error(f"Error adding job for habit_id {habit_id}: {e}")
-            await session.rollback()
+    Удаляет привычку из индекса напоминаний.
+
+    Args:
+        habit_id (int): Идентификатор привычки.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
+    """
+    await notify_reminder_wheel(f"discard:{habit_id}", session)
 
 
-async def delete_job_reminder(habit_id: int):
+async def delete_job_reminder(habit_id: int, session: AsyncSession):
     """
-    Удаляет задачу напоминания для заданной привычки.
+    Удаляет напоминание для заданной привычки.
 
-    Эта функция ищет задачу напоминания по идентификатору привычки и удаляет
-    её из базы данных и планировщика задач. Если задача успешно удалена,
-    возвращает True.
+    Эта функция удаляет привычку из индекса напоминаний и прежние записи
+    о задачах напоминаний из базы данных.
 
     Args:
         habit_id (int): Идентификатор привычки, для которой необходимо удалить задачу напоминания.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
-        bool: Возвращает True, если задача была успешно удалена, иначе None.
+        bool: Возвращает True после удаления.
 
     Logs:
         - Записывает информацию о начале процесса удаления задачи напоминания.
-        - Если задача с указанным habit_id не найдена, то не записывает дополнительные логи.
 
     Raises:
         Exception: Может возникнуть ошибка при выполнении операций с базой данных.
     """
     logger.info(f"Start delete job reminder - habit_id - {habit_id}")
-    async with get_async_session() as session:
-        query = select(SchedulerJobs).where(SchedulerJobs.habit_id == habit_id)
-        result = await session.execute(query)
-        job = result.scalars().one_or_none()
-        if job:
-            await session.delete(job)
-            await session.commit()
-            return True
-
+    await discard_job_reminder(habit_id, session)
+    await session.execute(delete(SchedulerJobs).where(SchedulerJobs.habit_id == habit_id))
+    return True
 
 
-async def send_reminder(bot_user_id: int, habit_name):
+async def send_reminder(bot_user_id: int, habit_id: int, habit_name, session: AsyncSession):
     """
     Отправляет напоминание пользователю о необходимости выполнения задачи для формирования привычки.
 
     Эта функция отправляет сообщение пользователю с напоминанием о привычке и
     случайным текстом задания, связанным с этой привычкой. Сообщение отправляется
-    в чат пользователя, а идентификатор сообщения записывается в базе данных.
+    в чат пользователя с кнопками "Выполнено" и "Пропустить", которые сразу ставят
+    отметку привычке, а идентификатор сообщения записывается в базе данных
+    (фиксация выполняется вызывающей стороной).
 
     Args:
         bot_user_id (int): Идентификатор пользователя (бота) в Telegram.
+        habit_id (int): Идентификатор привычки.
         habit_name (str): Название привычки, для которой отправляется напоминание.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
 
     Returns:
         None: Функция не возвращает значения.
 
     Logs:
         - Записывает информацию о начале процесса отправки напоминания.
-        - Логи не содержат информацию о возможных ошибках отправки сообщений.
 
     Raises:
         Exception: Может возникнуть ошибка при отправке сообщения или
         при выполнении операций с базой данных.
     """
+    logger.info("Start send_reminder")
+    chat_id = bot_user_id
+    message = await random_habit()
+    sent_message = await bot.send_message(
+        chat_id,
+        f"`{escape_markdown(message)}`\n\nДля формирования привычки - *{habit_name}* необходимо выполнить задание!",
+        parse_mode='Markdown',
+        reply_markup=get_reminder_menu(habit_id),
+    )
+    await record_message_id(chat_id, sent_message.message_id, bot_user_id, session)
+
+
+async def send_reminder_digest(bot_user_id: int, habits, session: AsyncSession):
+    """
+    Отправляет пользователю одно напоминание сразу о нескольких привычках.
+
+    Используется для пользователей с включенным режимом сводки (User.reminder_digest),
+    у которых на одну минуту приходится несколько привычек. Сообщение содержит одно
+    случайное задание, список привычек и по строке кнопок "Выполнено" / "Пропустить"
+    на каждую привычку. Идентификатор сообщения записывается в базе данных один раз
+    (фиксация выполняется вызывающей стороной).
+
+    Args:
+        bot_user_id (int): Идентификатор пользователя (бота) в Telegram.
+        habits (Sequence[Row]): Привычки с полями id и habit_name.
+        session (AsyncSession): Асинхронная сессия для работы с базой данных.
+
+    Returns:
+        None: Функция не возвращает значения.
+
+    Raises:
+        Exception: Может возникнуть ошибка при отправке сообщения или
+        при выполнении операций с базой данных.
+    """
+    logger.info(f"Start send_reminder_digest, habits - {len(habits)}")
+    chat_id = bot_user_id
+    message = await random_habit()
+    habit_names = "\n".join(f"• *{habit.habit_name}*" for habit in habits)
+    sent_message = await bot.send_message(
+        chat_id,
+        f"`{escape_markdown(message)}`\n\nДля формирования привычек необходимо выполнить задания:\n{habit_names}",
+        parse_mode='Markdown',
+        reply_markup=get_reminder_digest_menu(habits),
+    )
+    await record_message_id(chat_id, sent_message.message_id, bot_user_id, session)
+
+
+def group_reminders(rows):
+    """
+    Группирует привычки корзины напоминаний в сообщения.
+
+    Привычки пользователей с включенным режимом сводки объединяются в одно
+    сообщение на пользователя, остальные привычки отправляются по одной.
+
+    Args:
+        rows (Sequence[Row]): Привычки с полями id, habit_name, bot_user_id и reminder_digest.
+
+    Returns:
+        list[tuple[int, list[Row]]]: Идентификатор пользователя бота и привычки одного сообщения.
+    """
+    digests = {}
+    messages = []
+    for row in rows:
+        if row.reminder_digest:
+            if row.bot_user_id not in digests:
+                digests[row.bot_user_id] = []
+                messages.append((row.bot_user_id, digests[row.bot_user_id]))
+            digests[row.bot_user_id].append(row)
+        else:
+            messages.append((row.bot_user_id, [row]))
+    return messages
+
+
+async def dispatch_reminders(minute: int, batch_size: int = REMINDER_DISPATCH_BATCH_SIZE):
+    """
+    Отправляет напоминания всех привычек из корзины заданной минуты.
+
+    Сначала названия привычек и идентификаторы пользователей бота выбираются
+    порциями по идентификаторам из индекса, и привычки, которых больше нет среди
+    активных (удалены или завершены), удаляются из индекса. Затем привычки всей
+    корзины группируются в сообщения (`group_reminders`): привычки одного
+    пользователя с включенным режимом сводки отправляются одним сообщением, даже
+    если их идентификаторы попали в разные порции. Сообщения отправляются порциями
+    примерно по `batch_size` привычек, сообщение пользователя не делится между порциями.
+
+    Args:
+        minute (int): Минута суток.
+        batch_size (int): Количество привычек в одной порции.
+
+    Returns:
+        int: Количество привычек, напоминания о которых отправлены.
+
+    Logs:
+        - Записывает количество привычек и сообщений и время отправки.
+        - Записывает ошибки отправки отдельных напоминаний.
+    """
+    habit_ids = reminder_wheel.bucket(minute)
+    if not habit_ids:
+        return 0
+    started = time.perf_counter()
+    rows = []
     async with get_async_session() as session:
-        logger.info("Start send_reminder")
-        chat_id = bot_user_id
-        message = await random_habit()
-        sent_message = await bot.send_message(
-            chat_id,
-            f"`{escape_markdown(message)}`\n\nДля формирования привычки - *{habit_name}* необходимо выполнить задание!",
-            parse_mode='Markdown',
-        )
-        await record_message_id(chat_id, sent_message.message_id, bot_user_id)
+        for offset in range(0, len(habit_ids), batch_size):
+            chunk = habit_ids[offset:offset + batch_size]
+            query = (
+                select(Habit.id, Habit.habit_name, User.bot_user_id, User.reminder_digest)
+                .join(User, User.id == Habit.user_id)
+                .where(Habit.id.in_(chunk.tolist()), Habit.duration > Habit.count_remained_day)
+            )
+            chunk_rows = (await session.execute(query)).all()
+            for habit_id in set(chunk) - {row.id for row in chunk_rows}:
+                reminder_wheel.discard(habit_id, minute)
+            rows.extend(chunk_rows)
+
+    messages = group_reminders(rows)
+    sent = 0
+    messages_sent = 0
+    batch = []
+    batch_habits = 0
+    for index, message in enumerate(messages):
+        batch.append(message)
+        batch_habits += len(message[1])
+        if batch_habits < batch_size and index < len(messages) - 1:
+            continue
+        async with get_async_session() as session:
+            # Напоминания уступают очередь ответам пользователям.
+            with background_priority():
+                results = await asyncio.gather(
+                    *(
+                        send_reminder_digest(bot_user_id, habits, session) if len(habits) > 1
+                        else send_reminder(bot_user_id, habits[0].id, habits[0].habit_name, session)
+                        for bot_user_id, habits in batch
+                    ),
+                    return_exceptions=True,
+                )
+            for (bot_user_id, habits), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Не удалось отправить напоминание привычек {[habit.id for habit in habits]}: {result}")
+                else:
+                    sent += len(habits)
+                    messages_sent += 1
+            await session.commit()
+        batch = []
+        batch_habits = 0
+    logger.info(
+        f"Напоминания минуты {minute} отправлены за {time.perf_counter() - started:.2f} c.: "
+        f"привычек - {sent}, сообщений - {messages_sent}"
+    )
+    return sent
+
+
+async def reminder_tick():
+    """
+    Тик индекса напоминаний, выполняется планировщиком раз в минуту.
+
+    Определяет минуты, напоминания которых пора отправить, и запускает их отправку
+    в фоновых задачах, чтобы долгая отправка большой корзины не задерживала следующий тик.
+
+    Returns:
+        None
+    """
+    now = datetime.now(scheduler.timezone)
+    for minute in reminder_wheel.due_minutes(now.hour * 60 + now.minute, REMINDER_MAX_CATCH_UP):
+        task = asyncio.create_task(dispatch_reminders(minute))
+        reminder_dispatch_tasks.add(task)
+        task.add_done_callback(reminder_dispatch_tasks.discard)
 
 
 async def random_habit():
@@ -0,0 +1,116 @@
+"""Хеширование и проверка паролей argon2 вне цикла событий."""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.models import pwd_context
+from config import PASSWORD_HASH_WORKERS
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class PasswordHasher:
+    """
+    Выполняет хеширование и проверку паролей в ограниченном пуле потоков.
+
+    Вычисление argon2 занимает десятки миллисекунд процессорного времени и
+    при вызове в обработчике останавливает цикл событий для всех чатов.
+    argon2-cffi освобождает GIL на время вычисления, поэтому пула потоков
+    достаточно. Одновременно выполняется не больше `workers` вычислений,
+    остальные ждут в очереди пула; время ожидания и выполнения учитывается
+    в статистике.
+
+    Атрибуты:
+        workers (int): Количество потоков пула.
+        in_flight (int): Количество поставленных и еще не завершенных вычислений.
+        completed (int): Количество завершенных вычислений.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS):
+        self.workers = workers
+        self.in_flight = 0
+        self.completed = 0
+        self._queue_time = 0.0
+        self._max_queue_time = 0.0
+        self._run_time = 0.0
+        self._executor = None
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        submitted = time.perf_counter()
+        started = None
+
+        def call():
+            nonlocal started
+            started = time.perf_counter()
+            return func(*args)
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        finally:
+            self.in_flight -= 1
+            if started is not None:
+                finished = time.perf_counter()
+                queue_time = started - submitted
+                self.completed += 1
+                self._queue_time += queue_time
+                self._max_queue_time = max(self._max_queue_time, queue_time)
+                self._run_time += finished - started
+
+    async def hash(self, password: str) -> str:
+        """
+        Вычисляет хеш пароля.
+
+        Args:
+            password (str): Пароль.
+
+        Returns:
+            str: Хеш пароля.
+        """
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> tuple[bool, str | None]:
+        """
+        Проверяет пароль по хешу.
+
+        Если хеш вычислен с устаревшими параметрами argon2, вместе с результатом
+        возвращается новый хеш, который нужно сохранить вместо старого.
+
+        Args:
+            password (str): Введенный пароль.
+            password_hash (str): Сохраненный хеш пароля.
+
+        Returns:
+            tuple[bool, str | None]: Признак совпадения пароля и новый хеш или None.
+        """
+        return await self._run(pwd_context.verify_and_update, password, password_hash)
+
+    def get_stats(self) -> dict:
+        """
+        Возвращает статистику пула.
+
+        Returns:
+            dict: Количество потоков, выполняемых и завершенных вычислений,
+                  среднее и максимальное время ожидания и среднее время вычисления в миллисекундах.
+        """
+        completed = self.completed or 1
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "avg_queue_ms": round(self._queue_time / completed * 1000, 2),
+            "max_queue_ms": round(self._max_queue_time * 1000, 2),
+            "avg_run_ms": round(self._run_time / completed * 1000, 2),
+        }
+
+    def close(self):
+        """Останавливает пул потоков."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
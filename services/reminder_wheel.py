@@ -0,0 +1,170 @@
+"""Индекс напоминаний по минутам суток (timing wheel)."""
+import logging
+from array import array
+from bisect import bisect_left
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+MINUTES_IN_DAY = 24 * 60
+
+# Канал Postgres NOTIFY, через который процессы бота передают изменения индекса планировщику.
+REMINDER_WHEEL_CHANNEL = "reminder_wheel"
+
+
+def minute_of_day(reminder_time: str) -> int:
+    """
+    Переводит время напоминания в номер минуты суток.
+
+    Args:
+        reminder_time (str): Время напоминания в формате 'HH:MM'.
+
+    Returns:
+        int: Номер минуты суток от 0 до 1439.
+
+    Raises:
+        ValueError: Если время напоминания имеет неверный формат.
+    """
+    hour, minute = map(int, reminder_time.split(':'))
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Некорректное время напоминания - {reminder_time}")
+    return hour * 60 + minute
+
+
+class ReminderWheel:
+    """
+    Индекс привычек по минуте напоминания.
+
+    Для каждой минуты суток хранится отсортированный массив `array('q')`
+    идентификаторов привычек, поэтому на привычку приходится 8 байт, а поиск
+    корзины при тике планировщика выполняется за O(1) независимо от числа привычек.
+
+    Атрибуты:
+        buckets (list[array]): 1440 отсортированных массивов идентификаторов привычек.
+        last_minute (int | None): Последняя минута, для которой были отправлены напоминания.
+    """
+
+    def __init__(self):
+        self.buckets = [array('q') for _ in range(MINUTES_IN_DAY)]
+        self.last_minute = None
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets)
+
+    def extend(self, rows):
+        """
+        Добавляет привычки в индекс без сортировки корзин (для первичной загрузки).
+
+        После загрузки всех порций необходимо вызвать `sort`.
+
+        Args:
+            rows (Iterable[tuple[int, str]]): Пары (идентификатор привычки, время напоминания 'HH:MM').
+
+        Returns:
+            int: Количество добавленных привычек.
+        """
+        added = 0
+        for habit_id, reminder_time in rows:
+            try:
+                self.buckets[minute_of_day(reminder_time)].append(habit_id)
+                added += 1
+            except (ValueError, AttributeError) as e:
+                logger.warning(f"Привычка {habit_id} пропущена при загрузке напоминаний: {e}")
+        return added
+
+    def sort(self):
+        """Сортирует корзины после первичной загрузки."""
+        self.buckets = [array('q', sorted(bucket)) for bucket in self.buckets]
+
+    def add(self, habit_id: int, reminder_time: str):
+        """
+        Добавляет привычку в индекс или переносит её на новое время.
+
+        Args:
+            habit_id (int): Идентификатор привычки.
+            reminder_time (str): Время напоминания в формате 'HH:MM'.
+
+        Returns:
+            int: Минута суток, в которую попала привычка.
+
+        Raises:
+            ValueError: Если время напоминания имеет неверный формат.
+        """
+        minute = minute_of_day(reminder_time)
+        self.discard(habit_id)
+        bucket = self.buckets[minute]
+        bucket.insert(bisect_left(bucket, habit_id), habit_id)
+        return minute
+
+    def discard(self, habit_id: int, minute: int = None):
+        """
+        Удаляет привычку из индекса.
+
+        Args:
+            habit_id (int): Идентификатор привычки.
+            minute (int): Минута суток привычки, если известна; иначе просматриваются все корзины.
+
+        Returns:
+            bool: True, если привычка была в индексе.
+        """
+        buckets = self.buckets if minute is None else [self.buckets[minute]]
+        for bucket in buckets:
+            position = bisect_left(bucket, habit_id)
+            if position < len(bucket) and bucket[position] == habit_id:
+                del bucket[position]
+                return True
+        return False
+
+    def apply_notification(self, payload: str):
+        """
+        Применяет изменение индекса, полученное через NOTIFY.
+
+        Args:
+            payload (str): 'add:<habit_id>:<HH:MM>' или 'discard:<habit_id>'.
+        """
+        action, habit_id, *reminder_time = payload.split(':', 2)
+        try:
+            if action == "add":
+                self.add(int(habit_id), reminder_time[0])
+            elif action == "discard":
+                self.discard(int(habit_id))
+            else:
+                logger.warning(f"Неизвестное изменение индекса напоминаний - {payload}")
+        except (ValueError, IndexError) as e:
+            logger.warning(f"Некорректное изменение индекса напоминаний {payload}: {e}")
+
+    def due_minutes(self, now_minute: int, max_catch_up: int) -> list[int]:
+        """
+        Возвращает минуты, напоминания которых пора отправить, и сдвигает указатель.
+
+        Если тик планировщика опоздал, возвращаются и пропущенные минуты,
+        но не больше `max_catch_up`.
+
+        Args:
+            now_minute (int): Текущая минута суток.
+            max_catch_up (int): Максимальное количество минут для наверстывания.
+
+        Returns:
+            list[int]: Минуты суток в порядке отправки.
+        """
+        if self.last_minute is None:
+            due = [now_minute]
+        else:
+            missed = min((now_minute - self.last_minute) % MINUTES_IN_DAY, max_catch_up)
+            due = [(now_minute - offset) % MINUTES_IN_DAY for offset in range(missed - 1, -1, -1)]
+        self.last_minute = now_minute
+        return due
+
+    def bucket(self, minute: int) -> array:
+        """
+        Возвращает копию корзины привычек заданной минуты.
+
+        Args:
+            minute (int): Минута суток.
+
+        Returns:
+            array: Идентификаторы привычек с напоминанием в эту минуту.
+        """
+        return array('q', self.buckets[minute % MINUTES_IN_DAY])
+
+
+reminder_wheel = ReminderWheel()
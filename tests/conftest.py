@@ -0,0 +1,72 @@
+"""Общие настройки тестов."""
+import os
+from pathlib import Path
+
+import pytest
+
+# Модуль config читает настройки при импорте; тестам достаточно значений по умолчанию.
+os.environ.setdefault("BOT_TOKEN", "123456:test")
+os.environ.setdefault("DB_PORT", "5432")
+
+
+# Маркер теста -> параметр командной строки, без которого тест пропускается.
+OPTIONAL_MARKERS = {
+    "benchmark": "--benchmark",
+    "postgres": "--postgres",
+}
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", help="Запускать нагрузочные тесты (benchmark).")
+    parser.addoption(
+        "--postgres", action="store_true",
+        help="Запускать тесты с сервером Postgres из настроек DB_* (создают и удаляют отдельную базу).",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    for marker, option in OPTIONAL_MARKERS.items():
+        if config.getoption(option):
+            continue
+        skip = pytest.mark.skip(reason=f"запускается с {option}")
+        for item in items:
+            if marker in item.keywords:
+                item.add_marker(skip)
+
+
+@pytest.fixture(scope="module")
+def migrated_database(request):
+    """
+    Создает отдельную базу <DB_NAME>_<suffix> на сервере из настроек DB_* и применяет к ней все миграции.
+
+    Суффикс берется из переменной DATABASE_SUFFIX модуля теста. После тестов модуля база удаляется.
+
+    Yields:
+        URL: Синхронный адрес созданной базы.
+    """
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import create_engine
+    from sqlalchemy.engine import make_url
+
+    import config
+    from app.db.database import SYNC_DATABASE_URL
+
+    name = f"{config.DB_NAME}_{request.module.DATABASE_SUFFIX}"
+    admin = create_engine(SYNC_DATABASE_URL, isolation_level="AUTOCOMMIT")
+    with admin.connect() as connection:
+        connection.exec_driver_sql(f'DROP DATABASE IF EXISTS "{name}"')
+        connection.exec_driver_sql(f'CREATE DATABASE "{name}"')
+
+    # alembic/env.py берет адрес базы из модуля config при каждом запуске.
+    alembic_config = Config()
+    alembic_config.set_main_option("script_location", str(Path(__file__).resolve().parents[1] / "alembic"))
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(config, "DB_NAME", name)
+        command.upgrade(alembic_config, "head")
+    try:
+        yield make_url(SYNC_DATABASE_URL).set(database=name)
+    finally:
+        with admin.connect() as connection:
+            connection.exec_driver_sql(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        admin.dispose()
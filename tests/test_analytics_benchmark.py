@@ -0,0 +1,81 @@
+"""Нагрузочный тест аналитики: 1 000 000 привычек с историей за 365 дней."""
+import os
+import time
+from typing import NamedTuple
+
+import numpy as np
+import pytest
+
+from config import ANALYTICS_BATCH_SIZE
+from services.analytics import HabitAnalytics
+
+HABITS = int(os.environ.get("BENCHMARK_HABITS", 1_000_000))
+DAYS = 365
+# Допустимое время обработки всех порций в секундах.
+BUDGET = float(os.environ.get("BENCHMARK_ANALYTICS_BUDGET", 60))
+
+pytestmark = pytest.mark.benchmark
+
+
+class HabitRow(NamedTuple):
+    """Строка привычки в том виде, в котором её читает compute_habit_analytics."""
+    duration: int
+    count_remained_day: int
+    completed_count: int
+    missed_count: int
+    current_streak: int
+    done_days: bytes
+    missed_days: bytes
+
+
+def make_batch(rng: np.random.Generator, size: int) -> list[HabitRow]:
+    """
+    Создает порцию привычек со случайной историей отметок за DAYS дней.
+
+    Args:
+        rng (np.random.Generator): Генератор случайных чисел.
+        size (int): Количество привычек в порции.
+
+    Returns:
+        list[HabitRow]: Привычки порции.
+    """
+    # У каждой привычки своя доля выполненных дней и свой день, после которого отметок нет.
+    done_rate = rng.random((size, 1))
+    active_days = rng.integers(1, DAYS + 1, size=(size, 1))
+    marked = np.arange(DAYS) < active_days
+    done = marked & (rng.random((size, DAYS)) < done_rate)
+    missed = marked & ~done
+    done_days = np.packbits(done, axis=1, bitorder="little")
+    missed_days = np.packbits(missed, axis=1, bitorder="little")
+    completed = done.sum(axis=1)
+    missed_count = missed.sum(axis=1)
+    streak = rng.integers(0, 90, size=size)
+    return [
+        HabitRow(DAYS, int(active_days[index, 0]), int(completed[index]), int(missed_count[index]),
+                 int(streak[index]), done_days[index].tobytes(), missed_days[index].tobytes())
+        for index in range(size)
+    ]
+
+
+def test_analytics_million_habits_year():
+    rng = np.random.default_rng(0)
+    analytics = HabitAnalytics(DAYS)
+    elapsed = 0.0
+    completed_total = 0
+    for offset in range(0, HABITS, ANALYTICS_BATCH_SIZE):
+        batch = make_batch(rng, min(ANALYTICS_BATCH_SIZE, HABITS - offset))
+        completed_total += sum(row.completed_count for row in batch)
+        started = time.perf_counter()
+        analytics.add_batch(batch)
+        elapsed += time.perf_counter() - started
+    started = time.perf_counter()
+    report = analytics.result()
+    elapsed += time.perf_counter() - started
+
+    print(f"\nАналитика: {HABITS} привычек x {DAYS} дней за {elapsed:.2f} c "
+          f"({HABITS / elapsed:,.0f} привычек/c)")
+    assert report["habits"] == HABITS
+    assert len(report["completion_by_day"]) == len(report["drop_off"]) == DAYS
+    # Суммы по битовым картам совпадают со счетчиками привычек.
+    assert int(analytics.done_by_day.sum()) == analytics.completed_total == completed_total
+    assert elapsed < BUDGET
@@ -0,0 +1,146 @@
+"""
+Проверка планов запросов: горячие запросы используют индексы миграции e5b7d0c49a18.
+
+Тесты создают отдельную базу <DB_NAME>_explain_test на сервере из настроек DB_*,
+применяют к ней все миграции, заполняют таблицы и проверяют EXPLAIN запросов
+приложения. Запускаются с --postgres.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, select, text
+
+from app.models import Habit, HabitComplected, MessageControl, SchedulerJobs, User
+from config import ROLLOVER_CHUNK_SIZE
+from services.handlers import rollover_statement
+
+DATABASE_SUFFIX = "explain_test"
+USERS = 5000
+HABITS_PER_USER = 20
+# Доля незавершенных привычек: как в рабочей базе, большая часть привычек завершена.
+ACTIVE_EVERY = 20
+
+pytestmark = pytest.mark.postgres
+
+# Заполнение таблиц: у каждой двадцатой привычки остались дни, остальные завершены.
+FILL_SQL = [
+    f"""
+    INSERT INTO "user" (nickname, age, password_hash, bot_user_id, chat_id, created_date)
+    SELECT 'user' || n, '30', 'hash', 1000000 + n, 1000000 + n, current_date
+    FROM generate_series(1, {USERS}) AS n
+    """,
+    f"""
+    INSERT INTO habit (user_id, habit_name, duration, count_remained_day, completed_count, missed_count,
+                       current_streak, longest_streak, reminder_time, created_date)
+    SELECT (n - 1) % {USERS} + 1, 'habit' || n, 21,
+           CASE WHEN n % {ACTIVE_EVERY} = 0 THEN 10 ELSE 21 END,
+           15, 6, 0, 5, '09:00', current_date - 21
+    FROM generate_series(1, {USERS * HABITS_PER_USER}) AS n
+    """,
+    f"""
+    INSERT INTO habit_complected (user_id, habit_id, count_habit_complected, count_habit_not_complected,
+                                  created_date)
+    SELECT (n - 1) % {USERS} + 1, n, 15, 6, current_date
+    FROM generate_series(1, {USERS * HABITS_PER_USER}) AS n
+    """,
+    f"""
+    INSERT INTO scheduler_jobs (job_id, user_id, habit_id)
+    SELECT 'job' || n, (n - 1) % {USERS} + 1, n
+    FROM generate_series(1, {USERS * HABITS_PER_USER}) AS n
+    """,
+    f"""
+    INSERT INTO message_control (user_id, chat_id, message_id)
+    SELECT (n - 1) % {USERS} + 1000001, (n - 1) % {USERS} + 1000001, n
+    FROM generate_series(1, {USERS * HABITS_PER_USER}) AS n
+    """,
+]
+
+
+@pytest.fixture(scope="module")
+def migrated_engine(migrated_database):
+    """
+    Заполняет таблицы созданной и обновленной миграциями базы.
+
+    Yields:
+        Engine: Синхронное подключение к заполненной базе.
+    """
+    engine = create_engine(migrated_database, isolation_level="AUTOCOMMIT")
+    with engine.connect() as connection:
+        for statement in FILL_SQL:
+            connection.execute(text(statement))
+        # Карта видимости нужна для Index Only Scan, статистика - для выбора плана.
+        connection.exec_driver_sql("VACUUM ANALYZE")
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+
+
+def plan_nodes(plan: dict):
+    """Обходит узлы плана EXPLAIN (FORMAT JSON)."""
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def explain(engine, statement) -> list[dict]:
+    """
+    Возвращает узлы плана выражения SQLAlchemy без его выполнения.
+
+    Args:
+        engine (Engine): Подключение к базе.
+        statement: Выражение SQLAlchemy.
+
+    Returns:
+        list[dict]: Узлы плана.
+    """
+    compiled = statement.compile(dialect=engine.dialect)
+    with engine.connect() as connection:
+        result = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params)
+        plan = result.scalar()[0]["Plan"]
+    return list(plan_nodes(plan))
+
+
+def used_indexes(nodes: list[dict]) -> set[str]:
+    return {node["Index Name"] for node in nodes if "Index Name" in node}
+
+
+def test_active_habits_use_partial_index(migrated_engine):
+    # Загрузка индекса напоминаний (run_reminder.check_and_add_jobs) читает только индекс.
+    nodes = explain(
+        migrated_engine,
+        select(Habit.id, Habit.reminder_time).where(Habit.duration > Habit.count_remained_day),
+    )
+    assert "ix_habit_active" in used_indexes(nodes)
+    assert any(node["Node Type"] == "Index Only Scan" for node in nodes)
+    assert not any(node["Node Type"] == "Seq Scan" and node.get("Relation Name") == "habit" for node in nodes)
+
+
+def test_rollover_chunk_uses_partial_index(migrated_engine):
+    nodes = explain(migrated_engine, rollover_statement(date.today(), 1, 1 + ROLLOVER_CHUNK_SIZE))
+    assert "ix_habit_active" in used_indexes(nodes)
+
+
+@pytest.mark.parametrize(
+    ("statement", "index_name"),
+    [
+        (select(User.id, User.nickname, User.chat_id).where(User.bot_user_id == 1000042), "ix_user_bot_user_id"),
+        (
+            select(Habit.id, Habit.habit_name, Habit.duration, Habit.count_remained_day)
+            .where(Habit.user_id == 42)
+            .order_by(Habit.id),
+            "ix_habit_user_id",
+        ),
+        (select(HabitComplected.id).where(HabitComplected.user_id == 42), "ix_habit_complected_user_id"),
+        (select(SchedulerJobs.job_id).where(SchedulerJobs.user_id == 42), "ix_scheduler_jobs_user_id"),
+        (
+            select(MessageControl.message_id)
+            .where(MessageControl.user_id == 1000042, MessageControl.chat_id == 1000042),
+            "ix_message_control_user_chat",
+        ),
+    ],
+    ids=["user_bot_user_id", "habit_user_id", "habit_complected_user_id", "scheduler_jobs_user_id",
+         "message_control_user_chat"],
+)
+def test_lookup_uses_index(migrated_engine, statement, index_name):
+    assert index_name in used_indexes(explain(migrated_engine, statement))
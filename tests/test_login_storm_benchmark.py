@@ -0,0 +1,78 @@
+"""Нагрузочный тест входа: задержка цикла событий при одновременной проверке паролей."""
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from app.models import pwd_context
+from services.passwords import PasswordHasher
+
+LOGINS = int(os.environ.get("BENCHMARK_LOGINS", 20))
+# Допустимая задержка цикла событий (99-й процентиль) во время входа в секундах.
+LAG_BUDGET = float(os.environ.get("BENCHMARK_LOOP_LAG_BUDGET", 0.05))
+TICK = 0.005
+
+pytestmark = pytest.mark.benchmark
+
+
+async def measure_loop_lag(stop: asyncio.Event) -> np.ndarray:
+    """
+    Замеряет, на сколько просыпается позже срока задача, засыпающая на TICK секунд.
+
+    Args:
+        stop (asyncio.Event): Событие окончания замера.
+
+    Returns:
+        np.ndarray: Задержки цикла событий в секундах.
+    """
+    loop = asyncio.get_running_loop()
+    lags = []
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(TICK)
+        lags.append(loop.time() - started - TICK)
+    return np.array(lags)
+
+
+async def login_storm(verify) -> np.ndarray:
+    """
+    Выполняет LOGINS одновременных проверок пароля и замеряет задержку цикла событий.
+
+    Args:
+        verify (Callable): Асинхронная проверка пароля (пароль, хеш).
+
+    Returns:
+        np.ndarray: Задержки цикла событий в секундах.
+    """
+    password_hash = pwd_context.hash("password")
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    results = await asyncio.gather(*(verify("password", password_hash) for _ in range(LOGINS)))
+    stop.set()
+    assert all(ok for ok, _ in results)
+    return await lag_task
+
+
+async def verify_inline(password: str, password_hash: str):
+    return pwd_context.verify_and_update(password, password_hash)
+
+
+def report(name: str, lags: np.ndarray):
+    print(f"\n{name}: {LOGINS} входов, задержка цикла событий p50 {np.percentile(lags, 50) * 1000:.1f} мс, "
+          f"p99 {np.percentile(lags, 99) * 1000:.1f} мс, max {lags.max() * 1000:.1f} мс")
+
+
+def test_login_storm_event_loop_lag():
+    inline_lags = asyncio.run(login_storm(verify_inline))
+    report("argon2 в цикле событий", inline_lags)
+
+    hasher = PasswordHasher()
+    try:
+        pool_lags = asyncio.run(login_storm(hasher.verify))
+    finally:
+        hasher.close()
+    report(f"argon2 в пуле из {hasher.workers} потоков", pool_lags)
+    print(f"Статистика пула: {hasher.get_stats()}")
+
+    assert np.percentile(pool_lags, 99) < LAG_BUDGET
@@ -0,0 +1,110 @@
+"""
+Кнопки напоминания ставят отметку без действующей сессии чата.
+
+Напоминание приходит спустя часы после входа, когда сессия (SESSION_TTL) уже истекла,
+поэтому обработчик проверяет только владельца привычки. Тесты создают отдельную базу
+<DB_NAME>_reminder_test на сервере из настроек DB_*. Запускаются с --postgres.
+"""
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Habit, HabitCheckinEvent
+from habit_bot.handlers.callbacks import handle_reminder_check_in
+
+DATABASE_SUFFIX = "reminder_test"
+OWNER_BOT_USER_ID = 5001
+OTHER_BOT_USER_ID = 5002
+
+pytestmark = pytest.mark.postgres
+
+
+@pytest.fixture(scope="module")
+def habit_id(migrated_database) -> int:
+    """Создает двух пользователей и активную привычку первого из них."""
+    engine = create_engine(migrated_database, isolation_level="AUTOCOMMIT")
+    with engine.connect() as connection:
+        connection.execute(text(
+            """
+            INSERT INTO "user" (nickname, age, password_hash, bot_user_id, chat_id, created_date)
+            VALUES ('owner', '30', 'hash', :owner, :owner, current_date),
+                   ('other', '30', 'hash', :other, :other, current_date)
+            """
+        ), {"owner": OWNER_BOT_USER_ID, "other": OTHER_BOT_USER_ID})
+        habit_id = connection.execute(text(
+            """
+            INSERT INTO habit (user_id, habit_name, duration, count_remained_day, completed_count, missed_count,
+                               current_streak, longest_streak, reminder_time, created_date)
+            SELECT id, 'зарядка', 21, 0, 0, 0, 0, 0, '09:00', current_date
+            FROM "user" WHERE bot_user_id = :owner
+            RETURNING id
+            """
+        ), {"owner": OWNER_BOT_USER_ID}).scalar_one()
+    engine.dispose()
+    return habit_id
+
+
+def press(migrated_database, data: str, bot_user_id: int) -> SimpleNamespace:
+    """
+    Вызывает обработчик кнопки напоминания так же, как DbSessionMiddleware: с сессией базы и commit.
+
+    Args:
+        migrated_database (URL): Адрес тестовой базы.
+        data (str): Данные обратного вызова кнопки.
+        bot_user_id (int): Пользователь, нажавший кнопку.
+
+    Returns:
+        SimpleNamespace: Объект обратного вызова с записанными вызовами answer и edit_text.
+    """
+    call = SimpleNamespace(
+        data=data,
+        from_user=SimpleNamespace(id=bot_user_id),
+        message=SimpleNamespace(html_text="Напоминание", reply_markup=None, edit_text=AsyncMock()),
+        answer=AsyncMock(),
+    )
+
+    async def run():
+        engine = create_async_engine(migrated_database.set(drivername="postgresql+asyncpg"))
+        try:
+            async with sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+                await handle_reminder_check_in(call, session)
+                await session.commit()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+    return call
+
+
+def checkin_events(migrated_database, habit_id: int) -> list:
+    engine = create_engine(migrated_database)
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(HabitCheckinEvent.day, HabitCheckinEvent.completed).where(HabitCheckinEvent.habit_id == habit_id)
+        ).all()
+        completed_count = connection.execute(select(Habit.completed_count).where(Habit.id == habit_id)).scalar_one()
+    engine.dispose()
+    return [rows, completed_count]
+
+
+def test_other_user_cannot_check_in(migrated_database, habit_id):
+    call = press(migrated_database, f"reminder_done_{habit_id}", OTHER_BOT_USER_ID)
+
+    call.answer.assert_awaited_once_with("Привычка не найдена.", show_alert=True)
+    call.message.edit_text.assert_not_awaited()
+    assert checkin_events(migrated_database, habit_id) == [[], 0]
+
+
+def test_reminder_tap_without_session_records_check_in(migrated_database, habit_id):
+    # Обработчик не получает FSMContext: сессии чата нет, отметка все равно ставится.
+    call = press(migrated_database, f"reminder_done_{habit_id}", OWNER_BOT_USER_ID)
+
+    call.message.edit_text.assert_awaited_once()
+    assert "Выполнено" in call.message.edit_text.await_args.args[0]
+    assert checkin_events(migrated_database, habit_id) == [[(date.today(), True)], 1]